@@ -1,4 +1,5 @@
 import prisma from "../../config/prisma";
+import { refreshStats } from "../stats/stats.service";
 
 export const fetchCommentById = async (id: number) => {
   const comment = await prisma.komentar.findUnique({
@@ -38,5 +39,6 @@ export const createComment = async (data: { subject: string; text: string; skupI
       import_source: "user",
     },
   });
+  await refreshStats([data.skupId]);
   return newComment;
 };
\ No newline at end of file
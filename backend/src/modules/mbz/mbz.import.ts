@@ -3,6 +3,7 @@ import path from 'path';
 import { extractData } from "./mbz.data";
 import type { Dataset, Publisher, Discussion, Resource } from "./mbz.data";
 import { logToJob } from './../helper/logger';
+import { refreshStats } from '../stats/stats.service';
 
 async function insertIzdavac(publishers: Record<string, Publisher>, jobId: string) {
     // console.log('Inserting publishers...');
@@ -197,6 +198,8 @@ async function importToDatabase(dir: string, jobId: string) {
 
         await insertKomentar(result.all_discussions, jobId);
 
+        await refreshStats();
+
         // console.log('\nDatabase import completed successfully!');
         logToJob(jobId, 'info', 'Database import completed successfully!');
 
@@ -17,6 +17,7 @@ import { Prisma } from "@prisma/client";
 import { getStructuredComments, getStructuredCommentsForDataset } from './responses.repository';
 import { createVectorStore, cleanupResources } from './vectorStore.openai';
 import { CriticalApiError, JobCancelledError } from './error.openai';
+import { refreshStats } from '../stats/stats.service';
 
 const openai = new OpenAI();
 const model = 'gpt-5-mini';
@@ -379,6 +380,8 @@ async function analyzeSkup(skup: AnalysisTypes.SkupGroup, jobId: string, createN
                 logToJob(jobId, 'warn', `Cleanup failed: ${cleanupError}`);
             }
         }
+        // Odgovori skupa su stvoreni ili izmijenjeni (i score -1 kod greske)
+        await refreshStats([skupId]);
     }
 }
 
@@ -412,7 +415,7 @@ async function writeErrorToDb(
     errorMessage: string,
     createNewEntry: boolean = false
 ): Promise<void> {
-    const { odgovorId, message } = comment;
+    const { odgovorId, komentarId, message } = comment;
 
     const existingObj: Record<string, any> =
         message && typeof message === 'object' && !Array.isArray(message)
@@ -435,6 +438,7 @@ async function writeErrorToDb(
     } else {
         await prisma.odgovor.create({
             data: {
+                komentar_id: komentarId,
                 created: new Date(),
                 message: newMessage,
                 score: -1,
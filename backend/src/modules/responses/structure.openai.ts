@@ -13,6 +13,7 @@ import prisma from "../../config/prisma";
 import { logToJob, isJobCancelled } from "../helper/logger";
 import { getCommentsWithoutResponses, getCommentsWithoutResponsesForDataset } from "./responses.repository";
 import { CriticalApiError, JobCancelledError } from './error.openai';
+import { refreshStats } from '../stats/stats.service';
 
 const openai = new OpenAI();
 
@@ -233,6 +234,9 @@ export async function structureAll(jobId: string) {
         }
         logToJob(jobId, 'error', `Posao prekinut: ${error.message}`)
         throw error;
+    } finally {
+        // Novi odgovori mogu biti u bilo kojem skupu
+        await refreshStats();
     }
 }
 
@@ -266,6 +270,8 @@ export async function structureForOneDataset(skupId: string, jobId: string) {
         }
         logToJob(jobId, 'error', `Posao prekinut: ${error.message}`)
         throw error;
+    } finally {
+        await refreshStats([skupId]);
     }
 }
 
@@ -1,45 +1,81 @@
 import { count } from "console";
 import prisma from "../../config/prisma"
 
+// Brojevi po skupu i globalni agregati dolaze iz stats_* tablica. Osvjezavaju ih funkcije u bazi
+// stats_refresh(ids) / stats_refresh_stale(): backend ih poziva nakon svojih upisa (refreshStats),
+// a scripts/createAndLoadDb.py nakon importa i refresha (rucno: createAndLoadDb.py stats).
+// Odgovori i komentari se broje po skupu podataka: odgovor bez komentara, odnosno komentar bez skupa, nije u statistici.
+
+/**
+ * Osvjezava statistiku za dane skupove podataka, odnosno (bez argumenta) za sve zastarjele.
+ * Greska se samo logira: upis koji je prethodio je vec spremljen.
+ *
+ * @param skupIds - UUID-ovi skupova ciji su se komentari ili odgovori promijenili
+ */
+export const refreshStats = async (skupIds?: string[]) => {
+    try {
+        if (skupIds) {
+            await prisma.$queryRaw`SELECT stats_refresh(${skupIds}::text[])`;
+        } else {
+            await prisma.$queryRaw`SELECT stats_refresh_stale()`;
+        }
+    } catch (error) {
+        console.error('Greška pri osvježavanju statistike:', error);
+    }
+};
+
 export const fetchData = async () => {
 
+    // Baza napunjena bez osvjezavanja (npr. iz dumpa) jos nema redova po skupu
+    const [{ filled }] = await prisma.$queryRaw<{ filled: boolean }[]>`
+        SELECT EXISTS (SELECT 1 FROM stats_skup) AS filled
+    `;
+    if (!filled) {
+        await refreshStats();
+    }
+
+    // Zbroj redova po skupu (jedan red po skupu podataka)
+    const totals = await prisma.$queryRaw<{
+        komentar_count: bigint | null;
+        obradenih_count: bigint | null;
+        odgovor_count: bigint | null;
+        failed_count: bigint | null;
+        score_sum: number | null;
+        score_count: bigint | null;
+    }[]>`
+        SELECT
+          SUM(komentar_count) AS komentar_count,
+          SUM(obradenih_count) AS obradenih_count,
+          SUM(odgovor_count) AS odgovor_count,
+          SUM(failed_count) AS failed_count,
+          SUM(score_sum) AS score_sum,
+          SUM(score_count) AS score_count
+        FROM stats_skup;
+    `;
+
+    const total = totals[0];
+
     //-------------------------------------Komentari-------------------------------------
     // Broj komentara u bazi
-    const commentCount = await prisma.komentar.count();
+    const commentCount = Number(total?.komentar_count ?? 0);
 
     // Broj obradenih komentara (onih koji imaju bar jedan odgovor)
-    const brojObradenihKomentara = await prisma.komentar.count({
-        where: {
-            odgovor: {
-                some: {},
-            },
-        },
-    });
+    const brojObradenihKomentara = Number(total?.obradenih_count ?? 0);
 
     //-------------------------------------Izdavaci-------------------------------------
-    // const authorCount = await prisma.izdavac.count();
-
-    const izdavacHisto = await prisma.izdavac.findMany({
-        select: {
-            publisher: true,
-            _count: {
-                select: {
-                    skup_podataka: true,
-                },
-            },
-        },
-        orderBy: {
-            skup_podataka: {
-                _count: 'desc',
-            },
-        },
-        take: 20,
-    });
+    const izdavacHisto = await prisma.$queryRaw<
+        { publisher: string | null; skup_count: number }[]
+    >`
+        SELECT publisher, skup_count
+          FROM stats_izdavac
+          ORDER BY skup_count DESC
+          LIMIT 20
+    `;
 
-    // Length ovog polja je jednak broju izdavaca u bazi, svaki element ima ime i broj skupova podataka
+    // Svaki element ima ime izdavaca i broj skupova podataka
     const formattedIzdavacHisto = izdavacHisto.map(r => ({
         publisher: r.publisher,
-        count: r._count.skup_podataka,
+        count: Number(r.skup_count),
     }));
 
     // console.log(formattedIzdavacHisto)
@@ -62,138 +98,83 @@ export const fetchData = async () => {
     `;
 
     // Lista najpopularnijih tema
-    const topTheme = await prisma.skup_podataka.groupBy({
-        by: ['theme'],
-        _count: {
-            theme: true,
-        },
-        where: {
-            theme: {
-                not: null,
-            },
-        },
-        orderBy: {
-            _count: {
-                theme: 'desc',
-            },
-        },
-        take: 20,
-    });
+    const topTheme = await prisma.$queryRaw<
+        { theme: string; skup_count: number }[]
+    >`
+        SELECT theme, skup_count
+          FROM stats_tema
+          ORDER BY skup_count DESC
+          LIMIT 20
+    `;
 
     const flattenedTopTheme = topTheme.map(t => ({
-        theme: t.theme!,
-        count: t._count.theme,
+        theme: t.theme,
+        count: Number(t.skup_count),
     }));
 
-    const topSkupPodataka = await prisma.skup_podataka.findMany({
-        select: {
-            id: true,
-            title: true,
-            _count: {
-                select: {
-                    komentar: true,
-                },
-            },
-        },
-        orderBy: {
-            komentar: {
-                _count: 'desc',
-            },
-        },
-        take: 20,
-    });
+    const topSkupPodataka = await prisma.$queryRaw<
+        { id: string; title: string | null; komentar_count: number }[]
+    >`
+        SELECT s.id, s.title, st.komentar_count
+          FROM stats_skup st
+          JOIN skup_podataka s ON s.id = st.skup_id
+          ORDER BY st.komentar_count DESC
+          LIMIT 20
+    `;
 
     // Lista najpopularnijih skupova podataka
     const flattenedTopSkup = topSkupPodataka.map(d => ({
         id: d.id,
         title: d.title,
-        count: d._count.komentar,
+        count: Number(d.komentar_count),
     }));
 
     // --------------------------------------Odgovori-------------------------------------
-    const odgovorCount = await prisma.odgovor.count();
+    const odgovorCount = Number(total?.odgovor_count ?? 0);
 
     // Neuspjesno obradeni komentari (oni koji imaju odgovor sa score -1)
-    const failedCount = await prisma.odgovor.count({
-        where: {
-            score: -1,
-        },
-    });
+    const failedCount = Number(total?.failed_count ?? 0);
 
     // Histogram scoreva svih odgovora (za obradjene komentare, zaokruzen na int)
     const rawHistogram = await prisma.$queryRaw<
-        { rounded_score: number; count: number }[]
+        { bucket: number; count: number }[]
     >`
-        SELECT ROUND(score::numeric, 0) AS rounded_score, COUNT(*) AS count
-          FROM odgovor
-          WHERE score != -1
-          GROUP BY rounded_score
-          ORDER BY rounded_score;
+        SELECT bucket, count
+          FROM stats_score
+          ORDER BY bucket;
     `;
 
     const scoreHistogram = rawHistogram.map(r => ({
-        score: Number(r.rounded_score),
+        score: Number(r.bucket),
         count: Number(r.count),
     }));
 
-    // Prosjecan i medijan score
+    // Prosjecan score iz zbrojeva po skupu; medijan se ne moze zbrojiti pa ide preko odgovora
+    const scoreCount = Number(total?.score_count ?? 0);
+
     const stats = await prisma.$queryRaw<
-        { avg_score: string; median_score: string }[]
+        { median_score: string }[]
     >`
         SELECT
-          ROUND(AVG(score)::numeric, 2) AS avg_score,
-          ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY score)::numeric, 2) AS median_score
-        FROM odgovor
-        WHERE score != -1;
+          ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY o.score)::numeric, 2) AS median_score
+        FROM odgovor o
+        JOIN komentar k ON k.id = o.komentar_id
+        WHERE o.score != -1 AND k.skup_id IS NOT NULL;
     `;
 
     const result = {
-        avg: Number(stats[0].avg_score),
+        avg: scoreCount ? Math.round((Number(total?.score_sum ?? 0) / scoreCount) * 100) / 100 : 0,
         median: Number(stats[0].median_score),
     };
 
-
-    // Broj izjava i koliko ih je usvojeno
-    const izjaveCounts = await prisma.$queryRaw<{
-        total: number;
-        usvojeni: number;
-    }[]>`
-        SELECT
-          COUNT(*) AS total,
-          COUNT(*) FILTER (WHERE (izj->'analysis'->>'usvojenost')::boolean = true) AS usvojeni
-        FROM (
-          SELECT message
-          FROM odgovor
-          WHERE NOT (message ? 'error')
-            AND message ? 'izjave'
-        ) AS valid_odgovor,
-        LATERAL jsonb_array_elements(valid_odgovor.message->'izjave') AS izj;
-    `;
-
-    const firstRow = izjaveCounts[0] ?? { total: 0n, usvojeni: 0n };
-
-    const izjave = {
-        total: Number(firstRow.total),
-        usvojeni: Number(firstRow.usvojeni),
-    };
-
-    // console.log(izjave);
-
     // Lista tipova izjava
     const categoryReport = await prisma.$queryRaw<{
         category: string;
-        count: bigint;
-        usvojeni: bigint;
+        count: number;
+        usvojeni: number;
     }[]>`
-        SELECT 
-            izj->>'category' AS category,
-            COUNT(*) AS count,
-            COUNT(*) FILTER (WHERE (izj->'analysis'->>'usvojenost')::boolean = true) AS usvojeni
-        FROM odgovor,
-        LATERAL jsonb_array_elements(message->'izjave') AS izj
-        WHERE NOT (message ? 'error')
-          AND message ? 'izjave'
-        GROUP BY category
+        SELECT category, count, usvojeni
+        FROM stats_kategorija
         ORDER BY count DESC;
     `;
 
@@ -204,6 +185,12 @@ export const fetchData = async () => {
         usvojeni: Number(r.usvojeni),
     }));
 
+    // Broj izjava i koliko ih je usvojeno
+    const izjave = {
+        total: report.reduce((sum, r) => sum + r.count, 0),
+        usvojeni: report.reduce((sum, r) => sum + r.usvojeni, 0),
+    };
+
     return {
         komentar: {
             total: commentCount,
@@ -26,6 +26,117 @@ SET row_security = off;
 -- *not* creating schema, since initdb creates it
 
 
+--
+-- Name: odgovor_updated_at(); Type: FUNCTION; Schema: public; Owner: -
+--
+
+CREATE FUNCTION public.odgovor_updated_at() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+        BEGIN
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END $$;
+
+
+--
+-- Name: stats_refresh(text[]); Type: FUNCTION; Schema: public; Owner: -
+--
+
+CREATE FUNCTION public.stats_refresh(skup_ids text[]) RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('stats_refresh'));
+        DELETE FROM stats_skup WHERE skup_id = ANY(skup_ids);
+        INSERT INTO stats_skup (skup_id, publisher_id, theme, komentar_count, obradenih_count,
+                               odgovor_count, failed_count, score_sum, score_count)
+       SELECT s.id, s.publisher_id, s.theme,
+              COALESCE(k.komentar_count, 0), COALESCE(k.obradenih_count, 0),
+              COALESCE(o.odgovor_count, 0), COALESCE(o.failed_count, 0),
+              COALESCE(o.score_sum, 0), COALESCE(o.score_count, 0)
+       FROM skup_podataka s
+       LEFT JOIN (
+           SELECT k.skup_id, COUNT(*) AS komentar_count,
+                  COUNT(*) FILTER (WHERE EXISTS (SELECT 1 FROM odgovor o WHERE o.komentar_id = k.id)) AS obradenih_count
+           FROM komentar k WHERE k.skup_id = ANY(skup_ids) GROUP BY k.skup_id
+       ) k ON k.skup_id = s.id
+       LEFT JOIN (
+           SELECT k.skup_id, COUNT(*) AS odgovor_count,
+                  COUNT(*) FILTER (WHERE o.score = -1) AS failed_count,
+                  SUM(o.score) FILTER (WHERE o.score <> -1) AS score_sum,
+                  COUNT(o.score) FILTER (WHERE o.score <> -1) AS score_count
+           FROM odgovor o JOIN komentar k ON k.id = o.komentar_id
+           WHERE k.skup_id = ANY(skup_ids) GROUP BY k.skup_id
+       ) o ON o.skup_id = s.id
+       WHERE s.id = ANY(skup_ids);
+        DELETE FROM stats_skup_score WHERE skup_id = ANY(skup_ids);
+        INSERT INTO stats_skup_score (skup_id, bucket, count)
+       SELECT k.skup_id, ROUND(o.score::numeric, 0)::int, COUNT(*)
+       FROM odgovor o JOIN komentar k ON k.id = o.komentar_id
+       WHERE k.skup_id = ANY(skup_ids) AND o.score <> -1
+       GROUP BY 1, 2;
+        DELETE FROM stats_skup_kategorija WHERE skup_id = ANY(skup_ids);
+        INSERT INTO stats_skup_kategorija (skup_id, category, count, usvojeni)
+       SELECT k.skup_id, izj->>'category', COUNT(*),
+              COUNT(*) FILTER (WHERE (izj->'analysis'->>'usvojenost')::boolean = true)
+       FROM odgovor o JOIN komentar k ON k.id = o.komentar_id,
+            LATERAL jsonb_array_elements(o.message->'izjave') AS izj
+       WHERE k.skup_id = ANY(skup_ids) AND NOT (o.message ? 'error') AND o.message ? 'izjave'
+       GROUP BY 1, 2;
+        DELETE FROM stats_izdavac;
+        INSERT INTO stats_izdavac (publisher_id, publisher, skup_count, komentar_count)
+       SELECT st.publisher_id, i.publisher, COUNT(*), SUM(st.komentar_count)
+       FROM stats_skup st LEFT JOIN izdavac i ON i.id = st.publisher_id
+       WHERE st.publisher_id IS NOT NULL
+       GROUP BY st.publisher_id, i.publisher;
+        DELETE FROM stats_tema;
+        INSERT INTO stats_tema (theme, skup_count, komentar_count)
+       SELECT theme, COUNT(*), SUM(komentar_count) FROM stats_skup
+       WHERE theme IS NOT NULL GROUP BY theme;
+        DELETE FROM stats_score;
+        INSERT INTO stats_score (bucket, count) SELECT bucket, SUM(count) FROM stats_skup_score GROUP BY bucket;
+        DELETE FROM stats_kategorija;
+        INSERT INTO stats_kategorija (category, count, usvojeni)
+       SELECT category, SUM(count), SUM(usvojeni) FROM stats_skup_kategorija GROUP BY category;
+        RETURN cardinality(skup_ids);
+    END $$;
+
+
+--
+-- Name: stats_refresh_stale(); Type: FUNCTION; Schema: public; Owner: -
+--
+
+CREATE FUNCTION public.stats_refresh_stale() RETURNS integer
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        RETURN stats_refresh(ARRAY(
+    SELECT s.id FROM skup_podataka s
+    WHERE NOT EXISTS (SELECT 1 FROM stats_skup st WHERE st.skup_id = s.id)
+    UNION
+    SELECT k.skup_id FROM komentar k
+    JOIN stats_skup st ON st.skup_id = k.skup_id
+    GROUP BY k.skup_id, st.komentar_count, st.refreshed_at
+    HAVING COUNT(*) <> st.komentar_count OR MAX(k.created) > st.refreshed_at
+    UNION
+    SELECT k.skup_id FROM odgovor o
+    JOIN komentar k ON k.id = o.komentar_id
+    JOIN stats_skup st ON st.skup_id = k.skup_id
+    GROUP BY k.skup_id, st.odgovor_count, st.refreshed_at
+    HAVING COUNT(*) <> st.odgovor_count OR MAX(COALESCE(o.updated_at, o.created)) > st.refreshed_at
+    UNION
+    SELECT st.skup_id FROM stats_skup st
+    WHERE st.komentar_count > 0 AND NOT EXISTS (SELECT 1 FROM komentar k WHERE k.skup_id = st.skup_id)
+    UNION
+    SELECT st.skup_id FROM stats_skup st
+    WHERE st.odgovor_count > 0 AND NOT EXISTS (
+        SELECT 1 FROM odgovor o JOIN komentar k ON k.id = o.komentar_id WHERE k.skup_id = st.skup_id
+    )
+));
+    END $$;
+
+
 SET default_tablespace = '';
 
 SET default_table_access_method = heap;
@@ -97,7 +208,8 @@ CREATE TABLE public.odgovor (
     komentar_id bigint,
     created timestamp without time zone,
     message jsonb,
-    score double precision
+    score double precision,
+    updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
 );
 
 
@@ -137,7 +249,24 @@ CREATE TABLE public.resurs (
     mimetype text,
     state text,
     size integer,
-    url text
+    url text,
+    url_status integer,
+    url_ok boolean,
+    url_latency_ms integer,
+    url_error text,
+    url_checked_at timestamp without time zone,
+    content_hash text
+);
+
+
+--
+-- Name: schema_version; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.schema_version (
+    version integer NOT NULL,
+    description text,
+    applied_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
 );
 
 
@@ -163,7 +292,8 @@ CREATE TABLE public.skup_podataka (
     publisher_id text,
     tags jsonb,
     fetched_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL,
-    last_analysis timestamp without time zone
+    last_analysis timestamp without time zone,
+    content_hash text
 );
 
 
@@ -180,6 +310,102 @@ CREATE TABLE public.slika (
 );
 
 
+--
+-- Name: stats_izdavac; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_izdavac (
+    publisher_id text NOT NULL,
+    publisher text,
+    skup_count integer NOT NULL,
+    komentar_count integer NOT NULL
+);
+
+
+--
+-- Name: stats_kategorija; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_kategorija (
+    category text,
+    count integer NOT NULL,
+    usvojeni integer NOT NULL
+);
+
+
+--
+-- Name: stats_score; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_score (
+    bucket integer NOT NULL,
+    count integer NOT NULL
+);
+
+
+--
+-- Name: stats_skup; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_skup (
+    skup_id text NOT NULL,
+    publisher_id text,
+    theme text,
+    komentar_count integer NOT NULL,
+    obradenih_count integer NOT NULL,
+    odgovor_count integer NOT NULL,
+    failed_count integer NOT NULL,
+    score_sum double precision NOT NULL,
+    score_count integer NOT NULL,
+    refreshed_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+
+--
+-- Name: stats_skup_kategorija; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_skup_kategorija (
+    skup_id text,
+    category text,
+    count integer NOT NULL,
+    usvojeni integer NOT NULL
+);
+
+
+--
+-- Name: stats_skup_score; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_skup_score (
+    skup_id text NOT NULL,
+    bucket integer NOT NULL,
+    count integer NOT NULL
+);
+
+
+--
+-- Name: stats_tema; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.stats_tema (
+    theme text NOT NULL,
+    skup_count integer NOT NULL,
+    komentar_count integer NOT NULL
+);
+
+
+--
+-- Name: uvoz_backup; Type: TABLE; Schema: public; Owner: -
+--
+
+CREATE TABLE public.uvoz_backup (
+    fingerprint text NOT NULL,
+    filename text,
+    imported_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+
+
 --
 -- Name: komentar id; Type: DEFAULT; Schema: public; Owner: -
 --
@@ -194,6 +420,19 @@ ALTER TABLE ONLY public.komentar ALTER COLUMN id SET DEFAULT nextval('public.kom
 ALTER TABLE ONLY public.odgovor ALTER COLUMN id SET DEFAULT nextval('public.odgovor_id_seq'::regclass);
 
 
+--
+-- Data for Name: schema_version; Type: TABLE DATA; Schema: public; Owner: -
+--
+
+INSERT INTO public.schema_version (version, description) VALUES (1, 'base tables');
+INSERT INTO public.schema_version (version, description) VALUES (2, 'komentar import keys and id sequence');
+INSERT INTO public.schema_version (version, description) VALUES (3, 'dataset freshness and content hashes');
+INSERT INTO public.schema_version (version, description) VALUES (4, 'resource URL checks');
+INSERT INTO public.schema_version (version, description) VALUES (5, 'odgovor score and JSON message');
+INSERT INTO public.schema_version (version, description) VALUES (6, 'statistics rollups');
+INSERT INTO public.schema_version (version, description) VALUES (7, 'odgovor updated_at and statistics refresh functions');
+
+
 --
 -- Name: izdavac izdavac_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -226,6 +465,14 @@ ALTER TABLE ONLY public.resurs
     ADD CONSTRAINT resurs_pkey PRIMARY KEY (id);
 
 
+--
+-- Name: schema_version schema_version_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.schema_version
+    ADD CONSTRAINT schema_version_pkey PRIMARY KEY (version);
+
+
 --
 -- Name: skup_podataka skup_podataka_pkey; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -242,6 +489,54 @@ ALTER TABLE ONLY public.slika
     ADD CONSTRAINT slika_pkey PRIMARY KEY (komentar_id, content_hash);
 
 
+--
+-- Name: stats_izdavac stats_izdavac_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_izdavac
+    ADD CONSTRAINT stats_izdavac_pkey PRIMARY KEY (publisher_id);
+
+
+--
+-- Name: stats_score stats_score_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_score
+    ADD CONSTRAINT stats_score_pkey PRIMARY KEY (bucket);
+
+
+--
+-- Name: stats_skup stats_skup_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_skup
+    ADD CONSTRAINT stats_skup_pkey PRIMARY KEY (skup_id);
+
+
+--
+-- Name: stats_skup_score stats_skup_score_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_skup_score
+    ADD CONSTRAINT stats_skup_score_pkey PRIMARY KEY (skup_id, bucket);
+
+
+--
+-- Name: stats_tema stats_tema_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_tema
+    ADD CONSTRAINT stats_tema_pkey PRIMARY KEY (theme);
+
+
+--
+-- Name: uvoz_backup uvoz_backup_pkey; Type: CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.uvoz_backup
+    ADD CONSTRAINT uvoz_backup_pkey PRIMARY KEY (fingerprint);
+
+
 --
 -- Name: komentar unique_alternative_key; Type: CONSTRAINT; Schema: public; Owner: -
 --
@@ -250,6 +545,34 @@ ALTER TABLE ONLY public.komentar
     ADD CONSTRAINT unique_alternative_key UNIQUE (import_id);
 
 
+--
+-- Name: idx_komentar_created; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_komentar_created ON public.komentar USING btree (created);
+
+
+--
+-- Name: idx_komentar_skup_id; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_komentar_skup_id ON public.komentar USING btree (skup_id);
+
+
+--
+-- Name: idx_odgovor_komentar_id; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_odgovor_komentar_id ON public.odgovor USING btree (komentar_id);
+
+
+--
+-- Name: idx_resurs_skup_id; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_resurs_skup_id ON public.resurs USING btree (skup_id);
+
+
 --
 -- Name: idx_skup_tags; Type: INDEX; Schema: public; Owner: -
 --
@@ -257,6 +580,13 @@ ALTER TABLE ONLY public.komentar
 CREATE INDEX idx_skup_tags ON public.skup_podataka USING gin (tags);
 
 
+--
+-- Name: idx_stats_skup_kategorija_skup_id; Type: INDEX; Schema: public; Owner: -
+--
+
+CREATE INDEX idx_stats_skup_kategorija_skup_id ON public.stats_skup_kategorija USING btree (skup_id);
+
+
 --
 -- Name: komentar_import_unique; Type: INDEX; Schema: public; Owner: -
 --
@@ -264,6 +594,13 @@ CREATE INDEX idx_skup_tags ON public.skup_podataka USING gin (tags);
 CREATE UNIQUE INDEX komentar_import_unique ON public.komentar USING btree (import_source, import_id) WHERE (import_id IS NOT NULL);
 
 
+--
+-- Name: odgovor odgovor_updated_at; Type: TRIGGER; Schema: public; Owner: -
+--
+
+CREATE TRIGGER odgovor_updated_at BEFORE UPDATE ON public.odgovor FOR EACH ROW EXECUTE FUNCTION public.odgovor_updated_at();
+
+
 --
 -- Name: komentar komentar_skup_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
 --
@@ -288,6 +625,30 @@ ALTER TABLE ONLY public.resurs
     ADD CONSTRAINT resurs_skup_id_fkey FOREIGN KEY (skup_id) REFERENCES public.skup_podataka(id) ON DELETE CASCADE;
 
 
+--
+-- Name: stats_skup_kategorija stats_skup_kategorija_skup_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_skup_kategorija
+    ADD CONSTRAINT stats_skup_kategorija_skup_id_fkey FOREIGN KEY (skup_id) REFERENCES public.skup_podataka(id) ON DELETE CASCADE;
+
+
+--
+-- Name: stats_skup stats_skup_skup_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_skup
+    ADD CONSTRAINT stats_skup_skup_id_fkey FOREIGN KEY (skup_id) REFERENCES public.skup_podataka(id) ON DELETE CASCADE;
+
+
+--
+-- Name: stats_skup_score stats_skup_score_skup_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
+--
+
+ALTER TABLE ONLY public.stats_skup_score
+    ADD CONSTRAINT stats_skup_score_skup_id_fkey FOREIGN KEY (skup_id) REFERENCES public.skup_podataka(id) ON DELETE CASCADE;
+
+
 --
 -- Name: skup_podataka skup_podataka_publisher_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: -
 --
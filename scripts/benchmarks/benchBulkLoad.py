@@ -0,0 +1,87 @@
+"""
+Usporedba punjenja baze: execute_values po tablici vs COPY u staging tablice (bulk_load).
+
+Treba pokrenuti PostgreSQL (get_connection); sve se radi u privremenoj shemi koja se na kraju brise.
+
+    python scripts/benchmarks/benchBulkLoad.py --posts 50000
+"""
+import argparse, os, sys, time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from createAndLoadDb import (
+    IMPORT_SOURCE, Izdavac, Komentar, Slika, get_connection, create_postgres_tables, bulk_load, make_resurs, make_skup,
+    insert_izdavac, insert_skup_podataka, insert_resurs, insert_komentar, insert_slika,
+)
+
+SCHEMA = "bench_bulk_load"
+
+def synthetic_rows(posts, message_size):
+    publishers = {f"org-{i}": Izdavac(f"org-{i}", f"Izdavac {i}", "Opis") for i in range(max(1, posts // 500))}
+    datasets = {}
+    resources = []
+    for i in range(max(1, posts // 20)):
+        dataset_id = f"skup-{i}"
+        datasets[dataset_id] = make_skup(
+            dataset_id, f"Skup {i}", "godisnje", "Gospodarstvo", "Opis skupa\tsa\nznakovima",
+            f"https://data.gov.hr/ckan/dataset/skup-{i}", "active", "2021-05-05T11:47:30.254500", "2023-01-01T10:00:00",
+            True, None, "CC BY", None, "cc-by", f"org-{i % len(publishers)}", ["a", "b"],
+        )
+        for r in range(3):
+            resources.append(make_resurs(
+                f"res-{i}-{r}", dataset_id, r == 0, f"Resurs {r}", "", "2021-05-05T11:47:30", None,
+                "CSV", "text/csv", "active", 1024, f"https://example.org/{i}/{r}.csv",
+            ))
+    start = datetime(2023, 1, 1)
+    message = "<p>" + ("Lorem ipsum dolor sit amet " * (message_size // 27 + 1))[:message_size] + "</p>"
+    discussions = [
+        Komentar(i, i % 97, f"skup-{i % len(datasets)}", start + timedelta(minutes=i), f"Tema {i}", message, IMPORT_SOURCE)
+        for i in range(1, posts + 1)
+    ]
+    files = [
+        Slika(i, f"{i:040x}", f"slika{i}.png", "image/png", start + timedelta(minutes=i))
+        for i in range(1, posts + 1, 5)
+    ]
+    return publishers, datasets, resources, discussions, files
+
+def load_values(conn, publishers, datasets, resources, discussions, files):
+    insert_izdavac(conn, publishers)
+    insert_skup_podataka(conn, datasets)
+    insert_resurs(conn, resources)
+    insert_komentar(conn, discussions)
+    insert_slika(conn, files)
+
+def reset(conn):
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE slika, komentar, resurs, skup_podataka, izdavac CASCADE")
+    conn.commit()
+
+def main(args):
+    data = synthetic_rows(args.posts, args.message_size)
+    rows = sum(len(part) for part in data)
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+        conn.commit()
+        create_postgres_tables(conn)
+
+        for name, loader in (("values", load_values), ("copy", bulk_load)):
+            for _ in range(args.repeat):
+                reset(conn)
+                start = time.perf_counter()
+                loader(conn, *data)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<7} rows={rows:<8} time={elapsed:8.3f}s  rows/s={rows / elapsed:10.0f}")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark execute_values vs COPY loading")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--message-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=2)
+    main(parser.parse_args())
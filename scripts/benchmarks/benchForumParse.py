@@ -0,0 +1,67 @@
+"""
+Usporedba memorije i brzine: ET.parse + findall (stari nacin) vs iter_posts (streaming).
+
+    python scripts/benchmarks/benchForumParse.py --posts 20000 --message-size 2000
+"""
+import argparse, os, sys, time, tempfile, tracemalloc
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from moodleBackup import iter_posts
+
+def write_forum_xml(path, posts, message_size, posts_per_discussion=20):
+    body = escape("<p>" + ("Lorem ipsum dolor sit amet " * (message_size // 27 + 1))[:message_size] + "</p>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<activity><forum><discussions>\n')
+        for i in range(posts):
+            if i % posts_per_discussion == 0:
+                if i:
+                    f.write("</posts></discussion>\n")
+                f.write(f'<discussion id="{i}"><posts>\n')
+            f.write(
+                f'<post id="{i + 1}"><userid>{i % 97}</userid><created>{1700000000 + i}</created>'
+                f'<subject>Tema {i}</subject><message>{body}</message></post>\n'
+            )
+        if posts:
+            f.write("</posts></discussion>\n")
+        f.write("</discussions></forum></activity>\n")
+
+def tree_walk(path):
+    root = ET.parse(path).getroot()
+    count = 0
+    for discussion in root.findall(".//discussion"):
+        for post in discussion.findall(".//post"):
+            post.findtext("message")
+            count += 1
+    return count
+
+def stream_walk(path):
+    count = 0
+    for post in iter_posts(path):
+        post.findtext("message")
+        count += 1
+    return count
+
+def measure(name, fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} posts={count:<8} time={elapsed:8.3f}s  posts/s={count / elapsed:10.0f}  peak={peak / 2**20:8.1f} MiB")
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "forum.xml")
+        write_forum_xml(path, args.posts, args.message_size)
+        print(f"forum.xml: {os.path.getsize(path) / 2**20:.1f} MiB")
+        measure("tree", tree_walk, path)
+        measure("stream", stream_walk, path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark forum.xml parsing")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--message-size", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+"""
+Benchmark cijelog uvoza na sintetickim backupima (generateMbz.py) i lokalnom CKAN-u (tests/fakeCkan.py).
+
+Za svaku velicinu mjeri otvaranje backupa, extract_data, extract_img_data, clean, resolve_datasets,
+load_files_mapping, load_discussions + generate_forum_pages i (s --db) punjenje baze.
+
+    python scripts/benchmarks/benchImport.py --sizes 1000,5000,20000
+    python scripts/benchmarks/benchImport.py --sizes 20000 --db --json bench.json
+"""
+import argparse, contextlib, io, json, os, sys, tempfile, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "tests"))
+sys.path.insert(0, HERE)
+from generateMbz import write_mbz
+from fakeCkan import FakeCkan, make_package
+from moodleBackup import MoodleBackup, iter_posts
+from htmlSanitizer import clean
+import createAndLoadDb as db
+
+SCHEMA = "bench_import"
+
+def timed(results, size, stage, items, fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    results.append({"posts": size, "stage": stage, "items": items, "seconds": elapsed})
+    rate = items / elapsed if elapsed else float("inf")
+    print(f"{size:>8} {stage:<22} {items:>8} {elapsed:9.3f}s {rate:12.0f}/s")
+    return value
+
+def open_backup(path):
+    MoodleBackup(path).close()
+
+def clean_all(texts):
+    for text in texts:
+        clean(text)
+
+def render_pages(extract_moodle, forum_xml, files_map):
+    discussions = extract_moodle.load_discussions(forum_xml, files_map)
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_moodle.generate_forum_pages(discussions)
+    return discussions
+
+def load_database(conn, loader, data):
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE slika, komentar, resurs, skup_podataka, izdavac CASCADE")
+    conn.commit()
+    if loader == "copy":
+        db.bulk_load(conn, *data)
+    else:
+        db.insert_izdavac(conn, data[0])
+        db.insert_skup_podataka(conn, data[1])
+        db.insert_resurs(conn, data[2])
+        db.insert_komentar(conn, data[3])
+        db.insert_slika(conn, data[4])
+
+def bench_size(size, args, results, conn, extract_moodle):
+    path = os.path.abspath(f"synthetic-{size}.mbz")
+    file_count = max(1, size // 5)
+    backup = write_mbz(
+        path, posts=size, discussions=max(1, size // 20), files=file_count,
+        link_density=args.link_density, datasets=max(1, size // 20), message_size=args.message_size, seed=size,
+    )
+    packages = {identifier: make_package(identifier, organization=f"org-{i % 10}") for i, identifier in enumerate(backup["datasets"])}
+
+    timed(results, size, "open", 1, open_backup, path)
+    with MoodleBackup(path) as mbz:
+        dataset_links, post_datasets, seen_posts = {}, {}, set()
+        discussions = timed(results, size, "extract_data", size, db.extract_data, mbz.forum_xml(), dataset_links, post_datasets, seen_posts)
+        files = timed(results, size, "extract_img_data", file_count, db.extract_img_data, mbz.files_xml(), seen_posts)
+
+        texts = [post.findtext("message") or "" for post in iter_posts(mbz.forum_xml())]
+        timed(results, size, "clean", len(texts), clean_all, texts)
+
+        datasets, resources, publishers = {}, [], {}
+        with FakeCkan(packages) as ckan:
+            timed(results, size, "resolve_datasets", len(dataset_links), db.resolve_datasets,
+                  dataset_links, datasets, resources, publishers, ckan_url=ckan.url, workers=args.ckan_workers)
+        db.link_discussions(discussions, post_datasets, datasets)
+
+        files_map = timed(results, size, "load_files_mapping", file_count, extract_moodle.load_files_mapping, mbz.files_xml(), mbz)
+        timed(results, size, "generate_forum_pages", size, render_pages, extract_moodle, mbz.forum_xml(), files_map)
+
+    if conn is not None:
+        discussions = [d for d in discussions if d.skup_id is not None]
+        valid = {d.import_id for d in discussions}
+        data = (publishers, datasets, resources, discussions, [f for f in files if f.import_id in valid])
+        rows = sum(len(part) for part in data)
+        for loader in ("values", "copy"):
+            timed(results, size, f"db_{loader}", rows, load_database, conn, loader, data)
+    os.remove(path)
+
+def main(args):
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = []
+    conn = None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # extractMoodle pise u ./forum_export (i stvara ga vec pri importu)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            import extractMoodle
+
+            if args.db:
+                conn = db.get_connection()
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+                conn.commit()
+                db.create_postgres_tables(conn)
+
+            print(f"{'posts':>8} {'stage':<22} {'items':>8} {'time':>10} {'rate':>14}")
+            for size in sizes:
+                bench_size(size, args, results, conn, extractMoodle)
+        finally:
+            if conn is not None:
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+                conn.commit()
+                conn.close()
+            os.chdir(cwd)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import scripts on synthetic Moodle backups")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="Comma separated post counts")
+    parser.add_argument("--message-size", type=int, default=800)
+    parser.add_argument("--link-density", type=float, default=0.3)
+    parser.add_argument("--ckan-workers", type=int, default=8)
+    parser.add_argument("--db", action="store_true", help="Also benchmark DB loading (needs PostgreSQL, uses a temporary schema)")
+    parser.add_argument("--json", help="Write results as JSON for tracking regressions", type=str)
+    main(parser.parse_args())
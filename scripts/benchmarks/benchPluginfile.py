@@ -0,0 +1,64 @@
+"""
+Usporedba prepisivanja @@PLUGINFILE@@ referenci: stari replace_images (dva str.replace po prilogu)
+vs jedan prolaz s indeksom po komentaru.
+
+    python scripts/benchmarks/benchPluginfile.py --posts 2000 --attachments 30
+"""
+import argparse, os, random, sys, tempfile, time, urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def old_replace_images(message, postid, files_map):
+    if postid not in files_map:
+        return message
+    for original_name, relative_path in files_map[postid].items():
+        original_name_enc = urllib.parse.quote(original_name)
+        message = message.replace(f"@@PLUGINFILE@@/{original_name}", relative_path)
+        message = message.replace(f"@@PLUGINFILE@@/{original_name_enc}", relative_path)
+    return message
+
+def make_posts(rng, posts, attachments, message_size):
+    files_map = {}
+    messages = []
+    filler = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * (message_size // 57 + 1) + "</p>"
+    for postid in map(str, range(1, posts + 1)):
+        names = [f"slika {postid}-{i}.png" for i in range(attachments)]
+        files_map[postid] = {name: f"../images/{rng.getrandbits(160):040x}.png" for name in names}
+        parts = [filler]
+        for name in names:
+            parts.append(f'<p><img src="@@PLUGINFILE@@/{urllib.parse.quote(name)}" alt="" width="300"></p>')
+            parts.append(filler)
+        messages.append((postid, "".join(parts)))
+    return files_map, messages
+
+def measure(name, fn, messages, files_map):
+    start = time.perf_counter()
+    output = [fn(message, postid, files_map) for postid, message in messages]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {elapsed:8.3f} s  {len(messages) / elapsed:10.0f} posts/s")
+    return output, elapsed
+
+def main(args):
+    # extractMoodle pri importu stvara ./forum_export
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            from extractMoodle import replace_images
+        finally:
+            os.chdir(cwd)
+
+    files_map, messages = make_posts(random.Random(args.seed), args.posts, args.attachments, args.message_size)
+    old, old_time = measure("old", old_replace_images, messages, files_map)
+    new, new_time = measure("one-pass", replace_images, messages, files_map)
+    if old != new:
+        print("[Warning]: outputs differ")
+    print(f"speedup  {old_time / new_time:8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark @@PLUGINFILE@@ rewriting")
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--attachments", type=int, default=30, help="Attachments per post")
+    parser.add_argument("--message-size", type=int, default=500, help="Text between attachments, in characters")
+    parser.add_argument("--seed", type=int, default=12)
+    main(parser.parse_args())
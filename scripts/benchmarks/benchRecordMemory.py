@@ -0,0 +1,94 @@
+"""
+Memorija po retku uvoza: dict po retku + kopija u tuple pri upisu (stari nacin) vs NamedTuple zapisi (Komentar, Slika, ...).
+
+Redovi dolaze iz sintetickog backupa (generateMbz.py) i lokalnih CKAN paketa (tests/fakeCkan.py).
+Mjeri se samo struktura retka: vrijednosti (stringovi, datumi) su iste u oba nacina.
+
+    python scripts/benchmarks/benchRecordMemory.py --posts 100000 --datasets 5000
+"""
+import argparse, contextlib, gc, io, os, sys, tempfile, tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "..", "tests"))
+sys.path.insert(0, HERE)
+from generateMbz import write_mbz
+from fakeCkan import make_package
+from moodleBackup import MoodleBackup
+import createAndLoadDb as db
+
+# Kljucevi dictova koje je uvoz prije gradio (komentar bez import stupaca, skup i resurs bez content_hash)
+LEGACY_KEYS = {
+    "izdavac": db.Izdavac._fields,
+    "skup_podataka": db.Skup._fields[:-1],
+    "resurs": db.Resurs._fields[:-1],
+    "komentar": db.Komentar._fields[:6],
+    "slika": db.Slika._fields,
+}
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return result, size
+
+def legacy_rows(records, keys):
+    return [{key: value for key, value in zip(keys, record)} for record in records]
+
+def legacy_copy(rows, columns):
+    # insert_* je prije prepisivao svaki dict u tuple stupaca
+    return [tuple(row.get(column) for column in columns) for row in rows]
+
+def synthetic_records(args, tmp):
+    path = os.path.join(tmp, "synthetic.mbz")
+    write_mbz(path, posts=args.posts, discussions=max(1, args.posts // 20), files=max(1, args.posts // 5),
+              link_density=0.5, datasets=args.datasets, message_size=args.message_size)
+    with MoodleBackup(path) as mbz:
+        seen_posts = set()
+        komentari = db.extract_data(mbz.forum_xml(), {}, {}, seen_posts)
+        slike = db.extract_img_data(mbz.files_xml(), seen_posts)
+
+    datasets, resources, publishers = {}, [], {}
+    for i in range(args.datasets):
+        identifier = f"skup-{i}"
+        db.add_dataset(identifier, f"https://data.gov.hr/ckan/dataset/{identifier}",
+                       make_package(identifier, resources=3, organization=f"org-{i % 50}"), datasets, resources, publishers)
+    return {
+        "izdavac": list(publishers.values()),
+        "skup_podataka": list(datasets.values()),
+        "resurs": resources,
+        "komentar": komentari,
+        "slika": slike,
+    }
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            tables = synthetic_records(args, tmp)
+
+    print(f"{'table':<14} {'rows':>8} {'dict B/row':>11} {'+copy B/row':>12} {'record B/row':>13} {'saved':>7}")
+    for table, records in tables.items():
+        if not records:
+            continue
+        record_type = type(records[0])
+        values = [tuple(record) for record in records]
+        # Stari nacin: dictovi se drze do kraja uvoza, a pri upisu nastaje jos i lista tupleova
+        rows, dict_size = traced(lambda: legacy_rows(values, LEGACY_KEYS[table]))
+        _, copy_size = traced(lambda: legacy_copy(rows, record_type._fields))
+        del rows
+        _, record_size = traced(lambda: [record_type._make(v) for v in values])
+
+        n = len(records)
+        before = (dict_size + copy_size) / n
+        after = record_size / n
+        print(f"{table:<14} {n:>8} {dict_size / n:>11.0f} {before:>12.0f} {after:>13.0f} {1 - after / before:>6.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory per row: dict rows vs NamedTuple records")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--datasets", type=int, default=2000)
+    parser.add_argument("--message-size", type=int, default=500)
+    main(parser.parse_args())
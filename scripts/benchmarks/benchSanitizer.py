@@ -0,0 +1,83 @@
+"""
+Propusnost ciscenja poruka (posts/sec): BeautifulSoup + stari clean() vs htmlSanitizer.
+
+    python scripts/benchmarks/benchSanitizer.py --posts 5000 --message-size 2000
+"""
+import argparse, html, os, random, re, sys, time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from htmlSanitizer import sanitize_message
+
+def old_clean(text):
+    if not text:
+        return ""
+    replacements = {
+        "\u2013": "-", "\u2014": "-",
+        "\u2212": "-", "\u2018": "'",
+        "\u2019": "'", "\u201C": '"',
+        "\u201D": '"', "\u2026": "...",
+        "\u00A0": " ", "\u200B": "",
+    }
+    for bad, good in replacements.items():
+        text = text.replace(bad, good)
+    text = ''.join(c for c in text if c.isprintable())
+    text = re.sub(r'[\u2000-\u200F\u202A-\u202F\u205F\u3000]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def old_sanitize(message):
+    soup = BeautifulSoup(html.unescape(message), features="html.parser")
+    for tag in soup(["script", "style", "noscript", "img"]):
+        tag.decompose()
+    for elem in soup.find_all(string=True):
+        elem.replace_with(old_clean(elem))
+    for tag in soup.find_all():
+        tag.attrs = {}
+    return str(soup)
+
+WORDS = ["skup", "podataka", "nema", "opisa", "Ministarstvo", "–", "“navodnici”", "što", "županija", "&amp;"]
+
+def make_message(rng, size):
+    parts = []
+    length = 0
+    while length < size:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 15)))
+        block = rng.choice((
+            f'<p dir="ltr" style="text-align: left;">{words}</p>',
+            f'<p>{words} <a href="https://data.gov.hr/ckan/dataset/skup-{rng.randint(1, 500)}">poveznica</a></p>',
+            f'<p>{words}<br><img src="@@PLUGINFILE@@/slika.png" alt="" width="300"></p>',
+            f'<ul><li>{words}</li><li>{words}</li></ul>',
+        ))
+        parts.append(block)
+        length += len(block)
+    return "".join(parts)
+
+def measure(name, fn, messages):
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    elapsed = time.perf_counter() - start
+    rate = len(messages) / elapsed
+    print(f"{name:<10} {elapsed:8.2f} s  {rate:10.0f} posts/s")
+    return rate
+
+def main(args):
+    rng = random.Random(args.seed)
+    messages = [make_message(rng, args.message_size) for _ in range(args.posts)]
+
+    mismatches = sum(old_sanitize(m) != sanitize_message(m) for m in messages[:200])
+    if mismatches:
+        print(f"[Warning]: {mismatches} of 200 messages differ between implementations")
+
+    old = measure("bs4", old_sanitize, messages)
+    new = measure("sanitizer", sanitize_message, messages)
+    print(f"speedup    {new / old:8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark post message sanitization")
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--message-size", type=int, default=2000, help="Approximate message length in characters")
+    parser.add_argument("--seed", type=int, default=8)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,201 @@
+"""
+Generator sintetickih Moodle .mbz backupa (forum.xml, files.xml i blobovi u files/<xx>/<hash>).
+
+    python scripts/benchmarks/generateMbz.py -o synthetic.mbz --discussions 200 --posts 5000 --files 1000
+    python scripts/benchmarks/generateMbz.py -o synthetic.mbz --serve-ckan
+
+S --serve-ckan se nakon pisanja pokrene lokalni CKAN (tests/fakeCkan.py) sa svim skupovima
+na koje poruke pokazuju, pa se createAndLoadDb.py moze pokrenuti s --ckan-url bez mreze.
+"""
+import argparse, hashlib, io, os, random, struct, sys, tarfile, time, zlib
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests"))
+
+DATASET_URL = "https://data.gov.hr/ckan/dataset/{}"
+WORDS = (
+    "skup", "podataka", "nema", "opisa", "poveznica", "ne", "radi", "Ministarstvo", "županija", "što",
+    "datoteka", "CSV", "nedostaju", "stupci", "ažurirano", "zadnji", "put", "–", "“podaci”", "&",
+)
+
+def make_png(width, height, seed):
+    """Minimalan ispravan PNG (RGB, bez kompresijskih trikova) kako bi ga PIL prepoznao."""
+    rng = random.Random(seed)
+    color = bytes(rng.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + color * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+def make_pdf(seed):
+    return b"%PDF-1.4\n% synthetic " + str(seed).encode() + b"\n%%EOF\n"
+
+def make_message(rng, size, attachments, dataset):
+    parts = []
+    length = 0
+    while length < size:
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+        block = rng.choice((
+            f"<p>{escape(words)}</p>",
+            f'<p dir="ltr" style="text-align: left;">{escape(words)}<br></p>',
+            f"<ul><li>{escape(words)}</li></ul>",
+        ))
+        parts.append(block)
+        length += len(block)
+    if dataset:
+        url = DATASET_URL.format(dataset)
+        parts.insert(rng.randrange(len(parts) + 1), f'<p>Skup: <a href="{url}">{url}</a></p>')
+    for filename in attachments:
+        if filename.endswith(".png"):
+            parts.append(f'<p><img src="@@PLUGINFILE@@/{filename}" alt="" width="300" class="img-fluid"></p>')
+        else:
+            parts.append(f'<p><a href="@@PLUGINFILE@@/{filename}">{filename}</a></p>')
+    return "".join(parts)
+
+def generate(discussions=50, posts=1000, files=200, link_density=0.3, datasets=50, message_size=800,
+             image_ratio=0.8, seed=0, start_id=1):
+    """
+    Build the content of a synthetic backup.
+
+    Returns a dict with forum_xml and files_xml (str), blobs ({contenthash: bytes}) and
+    datasets (identifiers linked from at least one post), so the same seed always gives
+    the same archive.
+    """
+    rng = random.Random(seed)
+    dataset_pool = [f"skup-{seed}-{i}" for i in range(max(1, datasets))]
+    post_ids = list(range(start_id, start_id + posts))
+    created = 1700000000
+
+    # Prilozi se dijele nasumicno po komentarima; isti sadrzaj moze biti u vise komentara
+    attachments = {}
+    blobs = {}
+    file_rows = []
+    for i in range(files):
+        post_id = rng.choice(post_ids) if post_ids else start_id
+        if i and rng.random() < 0.1:
+            content = rng.choice(list(blobs.values()))
+        elif rng.random() < image_ratio:
+            content = make_png(rng.randint(1, 64), rng.randint(1, 64), seed * 1000003 + i)
+        else:
+            content = make_pdf(seed * 1000003 + i)
+        contenthash = hashlib.sha1(content).hexdigest()
+        blobs[contenthash] = content
+        ext = "png" if content.startswith(b"\x89PNG") else "pdf"
+        filename = f"prilog {i}.{ext}" if rng.random() < 0.2 else f"prilog_{i}.{ext}"
+        attachments.setdefault(post_id, []).append(filename)
+        file_rows.append((i, post_id, contenthash, filename, "image/png" if ext == "png" else "application/pdf", len(content)))
+
+    linked = set()
+    forum = ['<?xml version="1.0" encoding="UTF-8"?>\n<activity id="1" moduleid="1" modulename="forum" contextid="1">\n',
+             '  <forum id="1">\n    <type>general</type>\n    <name>Sinteticki forum</name>\n    <discussions>\n']
+    per_discussion = max(1, -(-posts // max(1, discussions)))
+    for d in range(0, posts, per_discussion):
+        discussion_posts = post_ids[d:d + per_discussion]
+        forum.append(f'      <discussion id="{d // per_discussion + 1}">\n'
+                     f'        <name>Tema {d // per_discussion + 1}</name>\n        <posts>\n')
+        for n, post_id in enumerate(discussion_posts):
+            dataset = rng.choice(dataset_pool) if rng.random() < link_density else None
+            if dataset:
+                linked.add(dataset)
+            encoded_names = [name.replace(" ", "%20") for name in attachments.get(post_id, [])]
+            message = make_message(rng, message_size, encoded_names, dataset)
+            created += rng.randint(1, 3600)
+            forum.append(
+                f'          <post id="{post_id}">\n'
+                f'            <parent>{0 if n == 0 else discussion_posts[0]}</parent>\n'
+                f'            <userid>{rng.randint(2, 500)}</userid>\n'
+                f'            <created>{created}</created>\n'
+                f'            <modified>{created}</modified>\n'
+                f'            <subject>{escape(("Re: " if n else "") + f"Tema {d // per_discussion + 1}")}</subject>\n'
+                f'            <message>{escape(message)}</message>\n'
+                f'            <messageformat>1</messageformat>\n'
+                f'          </post>\n'
+            )
+        forum.append("        </posts>\n      </discussion>\n")
+    forum.append("    </discussions>\n  </forum>\n</activity>\n")
+
+    xml_files = ['<?xml version="1.0" encoding="UTF-8"?>\n<files>\n']
+    for i, post_id, contenthash, filename, mimetype, size in file_rows:
+        # Moodle uz svaki prilog zapisuje i zapis za direktorij "."
+        xml_files.append(
+            f'  <file id="{2 * i + 1}">\n'
+            f'    <contenthash>da39a3ee5e6b4b0d3255bfef95601890afd80709</contenthash>\n'
+            f'    <component>mod_forum</component>\n    <filearea>attachment</filearea>\n'
+            f'    <itemid>{post_id}</itemid>\n    <filepath>/</filepath>\n    <filename>.</filename>\n'
+            f'    <filesize>0</filesize>\n    <mimetype>$@NULL@$</mimetype>\n'
+            f'    <timecreated>{created}</timecreated>\n  </file>\n'
+            f'  <file id="{2 * i + 2}">\n'
+            f'    <contenthash>{contenthash}</contenthash>\n'
+            f'    <component>mod_forum</component>\n    <filearea>post</filearea>\n'
+            f'    <itemid>{post_id}</itemid>\n    <filepath>/</filepath>\n    <filename>{escape(filename)}</filename>\n'
+            f'    <filesize>{size}</filesize>\n    <mimetype>{mimetype}</mimetype>\n'
+            f'    <timecreated>{created}</timecreated>\n  </file>\n'
+        )
+    xml_files.append("</files>\n")
+
+    return {
+        "forum_xml": "".join(forum),
+        "files_xml": "".join(xml_files),
+        "blobs": blobs,
+        "datasets": sorted(linked),
+    }
+
+def write_mbz(path, compress=True, **kwargs):
+    """Write a synthetic backup to path (tar.gz like Moodle, or plain tar) and return generate()'s result."""
+    backup = generate(**kwargs)
+    members = [
+        ("moodle_backup.xml", b'<?xml version="1.0" encoding="UTF-8"?>\n<moodle_backup></moodle_backup>\n'),
+        ("activities/forum_1/forum.xml", backup["forum_xml"].encode("utf-8")),
+        ("files.xml", backup["files_xml"].encode("utf-8")),
+    ]
+    members.extend((f"files/{h[:2]}/{h}", content) for h, content in sorted(backup["blobs"].items()))
+
+    with tarfile.open(path, "w:gz" if compress else "w") as tar:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            tar.addfile(info, io.BytesIO(data))
+    return backup
+
+def main(args):
+    backup = write_mbz(
+        args.output, compress=not args.no_compress, discussions=args.discussions, posts=args.posts,
+        files=args.files, link_density=args.link_density, datasets=args.datasets,
+        message_size=args.message_size, seed=args.seed, start_id=args.start_id,
+    )
+    print(f"Wrote {args.output}: {os.path.getsize(args.output) / 2**20:.1f} MiB, "
+          f"{args.posts} posts, {len(backup['blobs'])} blobs, {len(backup['datasets'])} linked datasets")
+
+    if args.serve_ckan:
+        from fakeCkan import FakeCkan, make_package
+        packages = {identifier: make_package(identifier, organization=f"org-{i % 10}") for i, identifier in enumerate(backup["datasets"])}
+        with FakeCkan(packages) as ckan:
+            print(f"Fake CKAN serving {len(packages)} datasets at {ckan.url} (Ctrl+C to stop)")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Moodle forum backup (.mbz)")
+    parser.add_argument("-o", "--output", help="Output .mbz path", required=True, type=str)
+    parser.add_argument("--discussions", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=200, help="Attachments listed in files.xml")
+    parser.add_argument("--link-density", type=float, default=0.3, help="Share of posts linking a CKAN dataset")
+    parser.add_argument("--datasets", type=int, default=50, help="Distinct datasets posts can link to")
+    parser.add_argument("--message-size", type=int, default=800, help="Approximate message length in characters")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-id", type=int, default=1, help="First post id (use different ranges for several backups)")
+    parser.add_argument("--no-compress", action="store_true", help="Write a plain tar instead of tar.gz")
+    parser.add_argument("--serve-ckan", action="store_true", help="Serve the linked datasets from a local fake CKAN")
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+import os, threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Blobovi manji od ovoga se citaju u memoriju i pisu u pozadini; veci se kopiraju odmah
+BUFFER_MAX_SIZE = 8 * 1024 * 1024
+COPY_CHUNK = 1024 * 1024
+
+class BlobStore:
+    """
+    Content-addressed store of Moodle blobs: one file per contenthash in root.
+
+    Hashes already present on disk (from an earlier backup or run) are skipped before the
+    blob is read. Blobs of uncompressed archives are copied by the kernel straight from the
+    .mbz (copy_file_range, with a pread fallback); blobs of compressed archives are read in
+    archive order and written by a bounded pool of threads. Every file is written under a
+    temporary name and renamed, so concurrent writers of the same hash are harmless.
+    """
+
+    def __init__(self, root, workers=4, max_buffered=8 * BUFFER_MAX_SIZE):
+        self.root = root
+        self.written = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        os.makedirs(root, exist_ok=True)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._buffered = threading.BoundedSemaphore(max(1, max_buffered // BUFFER_MAX_SIZE))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures = []
+
+    def path(self, contenthash):
+        return os.path.join(self.root, contenthash)
+
+    def __contains__(self, contenthash):
+        return contenthash in self._pending or os.path.exists(self.path(contenthash))
+
+    def add_from_backup(self, backup, contenthashes):
+        """Store every requested blob of backup that is not stored yet."""
+        for contenthash, blob in backup.iter_blobs(self.plan(backup, contenthashes)):
+            self.add_blob(contenthash, blob, backup.blob_size(contenthash))
+
+    def plan(self, backup, contenthashes):
+        """
+        Skip stored hashes and start kernel copies of uncompressed blobs. Returns the hashes
+        that still have to be read from the archive and passed to add_blob().
+        """
+        missing = []
+        for contenthash in dict.fromkeys(contenthashes):
+            if not backup.has_blob(contenthash):
+                continue
+            if contenthash in self:
+                self.skipped += 1
+                continue
+            self._pending.add(contenthash)
+            extent = backup.blob_extent(contenthash)
+            if extent is not None:
+                self._submit(self._copy_range, contenthash, backup.path, *extent)
+            else:
+                missing.append(contenthash)
+        return missing
+
+    def add_blob(self, contenthash, blob, size):
+        if size <= BUFFER_MAX_SIZE:
+            # Ogranici broj procitanih blobova koji cekaju na pisanje
+            self._buffered.acquire()
+            self._submit(self._write_bytes, contenthash, blob.read())
+        else:
+            self._write_stream(contenthash, blob)
+
+    def _submit(self, fn, *args):
+        self._futures.append(self._pool.submit(fn, *args))
+
+    def _finish(self, contenthash, tmp_path, size):
+        os.replace(tmp_path, self.path(contenthash))
+        with self._lock:
+            self.written += 1
+            self.bytes_written += size
+
+    def _tmp_path(self, contenthash):
+        return f"{self.path(contenthash)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _write_bytes(self, contenthash, data):
+        try:
+            tmp_path = self._tmp_path(contenthash)
+            with open(tmp_path, "wb") as dst:
+                dst.write(data)
+            self._finish(contenthash, tmp_path, len(data))
+        finally:
+            self._buffered.release()
+
+    def _write_stream(self, contenthash, blob):
+        tmp_path = self._tmp_path(contenthash)
+        size = 0
+        with open(tmp_path, "wb") as dst:
+            while chunk := blob.read(COPY_CHUNK):
+                dst.write(chunk)
+                size += len(chunk)
+        self._finish(contenthash, tmp_path, size)
+
+    def _copy_range(self, contenthash, src_path, offset, size):
+        tmp_path = self._tmp_path(contenthash)
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+            copy_range(src.fileno(), dst.fileno(), offset, size)
+        self._finish(contenthash, tmp_path, size)
+
+    def wait(self):
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        self._pending.clear()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def copy_range(src_fd, dst_fd, offset, size):
+    """Copy size bytes from src_fd at offset to dst_fd, in the kernel when the platform allows it."""
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            # Npr. stariji kernel ili datotecni sustav bez podrske; nastavi obicnim kopiranjem
+            pass
+    while copied < size:
+        chunk = os.pread(src_fd, min(COPY_CHUNK, size - copied), offset + copied)
+        if not chunk:
+            raise EOFError(f"Unexpected end of archive while copying {size} bytes at offset {offset}")
+        os.write(dst_fd, chunk)
+        copied += len(chunk)
@@ -0,0 +1,223 @@
+import json, re, sqlite3, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CKAN_URL = "https://data.gov.hr/ckan"
+DATASET_URL_RE = re.compile(r'(https:\/\/data\.gov\.hr\/ckan\/dataset\/([a-zA-Z0-9\-]+))')
+
+# package_search vraca najvise 1000 redova po zahtjevu (search.rows_max)
+SEARCH_BATCH_SIZE = 100
+
+class CacheMiss(LookupError):
+    pass
+
+class PackageNotFound(LookupError):
+    pass
+
+class ResponseCache:
+    """
+    Persistent package_show cache in a local SQLite file, keyed by dataset identifier.
+
+    Negative responses (success=false, e.g. a 404 for a deleted dataset) are stored as well,
+    so a missing dataset is not requested again on every run. Entries older than ttl seconds
+    are treated as missing (and refetched). When the stored responses exceed max_bytes, the
+    least recently used ones are evicted.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS package_show (
+                identifier TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def get(self, identifier, ignore_ttl=False):
+        row = self._db.execute(
+            "SELECT response, fetched_at FROM package_show WHERE identifier = ?", (identifier,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (not ignore_ttl and now - row[1] > self.ttl):
+            self.misses += 1
+            return None
+        self._db.execute("UPDATE package_show SET used_at = ? WHERE identifier = ?", (now, identifier))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, identifier, response):
+        body = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO package_show (identifier, response, size, fetched_at, used_at) VALUES (?, ?, ?, ?, ?)",
+            (identifier, body, len(body), now, now),
+        )
+
+    def evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM package_show").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for identifier, size in self._db.execute("SELECT identifier, size FROM package_show ORDER BY used_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((identifier,))
+            total -= size
+        self._db.executemany("DELETE FROM package_show WHERE identifier = ?", evicted)
+
+    def close(self):
+        self.evict()
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def make_session(pool_size=8, retries=3, backoff=0.5, raise_on_status=True):
+    """
+    requests.Session with a keep-alive pool of pool_size connections and retry/backoff on transient errors.
+
+    With raise_on_status=False the last response is returned once retries are exhausted, instead of a RetryError.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=raise_on_status,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_package(session, identifier, ckan_url=CKAN_URL, timeout=3):
+    response = session.get(f"{ckan_url}/api/3/action/package_show", params={"id": identifier}, timeout=timeout)
+    # 404 je odgovor CKAN-a (skup ne postoji), a ne neuspjeli zahtjev
+    if response.status_code != 404:
+        response.raise_for_status()
+    return response.json()
+
+def package_result(identifier, response):
+    # Negativan odgovor (404, success=false) je konacan: skup ne postoji, nema smisla ponavljati zahtjev
+    if response.get("success"):
+        return response
+    error = response.get("error") or {}
+    return PackageNotFound(f"{identifier} not found in CKAN: {error.get('message', 'success=false')}")
+
+def fetch_packages(identifiers, ckan_url=CKAN_URL, workers=8, timeout=3, retries=3, cache=None, offline=False, latencies=None):
+    """
+    Fetch package_show for every identifier concurrently (at most `workers` requests in flight).
+
+    Returns {identifier: response_json} for successful requests, {identifier: PackageNotFound}
+    for datasets CKAN reports as missing (404 or success=false) and
+    {identifier: requests.RequestException} for the ones that failed after retries.
+    With a ResponseCache, fresh cached responses (negative ones included) are served without
+    a request and new responses are stored. offline=True never touches the network: every
+    identifier not in the cache (regardless of age) comes back as CacheMiss.
+    If latencies is a list, the duration of every request (seconds, retries included) is appended to it.
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    results = {}
+
+    if cache is not None:
+        for identifier in identifiers:
+            cached = cache.get(identifier, ignore_ttl=offline)
+            if cached is not None:
+                results[identifier] = package_result(identifier, cached)
+    missing = [identifier for identifier in identifiers if identifier not in results]
+
+    if offline:
+        for identifier in missing:
+            results[identifier] = CacheMiss(f"{identifier} is not in the CKAN cache (--offline)")
+        return results
+    if not missing:
+        return results
+
+    def timed_fetch(session, identifier):
+        start = time.perf_counter()
+        try:
+            return fetch_package(session, identifier, ckan_url, timeout)
+        finally:
+            if latencies is not None:
+                latencies.append(time.perf_counter() - start)
+
+    with make_session(pool_size=workers, retries=retries) as session:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(timed_fetch, session, identifier): identifier
+                for identifier in missing
+            }
+            for future in as_completed(futures):
+                identifier = futures[future]
+                try:
+                    response = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    results[identifier] = e
+                    continue
+                if cache is not None and "success" in response:
+                    cache.put(identifier, response)
+                results[identifier] = package_result(identifier, response)
+    return results
+
+def search_packages(session, dataset_ids, ckan_url=CKAN_URL, timeout=10):
+    """Metadata of up to len(dataset_ids) datasets (CKAN ids) in one package_search request. Returns {id: package}."""
+    query = " OR ".join('"' + dataset_id.replace('"', '\\"') + '"' for dataset_id in dataset_ids)
+    response = session.get(
+        f"{ckan_url}/api/3/action/package_search",
+        params={"fq": f"id:({query})", "rows": len(dataset_ids)},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return {package["id"]: package for package in response.json()["result"]["results"]}
+
+def fetch_packages_by_id(dataset_ids, ckan_url=CKAN_URL, batch_size=SEARCH_BATCH_SIZE, workers=4, timeout=10, retries=3, latencies=None):
+    """
+    Fetch the metadata of dataset_ids through package_search, batch_size ids per request
+    (at most `workers` requests in flight).
+
+    Returns {id: package} (the package_show "result") for every dataset found,
+    {id: PackageNotFound} for ids the search did not return (deleted or private datasets)
+    and {id: requests.RequestException} for the ids of batches that failed after retries.
+    If latencies is a list, the duration of every request (seconds, retries included) is appended to it.
+    """
+    dataset_ids = list(dict.fromkeys(dataset_ids))
+    batches = [dataset_ids[start:start + batch_size] for start in range(0, len(dataset_ids), batch_size)]
+    results = {}
+
+    def timed_search(session, batch):
+        start = time.perf_counter()
+        try:
+            return search_packages(session, batch, ckan_url, timeout)
+        finally:
+            if latencies is not None:
+                latencies.append(time.perf_counter() - start)
+
+    with make_session(pool_size=workers, retries=retries) as session:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(timed_search, session, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    found = future.result()
+                except (requests.RequestException, ValueError, KeyError) as e:
+                    for dataset_id in batch:
+                        results[dataset_id] = e
+                    continue
+                for dataset_id in batch:
+                    results[dataset_id] = found.get(dataset_id) or PackageNotFound(f"{dataset_id} not returned by package_search")
+    return results
@@ -1,15 +1,16 @@
-import argparse, os, sys
-import xml.etree.ElementTree as ET
+import argparse, contextlib, os, sys, hashlib, json, time, cProfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from datetime import datetime
-import tarfile
-from pathlib import Path
-import shutil
-import re
-from bs4 import BeautifulSoup
-import html
-import requests
+from typing import NamedTuple, Optional
 import psycopg2
 from psycopg2.extras import execute_values, Json
+from moodleBackup import MoodleBackup, files_root, fingerprint, iter_posts, list_backups
+from ckanClient import CKAN_URL, DATASET_URL_RE, SEARCH_BATCH_SIZE, PackageNotFound, ResponseCache, fetch_packages, fetch_packages_by_id
+from htmlSanitizer import clean, sanitize_message
+from importReport import ImportReport
+from importCheckpoint import ImportCheckpoint
+from urlChecker import check_urls
 
 def get_connection():
     conn = psycopg2.connect(
@@ -21,9 +22,118 @@ def get_connection():
     )
     return conn
 
-def create_postgres_tables(conn):
-    with conn.cursor() as cur:
-        cur.execute("""
+# Osvjezavanje redova po skupu: %(ids)s je lista id-eva skupova
+STATS_SKUP_REFRESH = (
+    "DELETE FROM stats_skup WHERE skup_id = ANY(%(ids)s)",
+    """INSERT INTO stats_skup (skup_id, publisher_id, theme, komentar_count, obradenih_count,
+                               odgovor_count, failed_count, score_sum, score_count)
+       SELECT s.id, s.publisher_id, s.theme,
+              COALESCE(k.komentar_count, 0), COALESCE(k.obradenih_count, 0),
+              COALESCE(o.odgovor_count, 0), COALESCE(o.failed_count, 0),
+              COALESCE(o.score_sum, 0), COALESCE(o.score_count, 0)
+       FROM skup_podataka s
+       LEFT JOIN (
+           SELECT k.skup_id, COUNT(*) AS komentar_count,
+                  COUNT(*) FILTER (WHERE EXISTS (SELECT 1 FROM odgovor o WHERE o.komentar_id = k.id)) AS obradenih_count
+           FROM komentar k WHERE k.skup_id = ANY(%(ids)s) GROUP BY k.skup_id
+       ) k ON k.skup_id = s.id
+       LEFT JOIN (
+           SELECT k.skup_id, COUNT(*) AS odgovor_count,
+                  COUNT(*) FILTER (WHERE o.score = -1) AS failed_count,
+                  SUM(o.score) FILTER (WHERE o.score <> -1) AS score_sum,
+                  COUNT(o.score) FILTER (WHERE o.score <> -1) AS score_count
+           FROM odgovor o JOIN komentar k ON k.id = o.komentar_id
+           WHERE k.skup_id = ANY(%(ids)s) GROUP BY k.skup_id
+       ) o ON o.skup_id = s.id
+       WHERE s.id = ANY(%(ids)s)""",
+    "DELETE FROM stats_skup_score WHERE skup_id = ANY(%(ids)s)",
+    """INSERT INTO stats_skup_score (skup_id, bucket, count)
+       SELECT k.skup_id, ROUND(o.score::numeric, 0)::int, COUNT(*)
+       FROM odgovor o JOIN komentar k ON k.id = o.komentar_id
+       WHERE k.skup_id = ANY(%(ids)s) AND o.score <> -1
+       GROUP BY 1, 2""",
+    "DELETE FROM stats_skup_kategorija WHERE skup_id = ANY(%(ids)s)",
+    """INSERT INTO stats_skup_kategorija (skup_id, category, count, usvojeni)
+       SELECT k.skup_id, izj->>'category', COUNT(*),
+              COUNT(*) FILTER (WHERE (izj->'analysis'->>'usvojenost')::boolean = true)
+       FROM odgovor o JOIN komentar k ON k.id = o.komentar_id,
+            LATERAL jsonb_array_elements(o.message->'izjave') AS izj
+       WHERE k.skup_id = ANY(%(ids)s) AND NOT (o.message ? 'error') AND o.message ? 'izjave'
+       GROUP BY 1, 2""",
+)
+
+# Globalni agregati iz redova po skupu (jedan red po skupu, ne po komentaru)
+STATS_GLOBAL_REFRESH = (
+    "DELETE FROM stats_izdavac",
+    """INSERT INTO stats_izdavac (publisher_id, publisher, skup_count, komentar_count)
+       SELECT st.publisher_id, i.publisher, COUNT(*), SUM(st.komentar_count)
+       FROM stats_skup st LEFT JOIN izdavac i ON i.id = st.publisher_id
+       WHERE st.publisher_id IS NOT NULL
+       GROUP BY st.publisher_id, i.publisher""",
+    "DELETE FROM stats_tema",
+    """INSERT INTO stats_tema (theme, skup_count, komentar_count)
+       SELECT theme, COUNT(*), SUM(komentar_count) FROM stats_skup
+       WHERE theme IS NOT NULL GROUP BY theme""",
+    "DELETE FROM stats_score",
+    "INSERT INTO stats_score (bucket, count) SELECT bucket, SUM(count) FROM stats_skup_score GROUP BY bucket",
+    "DELETE FROM stats_kategorija",
+    """INSERT INTO stats_kategorija (category, count, usvojeni)
+       SELECT category, SUM(count), SUM(usvojeni) FROM stats_skup_kategorija GROUP BY category""",
+)
+
+# Skupovi ciji redovi vise ne odgovaraju stats_skup: novi skupovi, novi komentari i novi ili izmijenjeni
+# odgovori (i iz backenda) nakon zadnjeg osvjezavanja, te razlika u broju (brisanja, uvoz starih postova)
+STATS_STALE = """
+    SELECT s.id FROM skup_podataka s
+    WHERE NOT EXISTS (SELECT 1 FROM stats_skup st WHERE st.skup_id = s.id)
+    UNION
+    SELECT k.skup_id FROM komentar k
+    JOIN stats_skup st ON st.skup_id = k.skup_id
+    GROUP BY k.skup_id, st.komentar_count, st.refreshed_at
+    HAVING COUNT(*) <> st.komentar_count OR MAX(k.created) > st.refreshed_at
+    UNION
+    SELECT k.skup_id FROM odgovor o
+    JOIN komentar k ON k.id = o.komentar_id
+    JOIN stats_skup st ON st.skup_id = k.skup_id
+    GROUP BY k.skup_id, st.odgovor_count, st.refreshed_at
+    HAVING COUNT(*) <> st.odgovor_count OR MAX(COALESCE(o.updated_at, o.created)) > st.refreshed_at
+    UNION
+    SELECT st.skup_id FROM stats_skup st
+    WHERE st.komentar_count > 0 AND NOT EXISTS (SELECT 1 FROM komentar k WHERE k.skup_id = st.skup_id)
+    UNION
+    SELECT st.skup_id FROM stats_skup st
+    WHERE st.odgovor_count > 0 AND NOT EXISTS (
+        SELECT 1 FROM odgovor o JOIN komentar k ON k.id = o.komentar_id WHERE k.skup_id = st.skup_id
+    )
+"""
+
+# Isto osvjezavanje kao funkcije u bazi, da ga backend pokrene nakon svojih upisa: stats_refresh(ids)
+# za skupove koje je mijenjao, stats_refresh_stale() za sve zastarjele. Tijelo se gradi iz gornjih
+# upita; kad se oni promijene, nova migracija ponovno primjenjuje STATS_FUNCTIONS.
+STATS_LOCK = "SELECT pg_advisory_xact_lock(hashtext('stats_refresh'))"
+STATS_FUNCTIONS = """
+    CREATE OR REPLACE FUNCTION stats_refresh(skup_ids TEXT[]) RETURNS INT LANGUAGE plpgsql AS $$
+    BEGIN
+        {lock};
+{statements}
+        RETURN cardinality(skup_ids);
+    END $$;
+
+    CREATE OR REPLACE FUNCTION stats_refresh_stale() RETURNS INT LANGUAGE plpgsql AS $$
+    BEGIN
+        RETURN stats_refresh(ARRAY({stale}));
+    END $$;
+""".format(
+    statements="\n".join(f"        {sql.replace('%(ids)s', 'skup_ids')};" for sql in STATS_SKUP_REFRESH + STATS_GLOBAL_REFRESH),
+    stale=STATS_STALE,
+    lock=STATS_LOCK.replace("SELECT", "PERFORM", 1),
+)
+
+# Verzije sheme: svaka migracija se primjenjuje jednom i biljezi u schema_version.
+# Baze stvorene prije verzioniranja (ili iz database/schema.sql) krecu od verzije 0,
+# pa svaki korak mora biti idempotentan (IF NOT EXISTS, provjere u katalogu).
+MIGRATIONS = (
+    (1, "base tables", """
         CREATE TABLE IF NOT EXISTS izdavac (
             id TEXT PRIMARY KEY,
             publisher TEXT,
@@ -88,90 +198,357 @@ def create_postgres_tables(conn):
             created TIMESTAMP,
             message TEXT
         );
+        
+        CREATE TABLE IF NOT EXISTS uvoz_backup (
+            fingerprint TEXT PRIMARY KEY,
+            filename TEXT,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "komentar import keys and id sequence", """
+        ALTER TABLE komentar ADD COLUMN IF NOT EXISTS import_id BIGINT;
+        ALTER TABLE komentar ADD COLUMN IF NOT EXISTS import_source TEXT;
+        
+        -- Stari redovi bez import stupaca imaju Moodle post id kao id
+        UPDATE komentar SET import_source = 'mbz', import_id = COALESCE(import_id, id) WHERE import_source IS NULL;
+        ALTER TABLE komentar ALTER COLUMN import_source SET NOT NULL;
+        CREATE UNIQUE INDEX IF NOT EXISTS komentar_import_unique
+            ON komentar (import_source, import_id) WHERE import_id IS NOT NULL;
+        DO $$
+        BEGIN
+            -- Ime ogranicenja je jedinstveno samo unutar sheme (benchImport --db koristi bench_import)
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'unique_alternative_key' AND connamespace = current_schema()::regnamespace
+            ) THEN
+                ALTER TABLE komentar ADD CONSTRAINT unique_alternative_key UNIQUE (import_id);
+            END IF;
+        END $$;
+        
+        -- Komentari iz backenda (import_source 'user') dobivaju id iz sekvence
+        CREATE SEQUENCE IF NOT EXISTS komentar_id_seq OWNED BY komentar.id;
+        SELECT setval('komentar_id_seq', GREATEST(
+            (SELECT COALESCE(MAX(id), 1) FROM komentar),
+            (SELECT last_value FROM komentar_id_seq)
+        ));
+        ALTER TABLE komentar ALTER COLUMN id SET DEFAULT nextval('komentar_id_seq');
+    """),
+    (3, "dataset freshness and content hashes", """
+        -- Hash metapodataka iz CKAN-a: redovi se prepisuju samo kad se hash promijeni
+        ALTER TABLE skup_podataka ADD COLUMN IF NOT EXISTS content_hash TEXT;
+        ALTER TABLE skup_podataka ADD COLUMN IF NOT EXISTS fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE skup_podataka ADD COLUMN IF NOT EXISTS last_analysis TIMESTAMP;
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS content_hash TEXT;
+    """),
+    (4, "resource URL checks", """
+        -- Rezultat zadnje provjere dostupnosti URL-a (check-urls)
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS url_status INT;
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS url_ok BOOLEAN;
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS url_latency_ms INT;
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS url_error TEXT;
+        ALTER TABLE resurs ADD COLUMN IF NOT EXISTS url_checked_at TIMESTAMP;
+    """),
+    (5, "odgovor score and JSON message", """
+        ALTER TABLE odgovor ADD COLUMN IF NOT EXISTS score DOUBLE PRECISION;
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'odgovor' AND column_name = 'message') = 'text' THEN
+                ALTER TABLE odgovor ALTER COLUMN message TYPE JSONB USING message::jsonb;
+            END IF;
+        END $$;
+    """),
+    (6, "statistics rollups", """
+        -- Agregati za stats endpointe backenda; po skupu ih osvjezava refresh_stats,
+        -- a globalni (izdavac, tema, score, kategorija) se zbrajaju iz redova po skupu
+        CREATE TABLE IF NOT EXISTS stats_skup (
+            skup_id TEXT PRIMARY KEY REFERENCES skup_podataka(id) ON DELETE CASCADE,
+            publisher_id TEXT,
+            theme TEXT,
+            komentar_count INT NOT NULL,
+            obradenih_count INT NOT NULL,
+            odgovor_count INT NOT NULL,
+            failed_count INT NOT NULL,
+            score_sum DOUBLE PRECISION NOT NULL,
+            score_count INT NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats_skup_score (
+            skup_id TEXT REFERENCES skup_podataka(id) ON DELETE CASCADE,
+            bucket INT,
+            count INT NOT NULL,
+            PRIMARY KEY(skup_id, bucket)
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats_skup_kategorija (
+            skup_id TEXT REFERENCES skup_podataka(id) ON DELETE CASCADE,
+            category TEXT,
+            count INT NOT NULL,
+            usvojeni INT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_stats_skup_kategorija_skup_id ON stats_skup_kategorija (skup_id);
+        
+        CREATE TABLE IF NOT EXISTS stats_izdavac (
+            publisher_id TEXT PRIMARY KEY,
+            publisher TEXT,
+            skup_count INT NOT NULL,
+            komentar_count INT NOT NULL
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats_tema (
+            theme TEXT PRIMARY KEY,
+            skup_count INT NOT NULL,
+            komentar_count INT NOT NULL
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats_score (
+            bucket INT PRIMARY KEY,
+            count INT NOT NULL
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats_kategorija (
+            category TEXT,
+            count INT NOT NULL,
+            usvojeni INT NOT NULL
+        );
+    """),
+    (7, "odgovor updated_at and statistics refresh functions", """
+        -- Ponovna analiza u backendu mijenja odgovor na mjestu; stari redovi ostaju bez updated_at
+        ALTER TABLE odgovor ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+        ALTER TABLE odgovor ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+        CREATE OR REPLACE FUNCTION odgovor_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END $$;
+        DROP TRIGGER IF EXISTS odgovor_updated_at ON odgovor;
+        CREATE TRIGGER odgovor_updated_at BEFORE UPDATE ON odgovor
+            FOR EACH ROW EXECUTE FUNCTION odgovor_updated_at();
+    """ + STATS_FUNCTIONS),
+)
+
+# Sekundarni indeksi (ime, definicija) za spojeve i filtre backenda; gradi ih create_indexes nakon punjenja
+INDEXES = (
+    ("idx_komentar_skup_id", "komentar (skup_id)"),
+    ("idx_komentar_created", "komentar (created)"),
+    ("idx_resurs_skup_id", "resurs (skup_id)"),
+    ("idx_odgovor_komentar_id", "odgovor (komentar_id)"),
+    ("idx_skup_tags", "skup_podataka USING gin (tags)"),
+)
+
+def create_postgres_tables(conn):
+    """Apply the MIGRATIONS newer than the version recorded in schema_version, in one transaction. Returns the applied versions."""
+    applied = []
+    with conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
         """)
+        # Dva istovremena uvoza ne smiju migrirati istu bazu
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema_version'))")
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current = cur.fetchone()[0]
+        for version, description, sql in MIGRATIONS:
+            if version <= current:
+                continue
+            cur.execute(sql)
+            cur.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (version, description))
+            print(f"Applied migration {version}: {description}")
+            applied.append(version)
         conn.commit()
+    return applied
+
+def create_indexes(conn, concurrently=True):
+    """
+    Build the INDEXES that are missing (or left invalid by an interrupted build). Returns their names.
+
+    Called after the load: one build over the filled table is cheaper than maintaining the index
+    during COPY. CONCURRENTLY keeps the backend reading and writing meanwhile, but cannot run
+    inside a transaction, so the connection is switched to autocommit for the builds.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT c.relname, i.indisvalid FROM pg_index i
+               JOIN pg_class c ON c.oid = i.indexrelid
+               WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid)""",
+            ([name for name, _ in INDEXES],)
+        )
+        existing = dict(cur.fetchall())
+    conn.commit()
+    missing = [(name, definition) for name, definition in INDEXES if not existing.get(name)]
+    if not missing:
+        return []
+    
+    mode = " CONCURRENTLY" if concurrently else ""
+    autocommit = conn.autocommit
+    conn.autocommit = concurrently
+    try:
+        with conn.cursor() as cur:
+            for name, definition in missing:
+                if name in existing:
+                    cur.execute(f"DROP INDEX{mode} IF EXISTS {name}")
+                cur.execute(f"CREATE INDEX{mode} IF NOT EXISTS {name} ON {definition}")
+                print(f"Created index {name}")
+        if not concurrently:
+            conn.commit()
+    finally:
+        conn.autocommit = autocommit
+    return [name for name, _ in missing]
+
+# Redovi tablica kao NamedTuple: polja su stupci redom, pa zapis ide ravno u execute_values/COPY
+class Izdavac(NamedTuple):
+    id: str
+    publisher: Optional[str]
+    description: Optional[str]
+
+class Skup(NamedTuple):
+    id: str
+    title: Optional[str]
+    refresh_frequency: Optional[str]
+    theme: Optional[str]
+    description: Optional[str]
+    url: Optional[str]
+    state: Optional[str]
+    created: Optional[str]
+    modified: Optional[str]
+    isopen: bool
+    access_rights: Optional[str]
+    license_title: Optional[str]
+    license_url: Optional[str]
+    license_id: Optional[str]
+    publisher_id: Optional[str]
+    tags: Json
+    content_hash: str
+
+class Resurs(NamedTuple):
+    id: str
+    skup_id: str
+    available_through_api: bool
+    name: Optional[str]
+    description: Optional[str]
+    created: Optional[str]
+    last_modified: Optional[str]
+    format: Optional[str]
+    mimetype: Optional[str]
+    state: Optional[str]
+    size: int
+    url: Optional[str]
+    content_hash: str
+
+# komentar.id dodjeljuje komentar_id_seq (dijeli se s backendom); uvezeni post se prepoznaje po (import_source, import_id)
+class Komentar(NamedTuple):
+    import_id: int
+    user_id: int
+    skup_id: Optional[str]
+    created: datetime
+    subject: str
+    message: str
+    import_source: str
+
+# Slika pokazuje na komentar preko Moodle post id-a; komentar_id se razrjesava pri upisu
+class Slika(NamedTuple):
+    import_id: int
+    content_hash: str
+    original_name: str
+    mime_type: str
+    created: datetime
+
+IZDAVAC_COLUMNS = Izdavac._fields
+SKUP_COLUMNS = Skup._fields
+RESURS_COLUMNS = Resurs._fields
+KOMENTAR_COLUMNS = Komentar._fields
+IMPORT_SOURCE = "mbz"
+SLIKA_COLUMNS = ("komentar_id", "content_hash", "original_name", "mime_type", "created")
+KOMENTAR_CONFLICT = "ON CONFLICT (import_source, import_id) WHERE import_id IS NOT NULL DO NOTHING"
+
+def content_hash(values):
+    # Stabilan sha256 vrijednosti retka (datumi iz CKAN-a su vec stringovi)
+    return hashlib.sha256(json.dumps(values, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def make_skup(*values):
+    # values: stupci skupa bez content_hash, tags kao lista
+    return Skup(*values[:-1], Json(values[-1]), content_hash(values))
+
+def make_resurs(*values):
+    # values: stupci resursa bez content_hash
+    return Resurs(*values, content_hash(values))
+
+def upsert_changed(table, columns, touch=()):
+    """ON CONFLICT clause that rewrites a row only when its content_hash differs (touch: extra SET assignments)."""
+    assignments = [f"{column} = EXCLUDED.{column}" for column in columns if column != "id"] + list(touch)
+    return f"ON CONFLICT (id) DO UPDATE SET {', '.join(assignments)} WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash"
+
+# Naziv i opis izdavaca prate CKAN, ali se red ne prepisuje ako se nista nije promijenilo
+IZDAVAC_UPSERT = """ON CONFLICT (id) DO UPDATE SET publisher = EXCLUDED.publisher, description = EXCLUDED.description
+    WHERE (izdavac.publisher, izdavac.description) IS DISTINCT FROM (EXCLUDED.publisher, EXCLUDED.description)"""
+SKUP_UPSERT = upsert_changed("skup_podataka", SKUP_COLUMNS, touch=("fetched_at = now()",))
+RESURS_UPSERT = upsert_changed("resurs", RESURS_COLUMNS)
+
+def touch_datasets(cur, dataset_ids):
+    # Nepromijenjeni skupovi: samo fetched_at (nije indeksiran, pa je to HOT update bez diranja indeksa).
+    # Redovi upisani u istoj transakciji vec imaju fetched_at = now()
+    cur.execute(
+        "UPDATE skup_podataka SET fetched_at = now() WHERE id = ANY(%s) AND fetched_at < now()",
+        (list(dataset_ids),)
+    )
+    return cur.rowcount
 
 def insert_izdavac(conn, izdavaci_dict):
-    # izdavaci_dict: {publisher_id: {id, publisher, description}, ...}
     if not izdavaci_dict:
         return
     
     with conn.cursor() as cur:
-        values = [(v["id"], v["publisher"], v["description"]) for v in izdavaci_dict.values()]
         execute_values(
             cur,
-            "INSERT INTO izdavac (id, publisher, description) VALUES %s ON CONFLICT (id) DO NOTHING",
-            values
+            f"INSERT INTO izdavac (id, publisher, description) VALUES %s {IZDAVAC_UPSERT}",
+            izdavaci_dict.values()
         )
         conn.commit()
 
 def insert_skup_podataka(conn, datasets_dict):
+    # Vraca (upisano, nepromijenjeno)
     if not datasets_dict:
-        return
+        return 0, 0
     
     with conn.cursor() as cur:
-        values = [
-            (
-                v["id"], v["title"], v["refresh_frequency"], v["theme"], v["description"],
-                v["url"], v["state"], v["created"], v["modified"], v["isopen"],
-                v["access_rights"], v["license_title"], v["license_url"], v["license_id"],
-                v["publisher_id"], Json(v.get("tags", []))
-            )
-            for v in datasets_dict.values()
-        ]
-        execute_values(
+        written = execute_values(
             cur,
-            """INSERT INTO skup_podataka (
-                id, title, refresh_frequency, theme, description, url, state,
-                created, modified, isopen, access_rights, license_title,
-                license_url, license_id, publisher_id, tags
-            ) VALUES %s ON CONFLICT (id) DO UPDATE
-               SET tags = EXCLUDED.tags""",
-            values
+            f"""INSERT INTO skup_podataka ({", ".join(SKUP_COLUMNS)}) VALUES %s {SKUP_UPSERT} RETURNING id""",
+            datasets_dict.values(),
+            fetch=True
         )
+        touched = touch_datasets(cur, {v.id for v in datasets_dict.values()})
         conn.commit()
+    return len(written), touched
 
 
 def insert_resurs(conn, resurs_list):
     if not resurs_list:
-        return
+        return 0
     
     with conn.cursor() as cur:
-        values = [
-            (
-                r["id"], r["skup_id"], r["available_through_api"], r["name"], r["description"],
-                r["created"], r["last_modified"], r["format"], r["mimetype"], r["state"],
-                r["size"], r["url"]
-            )
-            for r in resurs_list
-        ]
-        execute_values(
+        written = execute_values(
             cur,
-            """INSERT INTO resurs (
-                id, skup_id, available_through_api, name, description, created, last_modified,
-                format, mimetype, state, size, url
-            ) VALUES %s ON CONFLICT (id) DO NOTHING""",
-            values
+            f"""INSERT INTO resurs ({", ".join(RESURS_COLUMNS)}) VALUES %s {RESURS_UPSERT} RETURNING id""",
+            resurs_list,
+            fetch=True
         )
         conn.commit()
+    return len(written)
 
 def insert_komentar(conn, komentar_list):
     if not komentar_list:
         return
     
     with conn.cursor() as cur:
-        values = [
-            (
-                k["id"], k["user_id"], k["skup_id"], k["created"], k["subject"], k["message"]
-            )
-            for k in komentar_list
-        ]
         execute_values(
             cur,
-            """INSERT INTO komentar (
-                id, user_id, skup_id, created, subject, message
-            ) VALUES %s ON CONFLICT (id) DO NOTHING""",
-            values
+            f"""INSERT INTO komentar ({", ".join(KOMENTAR_COLUMNS)}) VALUES %s {KOMENTAR_CONFLICT}""",
+            komentar_list
         )
         conn.commit()
         
@@ -180,62 +557,223 @@ def insert_slika(conn, slika_list):
         return
     
     with conn.cursor() as cur:
-        values = [
-            (
-                s["komentar_id"], s["content_hash"], s["original_name"],
-                s["mime_type"], s["created"]
-            )
-            for s in slika_list
-        ]
         execute_values(
             cur,
-            """INSERT INTO slika (
-                komentar_id, content_hash, original_name, mime_type, created
-            ) VALUES %s ON CONFLICT (komentar_id, content_hash) DO NOTHING""",
-            values
+            f"""INSERT INTO slika ({", ".join(SLIKA_COLUMNS)})
+                SELECT k.id, v.content_hash, v.original_name, v.mime_type, v.created
+                FROM (VALUES %s) AS v (import_id, content_hash, original_name, mime_type, created)
+                JOIN komentar k ON k.import_source = '{IMPORT_SOURCE}' AND k.import_id = v.import_id
+                ON CONFLICT (komentar_id, content_hash) DO NOTHING""",
+            slika_list
         )
         conn.commit()
 
-def unpack(tgz_file):
-    with tarfile.open(tgz_file, "r:gz") as tar:
-        tar.extractall(path='./extracted_moodle', filter='data')
-        
-def clean(text):
-    if not text:
-        return ""
-    
-    # if isinstance(text, bytes):
-    #     text = text.decode("utf-8", "replace")
-    # else:
-    #     text = text.encode("utf-8", "replace").decode("utf-8")
-    
-    replacements = {
-        "\u2013": "-", "\u2014": "-",
-        "\u2212": "-", "\u2018": "'",
-        "\u2019": "'", "\u201C": '"',
-        "\u201D": '"', "\u2026": "...",
-        "\u00A0": " ", "\u200B": "",    
-    }
-     
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
-        
-    text = ''.join(c for c in text if c.isprintable())
+def load_imported_backups(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT fingerprint FROM uvoz_backup")
+        return {row[0] for row in cur.fetchall()}
+
+def load_imported_posts(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT import_id FROM komentar WHERE import_source = %s AND import_id IS NOT NULL",
+            (IMPORT_SOURCE,)
+        )
+        return {row[0] for row in cur.fetchall()}
+
+def record_backups(conn, backups):
+    # backups: [(fingerprint, filename), ...]
+    if not backups:
+        return
     
-    text = re.sub(r'[\u2000-\u200F\u202A-\u202F\u205F\u3000]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO uvoz_backup (fingerprint, filename) VALUES %s ON CONFLICT (fingerprint) DO NOTHING",
+            backups
+        )
+        conn.commit()
 
-def is_url_valid(url, timeout=5):
-    try:
-        response = requests.head(url, allow_redirects=True, timeout=timeout)
-        return response.status_code == 200
-    except requests.RequestException:
-        return False
-
-def extract_img_data(files_xml_path, seen_posts):
-    tree = ET.parse(files_xml_path)
-    root = tree.getroot()
+def stale_stats_datasets(cur):
+    cur.execute(STATS_STALE)
+    return [row[0] for row in cur.fetchall()]
+
+def refresh_stats(conn, dataset_ids=None):
+    """
+    Recompute the statistics rollups of dataset_ids (plus datasets whose komentar or odgovor rows were
+    added or deleted since their last refresh), then the global rollups from the per-dataset rows. All datasets when dataset_ids is None or the
+    rollups are still empty. Returns the number of datasets refreshed.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT EXISTS (SELECT 1 FROM stats_skup)")
+        if dataset_ids is None or not cur.fetchone()[0]:
+            cur.execute("SELECT id FROM skup_podataka")
+            ids = [row[0] for row in cur.fetchall()]
+        else:
+            ids = list(set(dataset_ids).union(stale_stats_datasets(cur)))
+        # Backend osvjezava iste tablice kroz stats_refresh
+        cur.execute(STATS_LOCK)
+        for sql in STATS_SKUP_REFRESH:
+            cur.execute(sql, {"ids": ids})
+        for sql in STATS_GLOBAL_REFRESH:
+            cur.execute(sql)
+        conn.commit()
+    return len(ids)
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def copy_value(value):
+    # Tekstualni COPY format: \N je NULL, a \, tab i novi red se escapeaju
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, Json):
+        value = json.dumps(value.adapted)
+    return str(value).translate(COPY_ESCAPES)
+
+class CopyStream:
+    """File-like object for cursor.copy_expert that encodes rows lazily, so COPY streams without building the whole payload."""
+
+    def __init__(self, rows):
+        self._lines = ("\t".join(map(copy_value, row)) + "\n" for row in rows)
+        self._rest = ""
+
+    def read(self, size=-1):
+        parts = [self._rest]
+        length = len(self._rest)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        data = "".join(parts)
+        if size < 0:
+            self._rest = ""
+            return data
+        self._rest = data[size:]
+        return data[:size]
+
+def copy_stage(cur, table, columns, rows):
+    # Privremena tablica samo s upisivanim stupcima (bez ogranicenja i defaulta, npr. komentar.id iz sekvence)
+    stage = f"stage_{table}"
+    column_list = ", ".join(columns)
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+    cur.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN", CopyStream(rows))
+    return stage
+
+def copy_merge(cur, table, columns, rows, key, on_conflict):
+    # COPY u privremenu tablicu pa INSERT ... SELECT s istim ON CONFLICT pravilima kao execute_values put
+    stage = copy_stage(cur, table, columns, rows)
+    column_list = ", ".join(columns)
+    # DISTINCT ON zadrzava prvi redak za isti kljuc (DO UPDATE ne smije dirati isti red dvaput)
+    cur.execute(
+        f"""INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({key}) {column_list} FROM {stage} ORDER BY {key}, ctid
+            {on_conflict}"""
+    )
+    return cur.rowcount
+
+def copy_slika(cur, rows):
+    # U stage_slika.komentar_id je Moodle post id; pravi komentar_id daje uvezeni komentar s tim import_id
+    stage = copy_stage(cur, "slika", SLIKA_COLUMNS, rows)
+    cur.execute(
+        f"""INSERT INTO slika ({", ".join(SLIKA_COLUMNS)})
+            SELECT DISTINCT ON (k.id, s.content_hash) k.id, s.content_hash, s.original_name, s.mime_type, s.created
+            FROM {stage} s JOIN komentar k ON k.import_source = %s AND k.import_id = s.komentar_id
+            ORDER BY k.id, s.content_hash, s.ctid
+            ON CONFLICT (komentar_id, content_hash) DO NOTHING""",
+        (IMPORT_SOURCE,)
+    )
+    return cur.rowcount
+
+LOAD_ORDER = ("izdavac", "skup_podataka", "resurs", "komentar", "slika")
+
+def copy_table(cur, table, rows, report):
+    # COPY + merge jedne tablice (rows: zapisi te tablice); bez commita
+    if table == "izdavac":
+        copy_merge(cur, "izdavac", IZDAVAC_COLUMNS, rows, "id", IZDAVAC_UPSERT)
+    elif table == "skup_podataka":
+        report.count("datasets_written", copy_merge(cur, "skup_podataka", SKUP_COLUMNS, rows, "id", SKUP_UPSERT))
+        report.count("datasets_unchanged", touch_datasets(cur, {v.id for v in rows}))
+    elif table == "resurs":
+        report.count("resources_written", copy_merge(cur, "resurs", RESURS_COLUMNS, rows, "id", RESURS_UPSERT))
+    elif table == "komentar":
+        copy_merge(cur, "komentar", KOMENTAR_COLUMNS, rows, "import_source, import_id", KOMENTAR_CONFLICT)
+    else:
+        copy_slika(cur, rows)
+
+def insert_table(conn, table, rows, report):
+    # execute_values za jednu tablicu; insert_* sami commitaju
+    if table == "izdavac":
+        insert_izdavac(conn, {v.id: v for v in rows})
+    elif table == "skup_podataka":
+        written, unchanged = insert_skup_podataka(conn, {v.id: v for v in rows})
+        report.count("datasets_written", written)
+        report.count("datasets_unchanged", unchanged)
+    elif table == "resurs":
+        report.count("resources_written", insert_resurs(conn, rows))
+    elif table == "komentar":
+        insert_komentar(conn, rows)
+    else:
+        insert_slika(conn, rows)
+
+def load_tables(all_publishers, all_datasets, all_resources, all_discussions, all_files):
+    # {tablica: zapisi} redom punjenja (strani kljucevi)
+    return dict(zip(LOAD_ORDER, (all_publishers.values(), all_datasets.values(), all_resources, all_discussions, all_files)))
+
+def bulk_load(conn, all_publishers, all_datasets, all_resources, all_discussions, all_files, report=None):
+    # Sve tablice u jednoj transakciji preko COPY
+    if report is None:
+        report = ImportReport()
+    with conn.cursor() as cur:
+        for table, rows in load_tables(all_publishers, all_datasets, all_resources, all_discussions, all_files).items():
+            with report.stage(f"copy_{table}"):
+                copy_table(cur, table, rows, report)
+    with report.stage("commit"):
+        conn.commit()
+
+def load_batch(conn, table, rows, loader, report):
+    if loader == "copy":
+        with conn.cursor() as cur:
+            copy_table(cur, table, rows, report)
+        conn.commit()
+    else:
+        insert_table(conn, table, rows, report)
+
+# Redoslijed redova pri punjenju u serijama: isti u svakom pokretanju s istim dnevnikom
+ROW_KEYS = {
+    "izdavac": lambda v: v.id,
+    "skup_podataka": lambda v: v.id,
+    "resurs": lambda v: v.id,
+    "komentar": lambda v: v.import_id,
+    "slika": lambda v: (v.import_id, v.content_hash),
+}
+
+def load_checkpointed(conn, checkpoint, tables, loader="copy", batch_rows=50000, report=None):
+    """
+    Load tables ({table: records}) in batches of batch_rows, committing each batch and recording it in
+    the checkpoint. Rows a previous run already committed are skipped. Returns the number of skipped rows.
+    """
+    if report is None:
+        report = ImportReport()
+    skipped = 0
+    for table, rows in tables.items():
+        rows = sorted(rows, key=ROW_KEYS[table])
+        done = checkpoint.rows_loaded(table)
+        if done:
+            print(f"Resuming {table} after {done} committed rows")
+            skipped += min(done, len(rows))
+        for start in range(done, len(rows), batch_rows):
+            batch = rows[start:start + batch_rows]
+            with report.stage(f"{'copy' if loader == 'copy' else 'insert'}_{table}"):
+                load_batch(conn, table, batch, loader, report)
+            checkpoint.rows_committed(table, start + len(batch))
+    return skipped
+
+def extract_img_data(files_xml, seen_posts):
+    root = files_root(files_xml)
     files = []
 
     for file_elem in root.findall(".//file"):
@@ -250,260 +788,568 @@ def extract_img_data(files_xml_path, seen_posts):
             continue
         
         if (filename and filename != "." and mimetype not in ("$@NULL@$", None, "") and contenthash and item_id):
-            files.append({
-                "komentar_id": int(item_id),
-                "content_hash": contenthash,
-                "original_name": clean(filename),
-                "mime_type": mimetype,
-                "created": datetime.fromtimestamp(int(created)),
-            })
+            files.append(Slika(int(item_id), contenthash, clean(filename), mimetype, datetime.fromtimestamp(int(created))))
             
     return files
 
-# def collect_files_from_backup(extracted_root, output_folder, files_info):
-#     files_dir = os.path.join(extracted_root, "files")
-#     os.makedirs(output_folder, exist_ok=True)
-
-#     for f in files_info:
-#         content_hash = f["content_hash"]
-#         subdir = content_hash[:2]
-#         src_path = os.path.join(files_dir, subdir, content_hash)
-#         if os.path.exists(src_path):
-#             dst_path = os.path.join(output_folder, content_hash)
-#             shutil.copy2(src_path, dst_path)
-#         else:
-#             continue
-
-def extract_data(activities_path, all_datasets, all_resources, all_publishers, seen_posts):
-    activities_dir = Path(activities_path)
-    forum_folders = [d for d in activities_dir.iterdir() if d.is_dir()]
-    if not forum_folders:
-        raise FileNotFoundError("No forum folder found inside activities/")
-
-    forum_dir = forum_folders[0]
-    discussion_file = forum_dir / 'forum.xml'
-    tree = ET.parse(discussion_file)
-    root = tree.getroot()   
+def extract_post(post, dataset_links, post_datasets, seen_posts, skip_posts=frozenset(), report=None):
+    """Komentar of one <post> (skup_id filled in later by link_discussions), or None for skipped posts."""
+    # Osnovne informacije komentara (id, korisnik, vrijeme, naslov, poruka)
+    post_id = int(post.get("id"))
+    # Vec uvezeni komentari (--incremental) se preskacu prije ciscenja HTML-a i CKAN-a
+    if post_id in skip_posts:
+        return None
+    seen_posts.add(post_id)
+    user_id = int(post.findtext("userid"))
+    created_timestamp = datetime.fromtimestamp(int(post.findtext("created")))
+    subject = clean(post.findtext("subject") or "")
+    
+    message = post.findtext("message")
+    wall, cpu = time.perf_counter(), time.process_time()
+    message_cleaned = sanitize_message(message)
+    if report is not None:
+        report.add_time("sanitize_message", time.perf_counter() - wall, time.process_time() - cpu)
+    
+    # Postoji li dataset link, zapamti identifikator; metapodaci se dohvacaju u resolve_datasets
+    match = DATASET_URL_RE.search(message or "")
+    if match:
+        full_url = match.group(1)
+        identifier = match.group(2)
+        dataset_links.setdefault(identifier, full_url)
+        post_datasets[post_id] = identifier
+
+    return Komentar(post_id, user_id, None, created_timestamp, subject, message_cleaned, IMPORT_SOURCE)
+
+def extract_data(forum_xml, dataset_links, post_datasets, seen_posts, skip_posts=frozenset(), report=None):
     discussions = []
+    for post in iter_posts(forum_xml):
+        discussion = extract_post(post, dataset_links, post_datasets, seen_posts, skip_posts, report)
+        if discussion is not None:
+            discussions.append(discussion)
+    return discussions
 
-    for discussion in root.findall(".//discussion"):
-        for post in discussion.findall(".//post"):
-            
-            # Osnovne informacije komentara (id, korisnik, vrijeme, naslov, poruka)
-            post_id = int(post.get("id"))
-            seen_posts.add(post_id)
-            user_id = int(post.findtext("userid"))
-            created_timestamp = datetime.fromtimestamp(int(post.findtext("created")))
-            subject = clean(post.findtext("subject") or "")
-            
-            message = post.findtext("message")
-            soup = BeautifulSoup(html.unescape(message), features="html.parser")
-            
-            for tag in soup(["script", "style", "noscript", "img"]):
-                tag.decompose()
-            for elem in soup.find_all(string=True):
-                elem.replace_with(clean(elem))
-            for tag in soup.find_all():
-                tag.attrs = {}
-
-            message_cleaned = str(soup)
-            
-            discussions.append({
-                "id": post_id,
-                "user_id": user_id,
-                "skup_id": None,
-                "created": created_timestamp,
-                "subject": subject,
-                "message": message_cleaned
+def add_dataset(identifier, full_url, result, all_datasets, all_resources, all_publishers):
+    # Metapodaci skupa - stringovi
+    dataset_id = result.get("id")
+    title = result.get("title")
+    refresh_frequency = result.get("data_refresh_frequency")
+    theme = result.get("theme")
+    dataset_description = result.get("notes")
+    url = full_url
+    state = result.get("state")
+    
+    # Timestamp  "2021-05-05T11:47:30.254500" - vec je u formatu
+    created = result.get("metadata_created")
+    modified = result.get("metadata_modified")
+    
+    # Licenca
+    is_open = bool(result.get("isopen"))
+    access_rights = result.get("access_rights")
+    license_title = result.get("license_title")
+    license_url = result.get("license_url")
+    license_id = result.get("license_id")
+    
+    # Izdavac
+    publisher_id = result.get("organization", {}).get("id")
+    publisher = result.get("organization", {}).get("title")
+    publisher_description = result.get("organization", {}).get("description")
+    if not publisher:
+        publisher = result.get("author")
+        
+        
+    if publisher_id and publisher_id not in all_publishers:
+        all_publishers[publisher_id] = Izdavac(publisher_id, publisher, publisher_description)
+        
+    # Tags
+    tags = result.get("tags", [])
+    tags_list = [tag.get("name") for tag in tags]
+    
+    # Resursi
+    resources = result.get("resources", [])
+    for res in resources:
+        resource_id = res.get("id")
+        # Zasto im je ovo string? :)
+        available_through_api = res.get("available_through_api", "").lower()
+        available_through_api = available_through_api in ("true", "1", "yes")
+        
+        created = res.get("created")
+        resource_desc = res.get("description")
+        fmt = res.get("format")
+        last_modified = res.get("last_modified")
+        mimetype = res.get("mimetype")
+        name = res.get("name")
+        state = res.get("state")
+        size = int(res.get("size", 0) or 0)
+        resource_url = res.get("url")
+        
+        all_resources.append(make_resurs(
+            resource_id, dataset_id, available_through_api, name, resource_desc, created,
+            last_modified, fmt, mimetype, state, size, resource_url
+        ))
+        
+        
+    all_datasets[identifier] = make_skup(
+        dataset_id, title, refresh_frequency, theme, dataset_description, url, state, created,
+        modified, is_open, access_rights, license_title, license_url, license_id, publisher_id, tags_list
+    )
+
+# Skupovi se s dnevnikom (checkpoint) rjesavaju u dijelovima, da prekid ne izgubi vec dohvacene
+RESOLVE_CHUNK = 500
+
+def resolve_datasets(dataset_links, all_datasets, all_resources, all_publishers, ckan_url=CKAN_URL, workers=8, cache=None, offline=False, latencies=None, checkpoint=None):
+    # Dohvati sve nove skupove odjednom, paralelno preko jedne keep-alive sesije (ili iz cachea).
+    # Vraca identifikatore koji nisu rijeseni zbog prolazne greske (zahtjev, --offline bez cachea);
+    # skup koji CKAN ne poznaje (PackageNotFound) je rijesen i samo izostaje
+    pending = [identifier for identifier in dataset_links if identifier not in all_datasets]
+    if checkpoint is None:
+        responses = fetch_packages(pending, ckan_url=ckan_url, workers=workers, cache=cache, offline=offline, latencies=latencies)
+    else:
+        responses = {identifier: {"success": True, "result": result} for identifier, result in checkpoint.datasets(pending).items()}
+        if responses:
+            print(f"Resuming with {len(responses)} datasets from the checkpoint")
+        # Nakon zavrsenog rjesavanja skup redova za punjenje vise se ne mijenja (nastavak punjenja po broju redova)
+        missing = [] if checkpoint.resolved else [identifier for identifier in pending if identifier not in responses]
+        for start in range(0, len(missing), RESOLVE_CHUNK):
+            fetched = fetch_packages(missing[start:start + RESOLVE_CHUNK], ckan_url=ckan_url, workers=workers, cache=cache, offline=offline, latencies=latencies)
+            checkpoint.save_datasets({
+                identifier: resp_json["result"] for identifier, resp_json in fetched.items()
+                if not isinstance(resp_json, Exception) and resp_json.get("success")
             })
-                        
-            # Postoji li dataset link, izvuci metapodatke skupa
-            match = re.search(r'(https:\/\/data\.gov\.hr\/ckan\/dataset\/([a-zA-Z0-9\-]+))', message or "")
-            if match:
-                full_url = match.group(1)
-                identifier = match.group(2)
-                
-                if identifier in all_datasets:
-                    dataset_id = all_datasets[identifier]["id"]
-                    # print(f"[INFO] Nasao sam duplikat dodijeliti cu mu id {dataset_id}")
-                    discussions[-1]["skup_id"] = dataset_id
-                    continue
-                
-                api_url = f"https://data.gov.hr/ckan/api/3/action/package_show?id={identifier}"
-
-                try:
-                    response = requests.get(api_url, timeout=3)
-                    response.raise_for_status()
-                    resp_json = response.json()
-
-                    if resp_json.get("success"):
-
-                        # Metapodaci skupa - stringovi
-                        dataset_id = resp_json["result"].get("id")
-                        title = resp_json["result"].get("title")
-                        refresh_frequency = resp_json["result"].get("data_refresh_frequency")
-                        theme = resp_json["result"].get("theme")
-                        dataset_description = resp_json["result"].get("notes")
-                        url = full_url
-                        state = resp_json["result"].get("state")
-                        
-                        # Update discussion sa skup_id
-                        discussions[-1]["skup_id"] = dataset_id
-                        
-                        # Timestamp  "2021-05-05T11:47:30.254500" - vec je u formatu
-                        created = resp_json["result"].get("metadata_created")
-                        modified = resp_json["result"].get("metadata_modified")
-                        
-                        # Licenca
-                        is_open = bool(resp_json["result"].get("isopen"))
-                        access_rights = resp_json["result"].get("access_rights")
-                        license_title = resp_json["result"].get("license_title")
-                        license_url = resp_json["result"].get("license_url")
-                        license_id = resp_json["result"].get("license_id")
-                        
-                        # Izdavac
-                        publisher_id = resp_json["result"].get("organization", {}).get("id")
-                        publisher = resp_json["result"].get("organization", {}).get("title")
-                        publisher_description = resp_json["result"].get("organization", {}).get("description")
-                        if not publisher:
-                            publisher = resp_json["result"].get("author")
-                            
-                            
-                        if publisher_id and publisher_id not in all_publishers:
-                            all_publishers[publisher_id] = {
-                                "id": publisher_id,
-                                "publisher": publisher,
-                                "description": publisher_description,
-                            }
-                            
-                        # Tags
-                        tags = resp_json["result"].get("tags", [])
-                        tags_list = [tag.get("name") for tag in tags]
-                        
-                        # Resursi
-                        resources = resp_json["result"].get("resources", [])
-                        for res in resources:
-                            resource_id = res.get("id")
-                            # Zasto im je ovo string? :)
-                            available_through_api = res.get("available_through_api", "").lower()
-                            available_through_api = available_through_api in ("true", "1", "yes")
-                            
-                            created = res.get("created")
-                            resource_desc = res.get("description")
-                            fmt = res.get("format")
-                            last_modified = res.get("last_modified")
-                            mimetype = res.get("mimetype")
-                            name = res.get("name")
-                            state = res.get("state")
-                            size = int(res.get("size", 0) or 0)
-                            resource_url = res.get("url")
-                            
-                            all_resources.append({
-                                "id": resource_id,
-                                "skup_id": dataset_id,
-                                "available_through_api": available_through_api,
-                                "name": name,
-                                "description": resource_desc,
-                                "created": created,
-                                "last_modified": last_modified,
-                                "format": fmt,
-                                "mimetype": mimetype,
-                                "state": state,
-                                "size": size,
-                                "url": resource_url
-                            })
-                            
-                            
-                        all_datasets[identifier] = {
-                            "id": dataset_id,
-                            "title": title,
-                            "refresh_frequency": refresh_frequency,
-                            "theme": theme,
-                            "description": dataset_description,
-                            "url": url,
-                            "state": state,
-                            "created": created,
-                            "modified": modified,
-                            "isopen": is_open,
-                            "access_rights": access_rights,
-                            "license_title": license_title,
-                            "license_url": license_url,
-                            "license_id": license_id,
-                            "publisher_id": publisher_id,
-                            "tags": tags_list
-                        }
-                        
-                    else:
-                        discussions.pop()
-                        print(f"[Warning]: Invalid dataset response for {identifier}, removing discussion {post_id}")
-                        
-                except requests.RequestException as e:
-                    discussions.pop()
-                    print(f"[Error] fetching dataset {identifier} for discussion {post_id}: {e}")
-                
-    return discussions
+            responses.update(fetched)
+        checkpoint.mark_resolved()
+
+    unresolved = set()
+    for identifier in pending:
+        resp_json = responses.get(identifier)
+        if resp_json is None:
+            # Nastavak nakon zavrsenog rjesavanja: ishod neuspjelih se ne pamti u dnevniku
+            unresolved.add(identifier)
+            continue
+        if isinstance(resp_json, PackageNotFound):
+            print(f"[Warning]: {resp_json}")
+        elif isinstance(resp_json, Exception):
+            print(f"[Error] fetching dataset {identifier}: {resp_json}")
+            unresolved.add(identifier)
+        elif resp_json.get("success"):
+            add_dataset(identifier, dataset_links[identifier], resp_json["result"], all_datasets, all_resources, all_publishers)
+        else:
+            print(f"[Warning]: Invalid dataset response for {identifier}")
+            unresolved.add(identifier)
+    return unresolved
+
+def link_discussions(all_discussions, post_datasets, all_datasets):
+    # Komentari ciji skup nije dohvacen ostaju bez skup_id i kasnije se izbacuju
+    for i, discussion in enumerate(all_discussions):
+        identifier = post_datasets.get(discussion.import_id)
+        if identifier in all_datasets:
+            all_discussions[i] = discussion._replace(skup_id=all_datasets[identifier].id)
+
+def backup_identifiers(discussions, post_datasets):
+    # Skupovi na koje pokazuju komentari jednog backupa
+    return {post_datasets[d.import_id] for d in discussions if d.import_id in post_datasets}
             
-def process_single_backup(mbz_path, all_datasets, all_discussions, all_resources, all_files, all_publishers, output_folder):
+def process_single_backup(mbz_path, dataset_links, post_datasets, all_discussions, all_files, skip_posts=frozenset(), report=None, backup_links=None):
     print(f"Processing: {mbz_path}")
-    unpack(mbz_path)
-    
+    if report is None:
+        report = ImportReport()
     seen_posts = set()
-    
-    discussions = extract_data('./extracted_moodle/activities', all_datasets, all_resources, all_publishers, seen_posts)
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    with report.stage("open_backup"):
+        backup = MoodleBackup(mbz_path)
+    with backup:
+        with report.stage("extract_data"):
+            discussions = extract_data(backup.forum_xml(), dataset_links, post_datasets, seen_posts, skip_posts, report)
+        all_discussions.extend(discussions)
+        if backup_links is not None:
+            backup_links[mbz_path] = backup_identifiers(discussions, post_datasets)
+        
+        with report.stage("extract_img_data"):
+            files = extract_img_data(backup.files_xml(), seen_posts)
+        all_files.extend(files)
+
+    report.count("backups")
+    report.count("posts_parsed", len(discussions))
+    report.count("files_parsed", len(files))
+    report.add_backup(mbz_path, time.perf_counter() - wall, time.process_time() - cpu, len(discussions), len(files))
+
+def parse_backup(mbz_path, skip_posts=frozenset()):
+    # Worker za --workers: svaki backup dobiva vlastite strukture, roditelj ih spaja
+    dataset_links = {}
+    post_datasets = {}
+    all_discussions = []
+    all_files = []
+    report = ImportReport()
+    process_single_backup(mbz_path, dataset_links, post_datasets, all_discussions, all_files, skip_posts, report)
+    return dataset_links, post_datasets, all_discussions, all_files, report.to_dict()
+
+def parse_checkpointed(mbz_files, fingerprints, skip_posts, workers, checkpoint, dataset_links, post_datasets, all_discussions, all_files, report=None, backup_links=None):
+    # Backupi obradeni u prethodnom pokretanju dolaze iz dnevnika; ostali se parsiraju (s --workers paralelno) i odmah biljeze
+    done = checkpoint.backups()
+    todo = [mbz for mbz in mbz_files if fingerprints[mbz] not in done]
+    if report is not None:
+        report.count("resumed_backups", len(mbz_files) - len(todo))
+    with contextlib.ExitStack() as stack:
+        if workers > 1 and len(todo) > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            fresh = pool.map(parse_backup, todo, repeat(skip_posts))
+        else:
+            fresh = map(parse_backup, todo, repeat(skip_posts))
+        for mbz in mbz_files:
+            if fingerprints[mbz] in done:
+                print(f"Resuming parsed backup: {mbz}")
+                result = checkpoint.load_backup(fingerprints[mbz])
+            else:
+                result = next(fresh)
+                checkpoint.save_backup(fingerprints[mbz], os.path.basename(mbz), result)
+            merge_backup(result, dataset_links, post_datasets, all_discussions, all_files, report)
+            if backup_links is not None:
+                backup_links[mbz] = set(result[0])
+
+def merge_backup(result, dataset_links, post_datasets, all_discussions, all_files, report=None):
+    links, posts, discussions, files, stats = result
+    if report is not None:
+        report.merge(stats)
+    # Prvi backup (redom ulaza) pobjeduje, isto kao kod serijske obrade
+    for identifier, full_url in links.items():
+        dataset_links.setdefault(identifier, full_url)
+    post_datasets.update(posts)
     all_discussions.extend(discussions)
-    
-    files = extract_img_data('./extracted_moodle/files.xml', seen_posts)
     all_files.extend(files)
-    
-    # collect_files_from_backup('./extracted_moodle', output_folder, files)
-
-    shutil.rmtree('./extracted_moodle', ignore_errors=True)
 
-def main(args):
-    input_path = args.input
-    if not os.path.exists(input_path):
-        print(f"Input path {input_path} does not exist.")
+def start_import(args, mbz_files, report):
+    """Connect, fingerprint the backups and (with --incremental) drop known ones. Returns (conn, mbz_files, fingerprints, skip_posts)."""
+    if args.offline and args.no_cache:
+        print("Error: --offline needs the CKAN cache")
         sys.exit(1)
 
-    mbz_files = []
-    if os.path.isdir(input_path):
-        mbz_files = [os.path.join(input_path, f) for f in os.listdir(input_path) if f.endswith(".mbz")]
-    elif input_path.endswith(".mbz"):
-        mbz_files = [input_path]
-    else:
-        print("Error: input must be a folder or .mbz file")
-        sys.exit(1)
+    with report.stage("connect"):
+        conn = get_connection()
+        create_postgres_tables(conn)
     
+    with report.stage("fingerprint"):
+        fingerprints = {mbz: fingerprint(mbz) for mbz in mbz_files}
+    skip_posts = frozenset()
+    if args.incremental:
+        imported = load_imported_backups(conn)
+        for mbz in mbz_files:
+            if fingerprints[mbz] in imported:
+                print(f"Skipping unchanged backup: {mbz}")
+        mbz_files = [mbz for mbz in mbz_files if fingerprints[mbz] not in imported]
+        skip_posts = frozenset(load_imported_posts(conn))
+        print(f"Already imported posts: {len(skip_posts)}")
+        report.count("skipped_backups", len(fingerprints) - len(mbz_files))
+        report.count("skipped_posts_known", len(skip_posts))
+    return conn, mbz_files, fingerprints, skip_posts
+
+def finish_import(conn, args, report, mbz_files, fingerprints, dataset_links, post_datasets, all_discussions, all_files, checkpoint=None, backup_links=None):
+    """
+    Resolve the datasets of parsed posts through CKAN and load everything into the database.
+
+    A backup is recorded for --incremental only when every dataset its posts link (backup_links,
+    {mbz: identifiers}) resolved or is known to be gone from CKAN; after a transient failure the next
+    run parses it again and retries the posts that were left out. Without backup_links a backup is
+    recorded only when nothing failed transiently.
+
+    With an ImportCheckpoint, resolved datasets and committed row batches are journaled (and reused on resume).
+    """
     all_datasets = {}
     all_publishers = {}
-    all_discussions = []
-    all_files = []
     all_resources = []
 
-    output_folder = "./all_files"
-    # os.makedirs(output_folder, exist_ok=True)
-    
+    with report.stage("resolve_datasets"):
+        if args.no_cache:
+            unresolved = resolve_datasets(dataset_links, all_datasets, all_resources, all_publishers, ckan_url=args.ckan_url, workers=args.ckan_workers, latencies=report.latencies, checkpoint=checkpoint)
+        else:
+            with ResponseCache(args.cache, ttl=args.cache_ttl * 3600, max_bytes=args.cache_max_mb * 1024 * 1024) as cache:
+                unresolved = resolve_datasets(dataset_links, all_datasets, all_resources, all_publishers, ckan_url=args.ckan_url, workers=args.ckan_workers, cache=cache, offline=args.offline, latencies=report.latencies, checkpoint=checkpoint)
+                print(f"CKAN cache: {cache.hits} hits, {cache.misses} misses")
+                report.set_cache(cache.hits, cache.misses)
+    link_discussions(all_discussions, post_datasets, all_datasets)
+    report.count("dataset_links", len(dataset_links))
+    report.count("datasets", len(all_datasets))
+    report.count("publishers", len(all_publishers))
+
+    backup_links = backup_links or {}
+    complete = [mbz for mbz in mbz_files if unresolved.isdisjoint(backup_links.get(mbz, unresolved))]
     for mbz in mbz_files:
-        process_single_backup(mbz, all_datasets, all_discussions, all_resources, all_files, all_publishers, output_folder)
+        if mbz not in complete:
+            print(f"[Warning]: {mbz} has unresolved datasets, it is not recorded as imported")
+    report.count("backups_unrecorded", len(mbz_files) - len(complete))
         
-    all_discussions = [d for d in all_discussions if d["skup_id"] is not None]
-    valid_comment_ids = {d["id"] for d in all_discussions}
-    all_files = [f for f in all_files if f["komentar_id"] in valid_comment_ids]
+    # Vise identifikatora (ime, uuid) moze voditi na isti skup
+    seen_resources = set()
+    all_resources = [r for r in all_resources if not (r.id in seen_resources or seen_resources.add(r.id))]
+
+    parsed_posts = len(all_discussions)
+    all_discussions = [d for d in all_discussions if d.skup_id is not None]
+    valid_comment_ids = {d.import_id for d in all_discussions}
+    all_files = [f for f in all_files if f.import_id in valid_comment_ids]
+    report.count("resources", len(all_resources))
+    report.count("posts_loaded", len(all_discussions))
+    report.count("posts_without_dataset", parsed_posts - len(all_discussions))
+    report.count("files_loaded", len(all_files))
+    
+    with report.stage("load"):
+        tables = load_tables(all_publishers, all_datasets, all_resources, all_discussions, all_files)
+        if checkpoint is not None:
+            report.count("resumed_rows", load_checkpointed(conn, checkpoint, tables, args.loader, args.batch_rows, report))
+        elif args.loader == "copy":
+            bulk_load(conn, all_publishers, all_datasets, all_resources, all_discussions, all_files, report)
+        else:
+            for table, rows in tables.items():
+                with report.stage(f"insert_{table}"):
+                    insert_table(conn, table, rows, report)
+        record_backups(conn, [(fingerprints[mbz], os.path.basename(mbz)) for mbz in complete])
+    with report.stage("indexes"):
+        report.count("indexes_created", len(create_indexes(conn)))
+    with report.stage("stats"):
+        report.count("stats_datasets_refreshed", refresh_stats(conn, {v.id for v in all_datasets.values()}))
+
+def main(args):
+    mbz_files = list_backups(args.input)
+    
+    dataset_links = {}
+    post_datasets = {}
+    all_discussions = []
+    all_files = []
+    backup_links = {}
+
+    report = ImportReport()
+    profiler = cProfile.Profile() if args.profile else None
+
+    conn, mbz_files, fingerprints, skip_posts = start_import(args, mbz_files, report)
     
+    # --profile pokriva parsiranje, CKAN i punjenje baze u glavnom procesu (ne i --workers procese)
+    if profiler:
+        profiler.enable()
+
+    workers = args.workers or os.cpu_count()
+    checkpoint = ImportCheckpoint(args.checkpoint, fingerprints.values()) if args.checkpoint else None
+    with report.stage("parse_backups"):
+        if checkpoint is not None:
+            parse_checkpointed(mbz_files, fingerprints, skip_posts, workers, checkpoint, dataset_links, post_datasets, all_discussions, all_files, report, backup_links)
+        elif workers > 1 and len(mbz_files) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for mbz, result in zip(mbz_files, pool.map(parse_backup, mbz_files, repeat(skip_posts))):
+                    merge_backup(result, dataset_links, post_datasets, all_discussions, all_files, report)
+                    backup_links[mbz] = set(result[0])
+        else:
+            for mbz in mbz_files:
+                process_single_backup(mbz, dataset_links, post_datasets, all_discussions, all_files, skip_posts, report, backup_links)
+
+    finish_import(conn, args, report, mbz_files, fingerprints, dataset_links, post_datasets, all_discussions, all_files, checkpoint, backup_links)
+    conn.close()
+    if checkpoint is not None:
+        checkpoint.finish()
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Profile written to {args.profile}")
+    report.write(args.report, {"loader": args.loader, "workers": workers})
+    print(f"Report written to {args.report}")
+
+def load_stale_urls(conn, max_age_hours, limit=None):
+    # URL-ovi bez provjere ili s provjerom starijom od max_age_hours; najstariji prvi
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT url FROM resurs
+               WHERE url IS NOT NULL AND url <> ''
+               GROUP BY url
+               HAVING MAX(url_checked_at) IS NULL OR MAX(url_checked_at) < now() - %s * interval '1 hour'
+               ORDER BY MAX(url_checked_at) NULLS FIRST, url
+               LIMIT %s""",
+            (max_age_hours, limit)
+        )
+        return [row[0] for row in cur.fetchall()]
+
+def store_url_checks(conn, results):
+    # results: {url: {status, ok, latency_ms, error, checked_at}}; jedan UPDATE za sve resurse s tim URL-ovima
+    if not results:
+        return
     
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """UPDATE resurs AS r
+               SET url_status = v.status, url_ok = v.ok, url_latency_ms = v.latency_ms,
+                   url_error = v.error, url_checked_at = v.checked_at
+               FROM (VALUES %s) AS v (url, status, ok, latency_ms, error, checked_at)
+               WHERE r.url = v.url""",
+            [
+                (url, r["status"], r["ok"], r["latency_ms"], r["error"], r["checked_at"])
+                for url, r in results.items()
+            ],
+            template="(%s, %s::int, %s::boolean, %s::int, %s::text, %s::timestamp)",
+            page_size=1000,
+        )
+        conn.commit()
+
+def check_resource_urls(args):
+    report = ImportReport()
+    with report.stage("connect"):
+        conn = get_connection()
+        create_postgres_tables(conn)
+    with report.stage("load_urls"):
+        urls = load_stale_urls(conn, args.max_age, args.limit)
+    print(f"Checking {len(urls)} resource URLs")
+
+    # U serijama, da prekid ne izgubi sve rezultate
+    checked = ok = 0
+    for start in range(0, len(urls), args.batch_size):
+        batch = urls[start:start + args.batch_size]
+        with report.stage("check"):
+            results = check_urls(batch, workers=args.workers, per_host=args.per_host, delay=args.delay, timeout=args.timeout, latencies=report.latencies)
+        with report.stage("store"):
+            store_url_checks(conn, results)
+        checked += len(results)
+        ok += sum(r["ok"] for r in results.values())
+        print(f"Checked {checked}/{len(urls)} URLs, {checked - ok} unavailable")
+    conn.close()
+
+    report.count("urls_checked", checked)
+    report.count("urls_unavailable", checked - ok)
+    report.write(args.report, {"command": "check-urls"})
+    print(f"Report written to {args.report}")
+
+def load_stale_datasets(conn, max_age_hours, limit=None):
+    # {id: url} skupova dohvacenih prije vise od max_age_hours; najstariji prvi
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT id, url FROM skup_podataka
+               WHERE fetched_at < now() - %s * interval '1 hour'
+               ORDER BY fetched_at, id
+               LIMIT %s""",
+            (max_age_hours, limit)
+        )
+        return dict(cur.fetchall())
+
+def delete_missing_resources(conn, dataset_ids, resource_ids):
+    # Resursi osvjezenih skupova koje CKAN vise ne navodi
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM resurs WHERE skup_id = ANY(%s) AND NOT (id = ANY(%s))",
+            (list(dataset_ids), list(resource_ids))
+        )
+        conn.commit()
+        return cur.rowcount
+
+def refresh_datasets(args):
+    report = ImportReport()
+    with report.stage("connect"):
+        conn = get_connection()
+        create_postgres_tables(conn)
+    with report.stage("load_datasets"):
+        stale = load_stale_datasets(conn, args.max_age, args.limit)
+    print(f"Refreshing {len(stale)} datasets")
+
+    # U serijama (workers zahtjeva po batch_size skupova), da prekid ne izgubi sve rezultate
+    ids = list(stale)
+    round_size = args.batch_size * args.ckan_workers
+    refreshed = []
+    for start in range(0, len(ids), round_size):
+        with report.stage("fetch"):
+            results = fetch_packages_by_id(ids[start:start + round_size], ckan_url=args.ckan_url, batch_size=args.batch_size, workers=args.ckan_workers, latencies=report.latencies)
+        all_datasets = {}
+        all_resources = []
+        all_publishers = {}
+        missing = []
+        for dataset_id, result in results.items():
+            if isinstance(result, LookupError):
+                missing.append(dataset_id)
+            elif isinstance(result, Exception):
+                print(f"[Warning]: {dataset_id}: {result}")
+                report.count("datasets_failed")
+            else:
+                add_dataset(dataset_id, stale[dataset_id], result, all_datasets, all_resources, all_publishers)
+        with report.stage("store"):
+            # Obrisani ili privatni skupovi ostaju kakvi jesu, ali ne zauzimaju red cekanja u sljedecem pokretanju
+            if missing:
+                print(f"[Warning]: {len(missing)} datasets no longer in CKAN search")
+                with conn.cursor() as cur:
+                    report.count("datasets_missing", touch_datasets(cur, missing))
+                conn.commit()
+            insert_izdavac(conn, all_publishers)
+            written, unchanged = insert_skup_podataka(conn, all_datasets)
+            report.count("datasets_written", written)
+            report.count("datasets_unchanged", unchanged)
+            report.count("resources_written", insert_resurs(conn, all_resources))
+            report.count("resources_removed", delete_missing_resources(conn, all_datasets, {r.id for r in all_resources}))
+        refreshed.extend(all_datasets)
+        print(f"Refreshed {len(refreshed)}/{len(ids)} datasets")
+
+    with report.stage("stats"):
+        refresh_stats(conn, refreshed)
+    conn.close()
+    report.count("datasets_refreshed", len(refreshed))
+    report.write(args.report, {"command": "refresh"})
+    print(f"Report written to {args.report}")
+
+def update_stats(args):
+    # Za cron: komentari i odgovori iz backenda ulaze u stats_* tablice tek osvjezavanjem
     conn = get_connection()
     create_postgres_tables(conn)
-    insert_izdavac(conn, all_publishers)
-    insert_skup_podataka(conn, all_datasets)
-    insert_resurs(conn, all_resources)
-    insert_komentar(conn, all_discussions)
-    insert_slika(conn, all_files)
+    refreshed = refresh_stats(conn, None if args.all else [])
     conn.close()
-    
+    print(f"Statistics refreshed for {refreshed} datasets")
+
+def add_import_arguments(parser):
+    # Zajednicko s processBackups.py (--db)
+    parser.add_argument("--ckan-url", help="CKAN base URL used for package_show", default=CKAN_URL, type=str)
+    parser.add_argument("--ckan-workers", help="Max concurrent CKAN requests", default=8, type=int)
+    parser.add_argument("--cache", help="SQLite file for cached package_show responses", default="./ckan_cache.sqlite", type=str)
+    parser.add_argument("--cache-ttl", help="Hours before a cached response is refetched", default=24, type=float)
+    parser.add_argument("--cache-max-mb", help="Cache size limit, least recently used entries are evicted", default=256, type=int)
+    parser.add_argument("--no-cache", help="Always fetch from CKAN and do not touch the cache", action="store_true")
+    parser.add_argument("--offline", help="Replay only from the cache, never contact CKAN", action="store_true")
+    parser.add_argument("--incremental", help="Skip backups and posts that were already imported", action="store_true")
+    parser.add_argument("--loader", help="copy: COPY into staging tables in one transaction, values: execute_values per table", choices=("copy", "values"), default="copy")
+    parser.add_argument("--report", help="JSON file with per-stage timings, counters, CKAN latency and cache stats", default="./import_report.json", type=str)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract and process Moodle data and load into db")
-    parser.add_argument("-i", "--input", help="Input .mbz file or folder of .mbz files", required=True, type=str)
-    args = parser.parse_args()
-    main(args)
-    
\ No newline at end of file
+    commands = parser.add_subparsers(dest="command")
+
+    import_parser = commands.add_parser("import", help="Import Moodle backups and their CKAN datasets (default)")
+    import_parser.add_argument("-i", "--input", help="Input .mbz file or folder of .mbz files", required=True, type=str)
+    import_parser.add_argument("-w", "--workers", help="Number of backups parsed in parallel (0 = all cores)", default=1, type=int)
+    add_import_arguments(import_parser)
+    import_parser.add_argument("--checkpoint", help="SQLite journal of parsed backups, resolved datasets and committed batches; rerun with the same file to resume after a failure", type=str)
+    import_parser.add_argument("--batch-rows", help="Rows per committed batch with --checkpoint", default=50000, type=int)
+    import_parser.add_argument("--profile", help="Write a cProfile dump of parsing, CKAN and loading (main process only) to this file", type=str)
+    import_parser.set_defaults(func=main)
+
+    check_parser = commands.add_parser("check-urls", help="Probe resurs.url availability and store status and latency")
+    check_parser.add_argument("-w", "--workers", help="Max concurrent requests overall", default=32, type=int)
+    check_parser.add_argument("--per-host", help="Max concurrent requests per host", default=2, type=int)
+    check_parser.add_argument("--delay", help="Seconds between request starts to the same host", default=0.5, type=float)
+    check_parser.add_argument("--timeout", help="Seconds before a request is considered failed", default=10, type=float)
+    check_parser.add_argument("--max-age", help="Recheck URLs whose last check is older than this many hours", default=24 * 7, type=float)
+    check_parser.add_argument("--limit", help="Check at most this many URLs (oldest checks first)", type=int)
+    check_parser.add_argument("--batch-size", help="URLs checked and written back per batch", default=500, type=int)
+    check_parser.add_argument("--report", help="JSON file with timings and latency histogram", default="./check_urls_report.json", type=str)
+    check_parser.set_defaults(func=check_resource_urls)
+
+    refresh_parser = commands.add_parser("refresh", help="Refetch CKAN metadata of datasets with an old fetched_at through package_search")
+    refresh_parser.add_argument("--ckan-url", help="CKAN base URL used for package_search", default=CKAN_URL, type=str)
+    refresh_parser.add_argument("--ckan-workers", help="Max concurrent CKAN requests", default=4, type=int)
+    refresh_parser.add_argument("--batch-size", help="Dataset ids per package_search request", default=SEARCH_BATCH_SIZE, type=int)
+    refresh_parser.add_argument("--max-age", help="Refresh datasets fetched more than this many hours ago", default=24, type=float)
+    refresh_parser.add_argument("--limit", help="Refresh at most this many datasets (oldest first)", type=int)
+    refresh_parser.add_argument("--report", help="JSON file with timings and CKAN latency", default="./refresh_report.json", type=str)
+    refresh_parser.set_defaults(func=refresh_datasets)
+
+    stats_parser = commands.add_parser("stats", help="Refresh the statistics rollups of datasets whose comments or answers changed")
+    stats_parser.add_argument("--all", help="Recompute the rollups of every dataset", action="store_true")
+    stats_parser.set_defaults(func=update_stats)
+
+    # Bez podnaredbe vrijedi stari poziv: createAndLoadDb.py -i ... je import
+    argv = sys.argv[1:]
+    if argv and argv[0] not in commands.choices and argv[0] not in ("-h", "--help"):
+        argv = ["import"] + argv
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+    args.func(args)
@@ -1,50 +1,21 @@
 import argparse, os, sys
-import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import sqlite3
 from datetime import datetime
-import tarfile
-from pathlib import Path
-import shutil
 import re
 from bs4 import BeautifulSoup
 import html
 import uuid
+from moodleBackup import MoodleBackup, files_root, iter_posts, list_backups
+from htmlSanitizer import clean
+from blobStore import BlobStore
 
 NAMESPACE = uuid.UUID("12345678-1234-5678-1234-567812345678")
 
-def unpack(tgz_file):
-    with tarfile.open(tgz_file, "r:gz") as tar:
-        tar.extractall(path='./extracted_moodle', filter='data')
-        
-def clean(text):
-    if not text:
-        return ""
-    
-    # if isinstance(text, bytes):
-    #     text = text.decode("utf-8", "replace")
-    # else:
-    #     text = text.encode("utf-8", "replace").decode("utf-8")
-    
-    replacements = {
-        "\u2013": "-", "\u2014": "-",
-        "\u2212": "-", "\u2018": "'",
-        "\u2019": "'", "\u201C": '"',
-        "\u201D": '"', "\u2026": "...",
-        "\u00A0": " ", "\u200B": "",    
-    }
-     
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
-        
-    text = ''.join(c for c in text if c.isprintable())
-    
-    text = re.sub(r'[\u2000-\u200F\u202A-\u202F\u205F\u3000]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def extract_files(files_xml_path, itemid_to_postid):
-    tree = ET.parse(files_xml_path)
-    root = tree.getroot()
+def extract_files(files_xml, itemid_to_postid):
+    root = files_root(files_xml)
     files = []
 
     for file_elem in root.findall(".//file"):
@@ -69,151 +40,268 @@ def extract_files(files_xml_path, itemid_to_postid):
             
     return files
 
-def collect_files_from_backup(extracted_root, output_folder, files_info):
-    files_dir = os.path.join(extracted_root, "files")
-    os.makedirs(output_folder, exist_ok=True)
+def collect_files_from_backup(backup, store, files_info):
+    # Samo referencirani blobovi kojih jos nema u spremistu (iz ranijih backupa ili pokretanja)
+    store.add_from_backup(backup, (f["content_hash"] for f in files_info))
 
-    for f in files_info:
-        content_hash = f["content_hash"]
-        subdir = content_hash[:2]
-        src_path = os.path.join(files_dir, subdir, content_hash)
-        if os.path.exists(src_path):
-            dst_path = os.path.join(output_folder, content_hash)
-            shutil.copy2(src_path, dst_path)
-        else:
-            continue
+def extract_discussion(post, unique_urls, analiza_skup_links, itemid_to_postid):
+    """analize row of one <post>, or None if the post links no dataset."""
+    postid = post.get("id")
+    created_timestamp = post.findtext("created")
+    message = post.findtext("message")
+    urls = re.findall(r'https://data[^\s,"<]+', message or "")
+    if not urls:
+        return None
 
-def extract_discussions(activities_path, unique_urls, analiza_skup_links, itemid_to_postid):
-    activities_dir = Path(activities_path)
-    forum_folders = [d for d in activities_dir.iterdir() if d.is_dir()]
-    if not forum_folders:
-        raise FileNotFoundError("No forum folder found inside activities/")
+    soup = BeautifulSoup(html.unescape(message), features="html.parser")
+    for script in soup(["script", "style"]):
+        script.extract()
 
-    forum_dir = forum_folders[0]
-    discussion_file = forum_dir / 'forum.xml'
-    tree = ET.parse(discussion_file)
-    root = tree.getroot()   
-    discussions = {}
+    text = clean(soup.get_text(separator=" "))
+    subject = clean(post.findtext("subject") or "")
+
+    seen_analiza_skup = set()
+    for u in urls:
+        if u not in unique_urls:
+            u_id = uuid.uuid5(NAMESPACE, u)
+            unique_urls[u] = (str(u_id), subject)
+        else:
+            u_id = unique_urls[u][0]
 
-    for discussion in root.findall(".//discussion"):
-        for post in discussion.findall(".//post"):
-            postid = post.get("id")
-            created_timestamp = post.findtext("created")
-            message = post.findtext("message")
-            soup = BeautifulSoup(html.unescape(message), features="html.parser")
-            for script in soup(["script", "style"]):
-                script.extract()
+        key = (int(postid), str(u_id))
+        if key not in seen_analiza_skup:
+            analiza_skup_links.append({
+                "analiza_id": int(postid),
+                "skup_id": str(u_id)
+            })
+            seen_analiza_skup.add(key)
 
-            text = clean(soup.get_text(separator=" "))
-            subject = clean(post.findtext("subject") or "")
-            urls = re.findall(r'https://data[^\s,"<]+', message or "")
+    itemid_to_postid[str(postid)] = postid
+    return {
+        "id": int(postid),
+        "user_id": int(post.findtext("userid")),
+        "created": datetime.fromtimestamp(int(created_timestamp)),
+        "subject": subject,
+        "message": text
+    }
 
-            seen_analiza_skup = set()
-            
-            if urls:
-                for u in urls:
-                    if u not in unique_urls:
-                        u_id = uuid.uuid5(NAMESPACE, u)
-                        unique_urls[u] = (str(u_id), subject)
-                    else:
-                        u_id = unique_urls[u][0]
-
-                    key = (int(postid), str(u_id))
-                    if key not in seen_analiza_skup:
-                        analiza_skup_links.append({
-                            "analiza_id": int(postid),
-                            "skup_id": str(u_id)
-                        })
-                        seen_analiza_skup.add(key)
-
-                discussions[postid] = {
-                    "id": int(postid),
-                    "user_id": int(post.findtext("userid")),
-                    "created": datetime.fromtimestamp(int(created_timestamp)),
-                    "subject": subject,
-                    "message": text
-                }
-                itemid_to_postid[str(postid)] = postid
+def extract_discussions(forum_xml, unique_urls, analiza_skup_links, itemid_to_postid):
+    discussions = {}
+
+    for post in iter_posts(forum_xml):
+        discussion = extract_discussion(post, unique_urls, analiza_skup_links, itemid_to_postid)
+        if discussion is not None:
+            discussions[post.get("id")] = discussion
 
     return list(discussions.values()), unique_urls, analiza_skup_links
             
-def process_single_backup(mbz_path, unique_urls, all_discussions, all_files, analiza_skup_links, output_folder):
+def process_single_backup(mbz_path, unique_urls, all_discussions, all_files, analiza_skup_links, store):
     print(f"Processing: {mbz_path}")
-    unpack(mbz_path)
-    
     itemid_to_postid = {}
     
-    discussions, urls, analiza_skup_links = extract_discussions('./extracted_moodle/activities', unique_urls, analiza_skup_links, itemid_to_postid)
-    all_discussions.extend(discussions)
-    
-    files = extract_files('./extracted_moodle/files.xml', itemid_to_postid)
-    all_files.extend(files)
-    
-    collect_files_from_backup('./extracted_moodle', output_folder, files)
+    with MoodleBackup(mbz_path) as backup:
+        discussions, urls, analiza_skup_links = extract_discussions(backup.forum_xml(), unique_urls, analiza_skup_links, itemid_to_postid)
+        all_discussions.extend(discussions)
+        
+        files = extract_files(backup.files_xml(), itemid_to_postid)
+        all_files.extend(files)
+        
+        collect_files_from_backup(backup, store, files)
 
-    shutil.rmtree('./extracted_moodle', ignore_errors=True)
     return analiza_skup_links
 
-def main(args):
-    input_path = args.input
-    if not os.path.exists(input_path):
-        print(f"Input path {input_path} does not exist.")
-        sys.exit(1)
+def parse_backup(mbz_path, output_folder, copy_workers):
+    # Worker za --workers: svaki backup dobiva vlastite strukture i vlastito spremiste blobova
+    with BlobStore(output_folder, workers=copy_workers) as store:
+        result = read_backup(mbz_path, store)
+    return result + ((store.written, store.skipped),)
 
-    mbz_files = []
-    if os.path.isdir(input_path):
-        mbz_files = [os.path.join(input_path, f) for f in os.listdir(input_path) if f.endswith(".mbz")]
-    elif input_path.endswith(".mbz"):
-        mbz_files = [input_path]
-    else:
-        print("Error: input must be a folder or .mbz file")
-        sys.exit(1)
-    
+def read_backup(mbz_path, store):
     unique_urls = {}
     all_discussions = []
     all_files = []
     analiza_skup_links = []
-    
+    process_single_backup(mbz_path, unique_urls, all_discussions, all_files, analiza_skup_links, store)
+    return unique_urls, all_discussions, all_files, analiza_skup_links
+
+# Broj redaka po row groupu (Parquet) odnosno record batchu (Arrow IPC)
+ROW_GROUP_SIZE = 65536
+
+class TableExport:
+    """
+    The four tables of the export, appended to backup by backup.
+
+    Rows of a backup are written as soon as it is parsed, so memory does not grow with the
+    number of backups. Dataset URLs and content hashes already written are remembered in a
+    temporary on-disk SQLite database instead of in Python sets. Subclasses implement
+    write_rows() for one output format.
+    """
+
+    # Stupci i njihovi tipovi (tipove koriste samo stupcani formati)
+    TABLES = {
+        "analize": [("id", "int64"), ("user_id", "int64"), ("created", "timestamp"), ("subject", "string"), ("message", "string")],
+        "skup": [("id", "string"), ("url", "string"), ("name", "string")],
+        "analize_skup": [("analiza_id", "int64"), ("skup_id", "string")],
+        "slike": [("analiza_id", "int64"), ("content_hash", "string"), ("original_name", "string"), ("mime_type", "string"), ("created", "timestamp")],
+    }
+
+    def __init__(self):
+        # Prazno ime = privremena SQLite baza na disku, brise se pri zatvaranju
+        self._seen = sqlite3.connect("")
+        self._seen.execute("CREATE TABLE seen (kind TEXT, key TEXT, PRIMARY KEY (kind, key)) WITHOUT ROWID")
+
+    def _first_seen(self, kind, key):
+        return self._seen.execute("INSERT OR IGNORE INTO seen VALUES (?, ?)", (kind, key)).rowcount == 1
+
+    def write_backup(self, unique_urls, discussions, files, analiza_skup_links):
+        self.write_rows("analize", discussions)
+        # Prvi backup (redom ulaza) daje ime skupa
+        self.write_rows("skup", [
+            {"id": u_id, "url": url, "name": name}
+            for url, (u_id, name) in unique_urls.items() if self._first_seen("url", url)
+        ])
+        self.write_rows("analize_skup", analiza_skup_links)
+        self.write_rows("slike", [f for f in files if self._first_seen("hash", f["content_hash"])])
+        self.flush()
+
+    def write_rows(self, table, rows):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._seen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvExport(TableExport):
+    """QUOTE_ALL CSV files, flushed after every backup so a failure keeps the rows of finished backups."""
+
+    def __init__(self, folder):
+        super().__init__()
+        os.makedirs(folder, exist_ok=True)
+        self._files = {}
+        self.writers = {}
+        for name, columns in self.TABLES.items():
+            f = open(os.path.join(folder, f"{name}.csv"), "w", newline="", encoding="utf-8")
+            self._files[name] = f
+            self.writers[name] = csv.DictWriter(f, fieldnames=[column for column, _ in columns], quoting=csv.QUOTE_ALL)
+            self.writers[name].writeheader()
+
+    def write_rows(self, table, rows):
+        self.writers[table].writerows(rows)
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        super().close()
+
+class ColumnarExport(TableExport):
+    """
+    Typed, zstd-compressed Parquet (fmt="parquet") or Arrow IPC (fmt="arrow") files.
+
+    Rows are buffered per table and written in row groups of ROW_GROUP_SIZE, so readers can
+    skip row groups and read only the columns they need. Needs pyarrow.
+    """
+
+    def __init__(self, folder, fmt):
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        super().__init__()
+        os.makedirs(folder, exist_ok=True)
+        self._pa = pa
+        types = {"int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("ms")}
+        self.schemas = {
+            name: pa.schema([(column, types[kind]) for column, kind in columns])
+            for name, columns in self.TABLES.items()
+        }
+        self._buffers = {name: [] for name in self.TABLES}
+        self.writers = {}
+        for name, schema in self.schemas.items():
+            if fmt == "parquet":
+                self.writers[name] = pyarrow.parquet.ParquetWriter(os.path.join(folder, f"{name}.parquet"), schema, compression="zstd")
+            else:
+                options = pyarrow.ipc.IpcWriteOptions(compression="zstd")
+                self.writers[name] = pyarrow.ipc.new_file(os.path.join(folder, f"{name}.arrow"), schema, options=options)
+
+    def write_rows(self, table, rows):
+        buffer = self._buffers[table]
+        buffer.extend(rows)
+        while len(buffer) >= ROW_GROUP_SIZE:
+            self._write_batch(table, buffer[:ROW_GROUP_SIZE])
+            del buffer[:ROW_GROUP_SIZE]
+
+    def _write_batch(self, table, rows):
+        self.writers[table].write_table(self._pa.Table.from_pylist(rows, schema=self.schemas[table]))
+
+    def close(self):
+        for table, buffer in self._buffers.items():
+            if buffer:
+                self._write_batch(table, buffer)
+            self.writers[table].close()
+        super().close()
+
+def open_export(folder, fmt):
+    if fmt == "csv":
+        return CsvExport(folder)
+    return ColumnarExport(folder, fmt)
+
+def main(args):
+    mbz_files = list_backups(args.input)
+
     output_folder = "./all_files"
     os.makedirs(output_folder, exist_ok=True)
     csv_output_folder = "./csv_output"
-    os.makedirs(csv_output_folder, exist_ok=True)
-    
-    analize_csv = os.path.join(csv_output_folder, "analize.csv")
-    analize_skup_csv = os.path.join(csv_output_folder, "analize_skup.csv")
-    skup_csv = os.path.join(csv_output_folder, "skup.csv")
-    slike_csv = os.path.join(csv_output_folder, "slike.csv")
-    
-    for mbz in mbz_files:
-        process_single_backup(mbz, unique_urls, all_discussions, all_files, analiza_skup_links, output_folder)
-    
-    with open(analize_csv, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=["id", "user_id", "created", "subject", "message"], quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        writer.writerows(all_discussions)
-
-    with open(skup_csv, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=["id", "url", "name"], quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        for url, (u_id, name) in unique_urls.items():
-            writer.writerow({"id": u_id, "url": url, "name": name})
-            
-    with open(analize_skup_csv, "w", newline="", encoding="UTF-8") as file:
-        writer = csv.DictWriter(file, fieldnames=["analiza_id", "skup_id"], quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        writer.writerows(analiza_skup_links)
+    try:
+        export = open_export(csv_output_folder, args.format)
+    except ImportError:
+        print(f"[Error] --format {args.format} needs pyarrow (pip install pyarrow)")
+        sys.exit(1)
 
-    seen_hashes = set()
-    unique_files = [f for f in all_files if not (f["content_hash"] in seen_hashes or seen_hashes.add(f["content_hash"]))]
+    workers = args.workers or os.cpu_count()
+    written = skipped = 0
+    with export:
+        if workers > 1 and len(mbz_files) > 1:
+            def record(result):
+                nonlocal written, skipped
+                *rows, (backup_written, backup_skipped) = result
+                export.write_backup(*rows)
+                written += backup_written
+                skipped += backup_skipped
 
-    with open(slike_csv, "w", newline="", encoding="utf-8") as file:
-        writer = csv.DictWriter(file, fieldnames=["analiza_id", "content_hash", "original_name", "mime_type", "created"], quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        writer.writerows(unique_files)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Ograniceni broj backupa u obradi; rezultati se pisu redom ulaza
+                in_flight = deque()
+                for mbz in mbz_files:
+                    in_flight.append(pool.submit(parse_backup, mbz, output_folder, args.copy_workers))
+                    if len(in_flight) >= 2 * workers:
+                        record(in_flight.popleft().result())
+                while in_flight:
+                    record(in_flight.popleft().result())
+        else:
+            with BlobStore(output_folder, workers=args.copy_workers) as store:
+                for mbz in mbz_files:
+                    export.write_backup(*read_backup(mbz, store))
+            written, skipped = store.written, store.skipped
+    print(f"Files: {written} copied, {skipped} already in {output_folder}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract and process Moodle data")
     parser.add_argument("-i", "--input", help="Input .mbz file or folder of .mbz files", required=True, type=str)
+    parser.add_argument("-w", "--workers", help="Number of backups parsed in parallel (0 = all cores)", default=1, type=int)
+    parser.add_argument("-f", "--format", help="Output format of the four tables", choices=["csv", "parquet", "arrow"], default="csv")
+    parser.add_argument("--copy-workers", help="Threads writing blobs into the file store, per backup worker", default=4, type=int)
     args = parser.parse_args()
     main(args)
     
\ No newline at end of file
@@ -1,15 +1,25 @@
 # py 3.13.8
-import argparse, os, sys, math, tarfile, html
+import argparse, os, sys, html, json, hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from PIL import Image
 import shutil
 import urllib.parse
+import re
+from moodleBackup import MoodleBackup, files_root, iter_posts
+from searchIndex import SearchIndex
 
 OUTPUT_DIR = Path("forum_export")
 HTML_DIR = OUTPUT_DIR / "html"
 IMAGES_DIR = OUTPUT_DIR / "images"
+# contenthash -> ekstenzija slike (ili null ako blob nije slika), cuva se izmedju pokretanja
+IMAGE_TYPES_CACHE = OUTPUT_DIR / "image_types.json"
+UNRESOLVED_REPORT = OUTPUT_DIR / "unresolved_references.json"
+# pageN.html -> sha256 sadrzaja, da se pri ponovnom izvozu pisu samo promijenjene stranice
+PAGES_MANIFEST = "manifest.json"
 HTML_DIR.mkdir(parents=True, exist_ok=True)
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -21,6 +31,26 @@ relative_path = os.path.relpath(target_path, html_dir)
 
 DISCUSSIONS_PER_PAGE = 50
 
+SNIFF_BYTES = 32
+
+def sniff_image_extension(header):
+    """Recognise common image formats from the first SNIFF_BYTES bytes, without decoding anything."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if header.startswith(b"BM") and len(header) >= 18 and int.from_bytes(header[14:18], "little") in (12, 40, 52, 56, 64, 108, 124):
+        return "bmp"
+    if header.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    return None
+
 def detect_image_extension(file_path):
     try:
         with Image.open(file_path) as img:
@@ -31,48 +61,161 @@ def detect_image_extension(file_path):
     except Exception:
         return None
 
-def load_files_mapping(files_xml_path: str, files_dir: str):
+def load_image_types(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"[Warning]: Ignoring unreadable image type cache {path}")
+        return {}
+
+def save_image_types(path, image_types):
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(image_types, f)
+    os.replace(tmp_path, path)
+
+def export_image(blob, header, target_path):
+    # Pisi u privremenu datoteku pa preimenuj, da napola zapisana slika nikad ne postoji pod konacnim imenom
+    tmp_path = target_path.with_name(f"{target_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as dst:
+        dst.write(header)
+        shutil.copyfileobj(blob, dst)
+    os.replace(tmp_path, target_path)
+
+class ImageExport:
     """
-    Build mapping: postid -> original_filename -> relative_path_in_images_folder
+    Images of one backup, exported to IMAGES_DIR as <contenthash>.<ext>.
+
+    Image types are sniffed from the blob header and cached per contenthash in
+    IMAGE_TYPES_CACHE; blobs whose images/<hash>.<ext> already exists are not read at all.
+    Blobs listed in pending are passed to add_blob() (in archive order), then files_map()
+    builds the mapping used by replace_images.
     """
-    tree = ET.parse(files_xml_path)
-    root = tree.getroot()
-    files_dir = Path(files_dir)
-    
-    mapping = {}
-    
-    for file_elem in root.findall(".//file"):
-        filename = file_elem.findtext("filename")
-        contenthash = file_elem.findtext("contenthash")
-        itemid = file_elem.findtext("itemid")
-        
-        if filename and contenthash and itemid:
-            subfolder = contenthash[:2]
-            file_path = files_dir / subfolder / contenthash
-            if file_path.exists():
-                ext = detect_image_extension(file_path)
-                if ext:
-                    target_path = IMAGES_DIR / f"{contenthash}.{ext}"
-                    shutil.copy(file_path, target_path)
-                    filename_decoded = urllib.parse.unquote(filename)
-                    
-                    if itemid not in mapping:
-                        mapping[itemid] = {}
-                    mapping[itemid][filename_decoded] = os.path.relpath(target_path, HTML_DIR)
-
-    return mapping
-
-def replace_images(message, postid, files_map):
+
+    def __init__(self, files_xml, backup):
+        self.entries = []
+        for file_elem in files_root(files_xml).findall(".//file"):
+            filename = file_elem.findtext("filename")
+            contenthash = file_elem.findtext("contenthash")
+            itemid = file_elem.findtext("itemid")
+            
+            if filename and contenthash and itemid:
+                self.entries.append((itemid, filename, contenthash))
+
+        self.image_types = load_image_types(IMAGE_TYPES_CACHE)
+        self.targets = {}
+        self.pending = set()
+        for contenthash in {contenthash for _, _, contenthash in self.entries}:
+            if contenthash in self.image_types:
+                ext = self.image_types[contenthash]
+                if ext is None:
+                    continue
+                target_path = IMAGES_DIR / f"{contenthash}.{ext}"
+                if target_path.exists():
+                    self.targets[contenthash] = target_path
+                    continue
+            if backup.has_blob(contenthash):
+                self.pending.add(contenthash)
+        self.reused = len(self.targets)
+
+    def add_blob(self, contenthash, blob):
+        header = blob.read(SNIFF_BYTES)
+        ext = self.image_types.get(contenthash) or sniff_image_extension(header)
+        if ext is None:
+            # Rijetki formati: PIL kao rezerva, rezultat se svejedno pamti
+            blob.seek(0)
+            ext = detect_image_extension(blob)
+            blob.seek(len(header))
+        self.image_types[contenthash] = ext
+        if ext:
+            target_path = IMAGES_DIR / f"{contenthash}.{ext}"
+            export_image(blob, header, target_path)
+            self.targets[contenthash] = target_path
+
+    def files_map(self):
+        """Mapping: postid -> original_filename -> relative_path_in_images_folder"""
+        save_image_types(IMAGE_TYPES_CACHE, self.image_types)
+        print(f"Images: {len(self.targets) - self.reused} exported, {self.reused} already in {IMAGES_DIR}")
+
+        mapping = {}
+        for itemid, filename, contenthash in self.entries:
+            target_path = self.targets.get(contenthash)
+            if target_path:
+                filename_decoded = urllib.parse.unquote(filename)
+                
+                if itemid not in mapping:
+                    mapping[itemid] = {}
+                mapping[itemid][filename_decoded] = os.path.relpath(target_path, HTML_DIR)
+
+        return mapping
+
+def load_files_mapping(files_xml, backup):
+    """Build mapping: postid -> original_filename -> relative_path_in_images_folder (see ImageExport)."""
+    images = ImageExport(files_xml, backup)
+    # Svaki potreban blob se cita jednom, redom kojim je u arhivi
+    for contenthash, blob in backup.iter_blobs(images.pending):
+        images.add_blob(contenthash, blob)
+    return images.files_map()
+
+# Referenca traje do kraja URL-a u atributu (navodnik, razmak, <, >, zagrada) ili do ?/# sufiksa
+PLUGINFILE_PREFIX = "@@PLUGINFILE@@/"
+PLUGINFILE_RE = re.compile(r"[^\"'<>\s?#)]*")
+
+def truncated_names(post_files):
+    """
+    {token PLUGINFILE_RE captures: [(form, path), ...] longest first} for the post's file names
+    (as stored, URL-encoded or HTML-escaped) that the regex would cut short.
+    """
+    index = {}
+    for name, relative_path in post_files.items():
+        for form in {name, urllib.parse.quote(name), html.escape(name)}:
+            token = PLUGINFILE_RE.match(form).group(0)
+            if token != form:
+                index.setdefault(token, []).append((form, relative_path))
+    for forms in index.values():
+        forms.sort(key=lambda item: len(item[0]), reverse=True)
+    return index
+
+def replace_images(message, postid, files_map, unresolved=None):
     """
     Replace @@PLUGINFILE@@/filename with actual path for a specific post
+
+    The message is scanned once; every reference is HTML-unescaped and URL-decoded and
+    looked up in the post's {decoded filename: path} index. File names containing a
+    character that ends a reference (space, quote, parenthesis) are matched literally
+    first, longest first. References that do not resolve are left as they are and, if
+    unresolved is a list, appended to it as (postid, reference).
     """
-    if postid not in files_map:
+    if not message or PLUGINFILE_PREFIX not in message:
         return message
-    for original_name, relative_path in files_map[postid].items():
-        original_name_enc = urllib.parse.quote(original_name)
-        message = message.replace(f"@@PLUGINFILE@@/{original_name}", relative_path)
-        message = message.replace(f"@@PLUGINFILE@@/{original_name_enc}", relative_path)
-    return message
+    post_files = files_map.get(postid, {})
+    truncated = None
+
+    parts = message.split(PLUGINFILE_PREFIX)
+    out = [parts[0]]
+    for part in parts[1:]:
+        reference = PLUGINFILE_RE.match(part).group(0)
+        relative_path = None
+        # Npr. "slika (1).png" ili "Ana's graf.png" koje PLUGINFILE_RE presijece;
+        # indeks se gradi tek kad referenca ne zavrsava na navodniku ili tagu
+        if truncated is None and post_files and part[len(reference):len(reference) + 1] not in ("", '"', "<", ">"):
+            truncated = truncated_names(post_files)
+        for form, path in (truncated or {}).get(reference, ()):
+            if part.startswith(form):
+                reference, relative_path = form, path
+                break
+        if relative_path is None:
+            relative_path = post_files.get(urllib.parse.unquote(html.unescape(reference)))
+        if relative_path is None:
+            if unresolved is not None:
+                unresolved.append((postid, reference))
+            out.append(PLUGINFILE_PREFIX + part)
+        else:
+            out.append(relative_path + part[len(reference):])
+    return "".join(out)
 
 def convert_time(unix_timestamp):
     """Convert Unix timestamp to approximate Croatia time (CET/CEST)"""
@@ -103,13 +246,14 @@ def generate_html_page(discussions_sub, page_num, total_pages):
     ]
 
     for discussion in discussions_sub:
-        html_content.append("<div class='discussion'>")
+        html_content.append(f"<div class='discussion' id='post-{html.escape(str(discussion['postid']))}'>")
         html_content.append(f"  <div class='subject'>{html.escape(discussion['subject'] or '')}</div>")
         html_content.append(f"  <div class='meta'>User ID: {discussion['userid']} | Post ID: {discussion['postid']} | Created: {discussion['created']}</div>")
         html_content.append(f"  <div class='message'>{discussion['message']}</div>")
         html_content.append("</div>")
 
     html_content.append("<div class='navigation'>")
+    html_content.append("<a href='search.html' style='margin-right:20px;'>Search</a>")
     if page_num > 1:
         html_content.append(f"<a href='page{page_num-1}.html'>Previous</a>")
     if page_num < total_pages:
@@ -119,17 +263,85 @@ def generate_html_page(discussions_sub, page_num, total_pages):
     html_content.append("</body></html>")
     return "\n".join(html_content)
 
-def generate_forum_pages(discussions):
-    total_pages = math.ceil(len(discussions) / DISCUSSIONS_PER_PAGE)
-    for page_num in range(1, total_pages + 1):
-        start = (page_num - 1) * DISCUSSIONS_PER_PAGE
-        end = start + DISCUSSIONS_PER_PAGE
-        discussions_sub = discussions[start:end]
+def iter_pages(discussions):
+    """Yield (page_num, discussions_sub, has_next) from any iterable, holding at most two pages in memory."""
+    discussions = iter(discussions)
+    page_num = 1
+    current = list(islice(discussions, DISCUSSIONS_PER_PAGE))
+    while current:
+        following = list(islice(discussions, DISCUSSIONS_PER_PAGE))
+        yield page_num, current, bool(following)
+        page_num += 1
+        current = following
+
+def render_page(html_dir, page_num, discussions_sub, has_next, known_hash):
+    """Render one page and write it only if its content hash differs from the manifest. Returns (page_num, hash, written)."""
+    # generate_html_page gleda samo je li page_num < total_pages, pa ukupan broj stranica ne treba unaprijed
+    page_html = generate_html_page(discussions_sub, page_num, page_num + 1 if has_next else page_num)
+    data = page_html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    page_file = Path(html_dir) / f"page{page_num}.html"
+    if digest == known_hash and page_file.exists():
+        return page_num, digest, False
+    tmp_file = page_file.with_name(f"{page_file.name}.tmp")
+    tmp_file.write_bytes(data)
+    os.replace(tmp_file, page_file)
+    return page_num, digest, True
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"[Warning]: Ignoring unreadable page manifest {path}")
+        return {}
+
+def generate_forum_pages(discussions, workers=1):
+    """
+    Render pageN.html files from an iterable of posts (DISCUSSIONS_PER_PAGE per page).
+
+    Pages are rendered in a process pool when workers > 1, with a bounded number of pages
+    in flight. Only pages whose sha256 differs from HTML_DIR/manifest.json (or whose file
+    is missing) are written; pages past the new last page are removed.
+    """
+    manifest_path = HTML_DIR / PAGES_MANIFEST
+    manifest = load_manifest(manifest_path)
+    new_manifest = {}
+    written = 0
+
+    def record(result):
+        nonlocal written
+        page_num, digest, was_written = result
+        new_manifest[f"page{page_num}.html"] = digest
+        if was_written:
+            written += 1
+            print(f"Generated {HTML_DIR / f'page{page_num}.html'}")
 
-        page_html = generate_html_page(discussions_sub, page_num, total_pages)
-        page_file = HTML_DIR / f"page{page_num}.html"
-        page_file.write_text(page_html, encoding="utf-8")
-        print(f"Generated {page_file}")
+    pages = iter_pages(discussions)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            for page_num, discussions_sub, has_next in pages:
+                known_hash = manifest.get(f"page{page_num}.html")
+                in_flight.append(pool.submit(render_page, str(HTML_DIR), page_num, discussions_sub, has_next, known_hash))
+                if len(in_flight) >= 2 * workers:
+                    record(in_flight.popleft().result())
+            while in_flight:
+                record(in_flight.popleft().result())
+    else:
+        for page_num, discussions_sub, has_next in pages:
+            record(render_page(HTML_DIR, page_num, discussions_sub, has_next, manifest.get(f"page{page_num}.html")))
+
+    for name in manifest.keys() - new_manifest.keys():
+        (HTML_DIR / name).unlink(missing_ok=True)
+
+    tmp_path = manifest_path.with_name(f"{PAGES_MANIFEST}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+    print(f"Pages: {written} written, {len(new_manifest) - written} unchanged")
 
 def validate_mbz_file(file_path):
     if not os.path.exists(file_path):
@@ -138,58 +350,51 @@ def validate_mbz_file(file_path):
         raise argparse.ArgumentTypeError(f"Input file must be a .mbz file, got: {file_path}")
     return file_path
 
-def unpack(tgz_file):
-    """Treat .mbz as .tgz and extract its contents"""
-    with tarfile.open(tgz_file, "r:gz") as tar:
-        tar.extractall(path='./extracted_moodle')
-        print(f"Extracted to ./extracted_moodle")
-
-def load_discussions(files_map):
-    """Load discussions from the extracted Moodle data"""
-    activities_dir = Path('./extracted_moodle/activities')
-    forum_folders = [d for d in activities_dir.iterdir() if d.is_dir()]
-    if not forum_folders:
-        raise FileNotFoundError("No forum folder found inside activities/")
-    
-    forum_dir = forum_folders[0]
-    discussion_file = forum_dir / 'forum.xml'
-    tree = ET.parse(discussion_file)
-    root = tree.getroot()   
-    discussions = []
-    
-    for discussion in root.findall(".//discussion"):
-        for post in discussion.findall(".//post"):
-            postid = post.get("id")
-            created_timestamp = post.findtext("created")
-            message = post.findtext("message")
-            message = replace_images(message, postid, files_map)
-            
-            post_data = {
-                "postid": postid,
-                "userid": post.findtext("userid"),
-                "created": convert_time(created_timestamp),
-                "subject": post.findtext("subject"),
-                "message": message
-            }
-            discussions.append(post_data)
-    
-    return discussions
+def load_discussions(forum_xml, files_map, unresolved=None):
+    """Load discussions from the backup's forum.xml"""
+    return list(iter_discussions(forum_xml, files_map, unresolved))
+
+def post_record(post):
+    """Post dict of one <post>, before @@PLUGINFILE@@ references are rewritten."""
+    return {
+        "postid": post.get("id"),
+        "userid": post.findtext("userid"),
+        "created": convert_time(post.findtext("created")),
+        "subject": post.findtext("subject"),
+        "message": post.findtext("message")
+    }
+
+def iter_discussions(forum_xml, files_map, unresolved=None):
+    """Stream post dicts from forum.xml one at a time (see load_discussions)."""
+    for post in iter_posts(forum_xml):
+        post_data = post_record(post)
+        post_data["message"] = replace_images(post_data["message"], post_data["postid"], files_map, unresolved)
+        yield post_data
+
+def finish_export(index, unresolved):
+    docs, terms, shards = index.write(HTML_DIR)
+    print(f"Search index: {docs} posts, {terms} terms in {shards} shards ({HTML_DIR / 'search.html'})")
+
+    # Reference na datoteke kojih nema u backupu (ili nisu slike)
+    with open(UNRESOLVED_REPORT, "w", encoding="utf-8") as f:
+        json.dump([{"postid": postid, "reference": reference} for postid, reference in unresolved], f, indent=2, ensure_ascii=False)
+    if unresolved:
+        print(f"[Warning]: {len(unresolved)} unresolved @@PLUGINFILE@@ references, see {UNRESOLVED_REPORT}")
 
 def main(args):
     input_file = validate_mbz_file(args.input)
     print(f"Processing Moodle backup file: {input_file}")
-    unpack(input_file)
-    files_map = load_files_mapping('./extracted_moodle/files.xml', './extracted_moodle/files')
-    discussions = load_discussions(files_map)
-    generate_forum_pages(discussions)
-    temp_dir = Path('./extracted_moodle')
-    if temp_dir.exists():
-        shutil.rmtree(temp_dir)
-        print("Removed temporary extracted data")
+    with MoodleBackup(input_file) as backup:
+        files_map = load_files_mapping(backup.files_xml(), backup)
+        unresolved = []
+        index = SearchIndex(DISCUSSIONS_PER_PAGE)
+        generate_forum_pages(index.collect(iter_discussions(backup.forum_xml(), files_map, unresolved)), workers=args.workers or os.cpu_count())
+    finish_export(index, unresolved)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract and process Moodle data")
     parser.add_argument("-i", "--input", help="Input Moodle backup file path (.mbz)", required=True, type=str)
+    parser.add_argument("-w", "--workers", help="Processes rendering HTML pages (0 = all cores)", default=1, type=int)
     
     try:
         args = parser.parse_args()
@@ -0,0 +1,235 @@
+import html, re
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Zamjene tipografskih znakova (jedan prolaz kroz str.translate umjesto deset str.replace)
+REPLACEMENTS = {
+    "\u2013": "-", "\u2014": "-",
+    "\u2212": "-", "\u2018": "'",
+    "\u2019": "'", "\u201C": '"',
+    "\u201D": '"', "\u2026": "...",
+    "\u00A0": " ", "\u200B": "",
+}
+TRANSLATE_TABLE = str.maketrans(REPLACEMENTS)
+
+def _nonprintable_pattern(last=0xFFFF):
+    ranges = []
+    start = None
+    for cp in range(last + 1):
+        if chr(cp).isprintable():
+            if start is not None:
+                ranges.append((start, cp - 1))
+                start = None
+        elif start is None:
+            start = cp
+    if start is not None:
+        ranges.append((start, last))
+    return re.compile("[" + "".join(
+        re.escape(chr(a)) if a == b else re.escape(chr(a)) + "-" + re.escape(chr(b)) for a, b in ranges
+    ) + "]+")
+
+# Neispisivi znakovi iz BMP-a; rijetki znakovi izvan BMP-a idu kroz isprintable filter
+NONPRINTABLE_RE = _nonprintable_pattern()
+WHITESPACE_RE = re.compile(r"\s+")
+
+def clean(text):
+    """
+    Normalise a text node: typographic replacements, drop non-printable characters,
+    collapse whitespace and strip. Same output as the original per-script clean().
+    """
+    if not text:
+        return ""
+    text = NONPRINTABLE_RE.sub("", text.translate(TRANSLATE_TABLE))
+    if not text.isprintable():
+        text = "".join(filter(str.isprintable, text))
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+# Prazni elementi koje BeautifulSoup ispisuje kao <tag/>
+VOID_TAGS = frozenset((
+    "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr",
+    "image", "img", "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid",
+    "param", "source", "spacer", "track", "wbr",
+))
+REMOVED_TAGS = frozenset(("script", "style", "noscript", "img"))
+
+# Imenovani entiteti bez ';' kao u bs4 (prvi po abecedi pobjedjuje)
+ENTITIES = {}
+for _name, _char in sorted(html5.items()):
+    ENTITIES.setdefault(_name.removesuffix(";"), _char)
+
+DECIMAL_REF_RE = re.compile("^([0-9]+)(.*)")
+HEX_REF_RE = re.compile("^([0-9a-f]+)(.*)")
+
+def _numeric_reference(numeric):
+    if numeric == 0 or numeric > 0x10FFFF or 0xD800 <= numeric <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= numeric <= 0x9F:
+        try:
+            return bytes((numeric,)).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(numeric)
+
+# Jednostavan HTML (bez entiteta, komentara, deklaracija i <script>) se tokenizira
+# jednim regexom; sve ostalo ide kroz HTMLParser kako bi izlaz ostao identican bs4
+_WS = r"[ \t\n\r\f]"
+_ATTR = _WS + r"""+[a-zA-Z_:][-a-zA-Z0-9_:.]*(?:""" + _WS + r"""*=""" + _WS + r"""*(?:"[^"]*"|'[^']*'|[-\w.:%#]+(?=[ \t\n\r\f>])))?"""
+SIMPLE_TOKEN_RE = re.compile(
+    r"([^<&]+|&(?![a-zA-Z#]))"
+    r"|<([a-zA-Z][a-zA-Z0-9]*)(?:" + _ATTR + r")*" + _WS + r"*(/?)>"
+    r"|</([a-zA-Z][a-zA-Z0-9]*)" + _WS + r"*>"
+)
+# Elementi ciji sadrzaj HTMLParser (ovisno o verziji Pythona) ne tretira kao obican HTML
+RAW_TEXT_TAGS = frozenset((
+    "script", "style", "textarea", "title", "xmp", "iframe", "noembed", "noframes", "noscript", "plaintext",
+))
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+class _Sanitizer(HTMLParser):
+    """
+    Single-pass tokenizer that writes the sanitized markup straight to a list of chunks.
+
+    Mirrors how BeautifulSoup(html.parser) builds the tree (text is split at every tag,
+    comment and declaration, end tags close up to the most recent matching open tag,
+    void tags are closed immediately), so the output is byte-identical to decomposing
+    script/style/noscript/img, cleaning every string and dropping all attributes.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self._text = []
+        self._open = []
+        self._removed = 0
+        self._closed_void = []
+
+    def _flush(self):
+        if self._text:
+            text = "".join(self._text)
+            self._text = []
+            if not self._removed:
+                self.out.append(_escape(clean(text)))
+
+    def _push(self, tag):
+        self._flush()
+        removed = tag in REMOVED_TAGS
+        if removed:
+            self._removed += 1
+        elif not self._removed and tag not in VOID_TAGS:
+            self.out.append(f"<{tag}>")
+        self._open.append((tag, removed))
+
+    def _pop_to(self, tag):
+        self._flush()
+        if not any(name == tag for name, _ in self._open):
+            return
+        while self._open:
+            name, removed = self._open.pop()
+            if removed:
+                self._removed -= 1
+            elif not self._removed:
+                self.out.append(f"<{name}/>" if name in VOID_TAGS else f"</{name}>")
+            if name == tag:
+                break
+
+    def handle_starttag(self, tag, attrs):
+        self._push(tag)
+        if tag in VOID_TAGS:
+            self._pop_to(tag)
+            self._closed_void.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._push(tag)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+    def handle_charref(self, name):
+        base, pattern = 10, DECIMAL_REF_RE
+        if name.startswith(("x", "X")):
+            name, base, pattern = name[1:], 16, HEX_REF_RE
+        try:
+            self._text.append(_numeric_reference(int(name, base)))
+        except ValueError:
+            match = pattern.search(name)
+            if match is None:
+                self._text.append(name)
+            else:
+                self._text.append(_numeric_reference(int(match.group(1), base)))
+                self._text.append(match.group(2))
+
+    def handle_entityref(self, name):
+        self._text.append(ENTITIES.get(name, "&" + name))
+
+    def _handle_special(self, data):
+        # Komentari i deklaracije su zasebni tekstualni cvorovi
+        self._flush()
+        self._text.append(data)
+        self._flush()
+
+    def handle_comment(self, data):
+        self._handle_special(data)
+
+    def handle_decl(self, decl):
+        self._handle_special(decl[len("DOCTYPE "):])
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            data = data[len("CDATA["):]
+        self._handle_special(data)
+
+    def handle_pi(self, data):
+        self._handle_special(data)
+
+    def feed_simple(self, text):
+        """Tokenize text with SIMPLE_TOKEN_RE; returns False as soon as it meets markup it does not cover."""
+        pos = 0
+        end = len(text)
+        match = SIMPLE_TOKEN_RE.match
+        while pos < end:
+            token = match(text, pos)
+            if token is None:
+                return False
+            data, start_tag, self_closing, end_tag = token.groups()
+            if data is not None:
+                self._text.append(data)
+            elif start_tag is not None:
+                tag = start_tag.lower()
+                if tag in RAW_TEXT_TAGS:
+                    return False
+                if self_closing:
+                    self.handle_startendtag(tag, None)
+                else:
+                    self.handle_starttag(tag, None)
+            else:
+                self.handle_endtag(end_tag.lower())
+            pos = token.end()
+        return True
+
+    def finish(self):
+        self.close()
+        self._flush()
+        while self._open:
+            self._pop_to(self._open[-1][0])
+        return "".join(self.out)
+
+def sanitize_message(message):
+    """
+    Sanitize a post message for komentar.message: unescape, drop script/style/noscript/img
+    with their content, drop all attributes and clean() every text node.
+    """
+    text = html.unescape(message)
+    parser = _Sanitizer()
+    if not parser.feed_simple(text):
+        parser = _Sanitizer()
+        parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,81 @@
+import json, os, pickle, sqlite3
+
+class ImportCheckpoint:
+    """
+    Journal of a long import in a local SQLite file, so a rerun after a failure resumes where it stopped.
+
+    Records the parse result of every completed backup (by fingerprint), the package_show result
+    of every resolved dataset, whether dataset resolution finished, and how many rows of each table
+    are committed. A journal written for a different set of backups is discarded.
+    """
+
+    def __init__(self, path, fingerprints):
+        self.path = path
+        signature = json.dumps(sorted(fingerprints))
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS backup (fingerprint TEXT PRIMARY KEY, filename TEXT, result BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS dataset (identifier TEXT PRIMARY KEY, result TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS progress (tbl TEXT PRIMARY KEY, rows INTEGER NOT NULL);
+        """)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+        if row is not None and row[0] != signature:
+            print(f"[Warning]: checkpoint {path} belongs to other backups, starting over")
+            self._db.executescript("DELETE FROM meta; DELETE FROM backup; DELETE FROM dataset; DELETE FROM progress;")
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('signature', ?)", (signature,))
+        self._db.commit()
+
+    def backups(self):
+        return {row[0] for row in self._db.execute("SELECT fingerprint FROM backup")}
+
+    def load_backup(self, fingerprint):
+        row = self._db.execute("SELECT result FROM backup WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return pickle.loads(row[0])
+
+    def save_backup(self, fingerprint, filename, result):
+        self._db.execute(
+            "INSERT OR REPLACE INTO backup (fingerprint, filename, result) VALUES (?, ?, ?)",
+            (fingerprint, filename, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        self._db.commit()
+
+    def datasets(self, identifiers):
+        # {identifier: package_show result} za vec rijesene skupove
+        found = {}
+        for identifier in identifiers:
+            row = self._db.execute("SELECT result FROM dataset WHERE identifier = ?", (identifier,)).fetchone()
+            if row is not None:
+                found[identifier] = json.loads(row[0])
+        return found
+
+    def save_datasets(self, results):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO dataset (identifier, result) VALUES (?, ?)",
+            [(identifier, json.dumps(result, ensure_ascii=False)) for identifier, result in results.items()],
+        )
+        self._db.commit()
+
+    @property
+    def resolved(self):
+        return self._db.execute("SELECT 1 FROM meta WHERE key = 'resolved'").fetchone() is not None
+
+    def mark_resolved(self):
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('resolved', '1')")
+        self._db.commit()
+
+    def rows_loaded(self, table):
+        row = self._db.execute("SELECT rows FROM progress WHERE tbl = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    def rows_committed(self, table, rows):
+        self._db.execute("INSERT OR REPLACE INTO progress (tbl, rows) VALUES (?, ?)", (table, rows))
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def finish(self):
+        # Uvoz je zavrsen: nema se sto nastaviti
+        self.close()
+        os.remove(self.path)
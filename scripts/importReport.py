@@ -0,0 +1,115 @@
+import json, os, sys, time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Granice (ms) histograma latencije CKAN zahtjeva
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+def latency_histogram(latencies):
+    """Summary of request latencies (seconds): bucket counts plus p50/p95/max in milliseconds."""
+    ms = sorted(latency * 1000 for latency in latencies)
+    buckets = {f"<={bound}": 0 for bound in LATENCY_BUCKETS_MS}
+    buckets[f">{LATENCY_BUCKETS_MS[-1]}"] = 0
+    for value in ms:
+        for bound in LATENCY_BUCKETS_MS:
+            if value <= bound:
+                buckets[f"<={bound}"] += 1
+                break
+        else:
+            buckets[f">{LATENCY_BUCKETS_MS[-1]}"] += 1
+
+    def percentile(p):
+        return round(ms[min(len(ms) - 1, int(p * len(ms)))], 3) if ms else None
+
+    return {
+        "requests": len(ms),
+        "buckets_ms": buckets,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "max_ms": round(ms[-1], 3) if ms else None,
+    }
+
+class ImportReport:
+    """
+    Wall/CPU time per stage, per backup counters and CKAN statistics of one import run.
+
+    Stages with the same name accumulate (calls, wall, cpu). Worker processes build their
+    own report and the parent folds it in with merge(), so --workers runs report the same
+    stages as serial ones (cpu is then the sum over processes).
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.counters = {}
+        self.backups = []
+        self.latencies = []
+        self.cache = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_time(self, name, wall, cpu, calls=1):
+        entry = self.stages.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+        entry["calls"] += calls
+        entry["wall"] += wall
+        entry["cpu"] += cpu
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_backup(self, path, wall, cpu, posts, files):
+        self.backups.append({
+            "file": os.path.basename(path),
+            "wall": round(wall, 6),
+            "cpu": round(cpu, 6),
+            "posts": posts,
+            "files": files,
+        })
+
+    def set_cache(self, hits, misses):
+        total = hits + misses
+        self.cache = {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
+
+    def merge(self, data):
+        """Fold in the to_dict() of a report built in another process."""
+        for name, entry in data["stages"].items():
+            self.add_time(name, entry["wall"], entry["cpu"], entry["calls"])
+        for name, n in data["counters"].items():
+            self.count(name, n)
+        self.backups.extend(data["backups"])
+
+    def to_dict(self):
+        return {
+            "stages": self.stages,
+            "counters": self.counters,
+            "backups": self.backups,
+        }
+
+    def write(self, path, extra=None):
+        report = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "argv": sys.argv,
+            "wall": round(time.perf_counter() - self._start, 6),
+            "stages": {
+                name: {"calls": entry["calls"], "wall": round(entry["wall"], 6), "cpu": round(entry["cpu"], 6)}
+                for name, entry in self.stages.items()
+            },
+            "counters": self.counters,
+            "backups": self.backups,
+            "http": latency_histogram(self.latencies),
+            "cache": self.cache,
+        }
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
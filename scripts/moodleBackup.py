@@ -0,0 +1,165 @@
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import xml.etree.ElementTree as ET
+
+# Nekomprimirani tar ima "ustar" na ovom mjestu prvog zaglavlja
+TAR_MAGIC_OFFSET = 257
+FORUM_XML_RE = re.compile(r"^activities/forum_[^/]+/forum\.xml$")
+BLOB_RE = re.compile(r"^files/[0-9a-f]{2}/([0-9a-f]+)$")
+
+# forum.xml/files.xml vece od ovoga se preliju u privremenu datoteku
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+class MoodleBackup:
+    """
+    Read a Moodle .mbz backup (tar/tar.gz) straight from the archive, without extracting it.
+
+    The archive is walked once on open: forum.xml and files.xml are copied into spooled
+    temporary files and only the offsets of files/<xx>/<contenthash> blobs are remembered.
+    Blobs are read later on demand, in archive order, so a gzip stream is never rewound
+    more than once. In an uncompressed archive every blob is also a plain byte range of
+    the .mbz file (blob_extent), which callers may copy without going through tarfile.
+    """
+
+    def __init__(self, mbz_path):
+        self.path = mbz_path
+        with open(mbz_path, "rb") as f:
+            self.compressed = f.read(TAR_MAGIC_OFFSET + 5)[TAR_MAGIC_OFFSET:] != b"ustar"
+        self._tar = tarfile.open(mbz_path, "r:*")
+        self._forum_xml = None
+        self._files_xml = None
+        self._blobs = {}
+
+        try:
+            for member in self._tar:
+                if not member.isfile():
+                    continue
+                name = member.name.removeprefix("./")
+
+                blob = BLOB_RE.match(name)
+                if blob:
+                    self._blobs[blob.group(1)] = member
+                elif name == "files.xml":
+                    self._files_xml = self._spool(member)
+                elif self._forum_xml is None and FORUM_XML_RE.match(name):
+                    self._forum_xml = self._spool(member)
+        except Exception:
+            self.close()
+            raise
+
+    def _spool(self, member):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with self._tar.extractfile(member) as src:
+            shutil.copyfileobj(src, spool)
+        spool.seek(0)
+        return spool
+
+    def forum_xml(self):
+        if self._forum_xml is None:
+            raise FileNotFoundError("No forum.xml found inside activities/")
+        self._forum_xml.seek(0)
+        return self._forum_xml
+
+    def files_xml(self):
+        if self._files_xml is None:
+            raise FileNotFoundError("No files.xml found in backup")
+        self._files_xml.seek(0)
+        return self._files_xml
+
+    def has_blob(self, contenthash):
+        return contenthash in self._blobs
+
+    def blob_size(self, contenthash):
+        return self._blobs[contenthash].size
+
+    def blob_extent(self, contenthash):
+        """(offset, size) of the blob inside the .mbz file, or None if the archive is compressed."""
+        member = self._blobs.get(contenthash)
+        if member is None or self.compressed or member.issparse():
+            return None
+        return member.offset_data, member.size
+
+    def iter_blobs(self, contenthashes):
+        """Yield (contenthash, fileobj) for every requested blob present in the archive, in archive order."""
+        members = sorted(
+            (self._blobs[h] for h in set(contenthashes) if h in self._blobs),
+            key=lambda m: m.offset_data,
+        )
+        for member in members:
+            with self._tar.extractfile(member) as blob:
+                yield BLOB_RE.match(member.name.removeprefix("./")).group(1), blob
+
+    def close(self):
+        for spool in (self._forum_xml, self._files_xml):
+            if spool is not None:
+                spool.close()
+        self._tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def list_backups(input_path):
+    """The .mbz files of input_path (a folder, sorted by name, or a single .mbz file)."""
+    if not os.path.exists(input_path):
+        print(f"Input path {input_path} does not exist.")
+        sys.exit(1)
+
+    if os.path.isdir(input_path):
+        return sorted(os.path.join(input_path, f) for f in os.listdir(input_path) if f.endswith(".mbz"))
+    if input_path.endswith(".mbz"):
+        return [input_path]
+    print("Error: input must be a folder or .mbz file")
+    sys.exit(1)
+
+def fingerprint(mbz_path, chunk_size=1024 * 1024):
+    """sha256 of the raw .mbz file, used to recognise backups that were already imported."""
+    digest = hashlib.sha256()
+    with open(mbz_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def files_root(files_xml):
+    """Root element of files.xml; accepts a file object or an already parsed root, so one parse can be shared."""
+    if isinstance(files_xml, ET.Element):
+        return files_xml
+    return ET.parse(files_xml).getroot()
+
+def iter_posts(forum_xml):
+    """
+    Stream <post> elements of every <discussion> in forum.xml one at a time.
+
+    Each post is yielded fully parsed (post.get("id"), post.findtext("message"), ...)
+    and cleared as soon as the caller asks for the next one, so memory does not
+    grow with the size of the forum. Do not keep references to yielded posts.
+    """
+    stack = []
+    in_discussion = 0
+
+    for event, elem in ET.iterparse(forum_xml, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            if elem.tag == "discussion":
+                in_discussion += 1
+            continue
+
+        stack.pop()
+        if elem.tag == "post" and in_discussion:
+            yield elem
+        elif elem.tag == "discussion":
+            in_discussion -= 1
+        else:
+            continue
+
+        # Obrisi obradjeni element i makni ga iz roditelja da root ne raste
+        elem.clear()
+        if stack:
+            stack[-1].remove(elem)
@@ -0,0 +1,262 @@
+import argparse, os, pickle, sys, tempfile, time
+from io import BytesIO
+from moodleBackup import MoodleBackup, files_root, iter_posts, list_backups
+from importReport import ImportReport
+from blobStore import BlobStore
+import createAndLoadDb
+import createCsv
+
+class Sink:
+    """
+    Consumer of the records of one pass over each backup (see process_backup).
+
+    Per backup: begin_backup, add_post for every <post> (the element is cleared afterwards,
+    keep only values), wanted_blobs, add_blob for every wanted blob (in archive order),
+    end_backup. close() runs once after the last backup.
+    """
+
+    def accepts(self, mbz_path):
+        return True
+
+    def begin_backup(self, mbz_path, backup, files):
+        pass
+
+    def add_post(self, post):
+        pass
+
+    def wanted_blobs(self):
+        return ()
+
+    def add_blob(self, contenthash, blob):
+        pass
+
+    def end_backup(self):
+        pass
+
+    def close(self):
+        pass
+
+class DbSink(Sink):
+    """komentar/slika rows for PostgreSQL; datasets are resolved and everything is loaded in close()."""
+
+    def __init__(self, args, report, conn=None, mbz_files=(), fingerprints=None, skip_posts=frozenset()):
+        self.args = args
+        self.report = report
+        self.conn = conn
+        self.mbz_files = list(mbz_files)
+        self.fingerprints = fingerprints or {}
+        self.skip_posts = skip_posts
+        self.dataset_links = {}
+        self.post_datasets = {}
+        self.discussions = []
+        self.files = []
+        self.backup_links = {}
+
+    def accepts(self, mbz_path):
+        # --incremental: vec uvezeni backupi su izbaceni u start_import
+        return mbz_path in self.mbz_files
+
+    def begin_backup(self, mbz_path, backup, files):
+        self.mbz_path = mbz_path
+        self.files_xml = files
+        self.seen_posts = set()
+        self.parsed = 0
+
+    def add_post(self, post):
+        discussion = createAndLoadDb.extract_post(post, self.dataset_links, self.post_datasets, self.seen_posts, self.skip_posts, self.report)
+        if discussion is not None:
+            self.discussions.append(discussion)
+            self.parsed += 1
+
+    def end_backup(self):
+        files = createAndLoadDb.extract_img_data(self.files_xml, self.seen_posts)
+        self.files.extend(files)
+        self.backup_links[self.mbz_path] = createAndLoadDb.backup_identifiers(self.discussions[len(self.discussions) - self.parsed:], self.post_datasets)
+        self.report.count("backups")
+        self.report.count("posts_parsed", self.parsed)
+        self.report.count("files_parsed", len(files))
+
+    def close(self):
+        createAndLoadDb.finish_import(
+            self.conn, self.args, self.report, self.mbz_files, self.fingerprints,
+            self.dataset_links, self.post_datasets, self.discussions, self.files, backup_links=self.backup_links,
+        )
+        self.conn.close()
+
+class CsvSink(Sink):
+    """createCsv tables (CSV, Parquet or Arrow) written after every backup, plus the ./all_files blob store."""
+
+    def __init__(self, csv_output_folder, output_folder, fmt="csv", copy_workers=4):
+        self.output_folder = output_folder
+        self.export = createCsv.open_export(csv_output_folder, fmt)
+        self.store = BlobStore(output_folder, workers=copy_workers)
+
+    def begin_backup(self, mbz_path, backup, files):
+        self.backup = backup
+        self.files_xml = files
+        self.unique_urls = {}
+        self.discussions = {}
+        self.analiza_skup_links = []
+        self.itemid_to_postid = {}
+
+    def add_post(self, post):
+        discussion = createCsv.extract_discussion(post, self.unique_urls, self.analiza_skup_links, self.itemid_to_postid)
+        if discussion is not None:
+            self.discussions[post.get("id")] = discussion
+
+    def wanted_blobs(self):
+        self.files = createCsv.extract_files(self.files_xml, self.itemid_to_postid)
+        return self.store.plan(self.backup, (f["content_hash"] for f in self.files))
+
+    def add_blob(self, contenthash, blob):
+        self.store.add_blob(contenthash, blob, self.backup.blob_size(contenthash))
+
+    def end_backup(self):
+        self.export.write_backup(self.unique_urls, list(self.discussions.values()), self.files, self.analiza_skup_links)
+
+    def close(self):
+        self.store.close()
+        self.export.close()
+        print(f"Files: {self.store.written} copied, {self.store.skipped} already in {self.output_folder}")
+
+class HtmlSink(Sink):
+    """
+    extractMoodle forum pages, images and search index.
+
+    Image references can only be rewritten once the blobs of the backup have been seen,
+    so posts are spooled to a temporary file during the pass and rendered in close().
+    """
+
+    def __init__(self, workers=1):
+        # extractMoodle stvara ./forum_export pri importu, pa se uvozi tek kad je --html ukljucen
+        import extractMoodle
+        self.em = extractMoodle
+        extractMoodle.HTML_DIR.mkdir(parents=True, exist_ok=True)
+        extractMoodle.IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.index = extractMoodle.SearchIndex(extractMoodle.DISCUSSIONS_PER_PAGE)
+        self.unresolved = []
+        self.spools = []
+
+    def begin_backup(self, mbz_path, backup, files):
+        self.images = self.em.ImageExport(files, backup)
+        self.spool = tempfile.TemporaryFile()
+
+    def add_post(self, post):
+        pickle.dump(self.em.post_record(post), self.spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def wanted_blobs(self):
+        return self.images.pending
+
+    def add_blob(self, contenthash, blob):
+        self.images.add_blob(contenthash, blob)
+
+    def end_backup(self):
+        self.spools.append((self.spool, self.images.files_map()))
+
+    def iter_discussions(self):
+        for spool, files_map in self.spools:
+            spool.seek(0)
+            while True:
+                try:
+                    post = pickle.load(spool)
+                except EOFError:
+                    break
+                post["message"] = self.em.replace_images(post["message"], post["postid"], files_map, self.unresolved)
+                yield post
+
+    def close(self):
+        try:
+            self.em.generate_forum_pages(self.index.collect(self.iter_discussions()), workers=self.workers)
+            self.em.finish_export(self.index, self.unresolved)
+        finally:
+            for spool, _ in self.spools:
+                spool.close()
+
+def process_backup(mbz_path, sinks, report=None):
+    """Read one backup once (files.xml, forum.xml, then the blobs) and feed every sink that accepts it."""
+    sinks = [sink for sink in sinks if sink.accepts(mbz_path)]
+    if not sinks:
+        return
+    print(f"Processing: {mbz_path}")
+    if report is None:
+        report = ImportReport()
+    wall, cpu = time.perf_counter(), time.process_time()
+
+    with report.stage("open_backup"):
+        backup = MoodleBackup(mbz_path)
+    with backup:
+        files = files_root(backup.files_xml())
+        for sink in sinks:
+            sink.begin_backup(mbz_path, backup, files)
+
+        posts = 0
+        with report.stage("posts"):
+            for post in iter_posts(backup.forum_xml()):
+                posts += 1
+                for sink in sinks:
+                    sink.add_post(post)
+
+        wanted = {}
+        for sink in sinks:
+            for contenthash in sink.wanted_blobs():
+                wanted.setdefault(contenthash, []).append(sink)
+        with report.stage("blobs"):
+            for contenthash, blob in backup.iter_blobs(wanted):
+                takers = wanted[contenthash]
+                if len(takers) == 1:
+                    takers[0].add_blob(contenthash, blob)
+                    continue
+                # Vise sinkova treba isti blob: procitaj ga jednom
+                data = blob.read()
+                for sink in takers:
+                    sink.add_blob(contenthash, BytesIO(data))
+
+        for sink in sinks:
+            sink.end_backup()
+
+    report.add_backup(mbz_path, time.perf_counter() - wall, time.process_time() - cpu, posts, len(wanted))
+
+def main(args):
+    if not (args.db or args.csv or args.html):
+        print("Error: enable at least one output (--db, --csv, --html)")
+        sys.exit(1)
+    mbz_files = list_backups(args.input)
+    report = ImportReport()
+
+    sinks = []
+    if args.db:
+        conn, db_files, fingerprints, skip_posts = createAndLoadDb.start_import(args, mbz_files, report)
+        sinks.append(DbSink(args, report, conn, db_files, fingerprints, skip_posts))
+    if args.csv:
+        try:
+            sinks.append(CsvSink("./csv_output", "./all_files", args.format, args.copy_workers))
+        except ImportError:
+            print(f"[Error] --format {args.format} needs pyarrow (pip install pyarrow)")
+            sys.exit(1)
+    if args.html:
+        sinks.append(HtmlSink(args.workers or os.cpu_count()))
+
+    with report.stage("parse_backups"):
+        for mbz in mbz_files:
+            process_backup(mbz, sinks, report)
+    for sink in sinks:
+        with report.stage(f"finish_{type(sink).__name__}"):
+            sink.close()
+
+    if args.db:
+        report.write(args.report, {"loader": args.loader, "outputs": [type(sink).__name__ for sink in sinks]})
+        print(f"Report written to {args.report}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read Moodle backups once and load the database, write the CSV export and/or the HTML archive")
+    parser.add_argument("-i", "--input", help="Input .mbz file or folder of .mbz files", required=True, type=str)
+    parser.add_argument("--db", help="Load posts, files and CKAN datasets into PostgreSQL (createAndLoadDb.py)", action="store_true")
+    parser.add_argument("--csv", help="Write ./csv_output and ./all_files (createCsv.py)", action="store_true")
+    parser.add_argument("--html", help="Write the ./forum_export HTML archive (extractMoodle.py)", action="store_true")
+    parser.add_argument("-w", "--workers", help="Processes rendering HTML pages (0 = all cores)", default=1, type=int)
+    parser.add_argument("-f", "--format", help="Output format of the --csv tables", choices=["csv", "parquet", "arrow"], default="csv")
+    parser.add_argument("--copy-workers", help="Threads writing blobs into ./all_files", default=4, type=int)
+    createAndLoadDb.add_import_arguments(parser)
+    args = parser.parse_args()
+    main(args)
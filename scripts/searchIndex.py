@@ -0,0 +1,222 @@
+import html, json, os, re, unicodedata
+from pathlib import Path
+
+# Cesti hrvatski (i engleski) veznici i prijedlozi, nakon normalizacije
+STOPWORDS = frozenset((
+    "i", "u", "je", "na", "se", "za", "da", "od", "do", "su", "a", "o", "s", "sa", "to", "ne", "sto",
+    "koji", "koja", "koje", "ali", "ili", "kao", "te", "li", "bi", "sam", "smo", "ste", "the", "and", "of",
+))
+TOKEN_RE = re.compile(r"[^\W_]+")
+TAG_RE = re.compile(r"<[^>]*>")
+COMBINING_RE = re.compile("[\u0300-\u036f]")
+SHARD_KEY_RE = re.compile(r"[a-z0-9]{2}")
+MIN_TERM_LENGTH = 2
+DOCS_PER_CHUNK = 1000
+INDEX_DIR = "search"
+
+def normalize(text):
+    """Lowercase and fold diacritics (č/ć -> c, š -> s, ž -> z, đ -> d) so queries work without them."""
+    text = text.lower().replace("đ", "d")
+    return COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+
+def tokenize(text):
+    return [
+        term for term in TOKEN_RE.findall(normalize(text))
+        if len(term) >= MIN_TERM_LENGTH and term not in STOPWORDS
+    ]
+
+def shard_key(term):
+    prefix = term[:2]
+    return prefix if SHARD_KEY_RE.fullmatch(prefix) else "_"
+
+class SearchIndex:
+    """
+    Inverted index of exported posts, written as static JavaScript shards next to the HTML pages.
+
+    Terms are sharded by their first two characters (search/t_<xx>.js) and post metadata is
+    chunked by document number (search/d_<n>.js), so search.html loads only what a query needs.
+    Files are loaded with <script> tags, which also works when the export is opened from disk.
+    """
+
+    def __init__(self, posts_per_page):
+        self.posts_per_page = posts_per_page
+        self.docs = []
+        self.postings = {}
+
+    def add(self, post):
+        doc_id = len(self.docs)
+        page = doc_id // self.posts_per_page + 1
+        subject = post.get("subject") or ""
+        self.docs.append((post["postid"], page, subject, post.get("created") or ""))
+
+        text = subject + " " + html.unescape(TAG_RE.sub(" ", post.get("message") or ""))
+        for term in set(tokenize(text)):
+            self.postings.setdefault(term, []).append(doc_id)
+
+    def collect(self, posts):
+        """Pass posts through unchanged while indexing them (so pages and index share one stream)."""
+        for post in posts:
+            self.add(post)
+            yield post
+
+    def write(self, html_dir):
+        index_dir = Path(html_dir) / INDEX_DIR
+        index_dir.mkdir(parents=True, exist_ok=True)
+        written = set()
+
+        shards = {}
+        for term, doc_ids in self.postings.items():
+            # Delta kodiranje: doc_id-ovi su rastuci pa su razlike male
+            gaps = [doc_ids[0]] + [b - a for a, b in zip(doc_ids, doc_ids[1:])]
+            shards.setdefault(shard_key(term), {})[term] = gaps
+        for key, terms in shards.items():
+            name = f"t_{key}.js"
+            _write_js(index_dir / name, f"searchShard({json.dumps(key)},{json.dumps(terms, separators=(',', ':'), sort_keys=True)});")
+            written.add(name)
+
+        for start in range(0, len(self.docs), DOCS_PER_CHUNK):
+            name = f"d_{start // DOCS_PER_CHUNK}.js"
+            chunk = self.docs[start:start + DOCS_PER_CHUNK]
+            _write_js(index_dir / name, f"searchDocs({start // DOCS_PER_CHUNK},{json.dumps(chunk, separators=(',', ':'), ensure_ascii=False)});")
+            written.add(name)
+
+        meta = {"docs": len(self.docs), "docsPerChunk": DOCS_PER_CHUNK, "shards": sorted(shards)}
+        _write_js(index_dir / "meta.js", f"searchMeta({json.dumps(meta)});")
+        written.add("meta.js")
+
+        for stale in os.listdir(index_dir):
+            if stale.endswith(".js") and stale not in written:
+                os.remove(index_dir / stale)
+
+        (Path(html_dir) / "search.html").write_text(SEARCH_PAGE, encoding="utf-8")
+        return len(self.docs), len(self.postings), len(shards)
+
+def _write_js(path, content):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(content, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html lang='hr'>
+<head>
+  <meta charset='UTF-8'>
+  <meta name='viewport' content='width=device-width, initial-scale=1.0'>
+  <title>Forum Search</title>
+  <style>
+    body { font-family: Arial, sans-serif; margin: 20px; }
+    input { font-size: 1.1em; width: 60%%; padding: 4px; }
+    .result { margin: 10px 0; }
+    .meta { font-size: 0.9em; color: #555; }
+  </style>
+</head>
+<body>
+<h1>Forum Search</h1>
+<form id='form'><input id='query' autofocus placeholder='Pojmovi za pretragu'> <button>Search</button></form>
+<p id='status'></p>
+<div id='results'></div>
+<p><a href='page1.html'>Forum pages</a></p>
+<script>
+const STOPWORDS = new Set(%(stopwords)s);
+const MIN_TERM_LENGTH = %(min_length)d;
+const MAX_RESULTS = 100;
+const shards = {}, docChunks = {}, loading = {};
+let meta = null;
+
+function searchShard(key, terms) { shards[key] = terms; }
+function searchDocs(chunk, docs) { docChunks[chunk] = docs; }
+function searchMeta(value) { meta = value; }
+
+function load(name) {
+  if (!loading[name]) {
+    loading[name] = new Promise(resolve => {
+      const script = document.createElement('script');
+      script.src = '%(index_dir)s/' + name;
+      script.onload = resolve;
+      script.onerror = resolve;
+      document.head.appendChild(script);
+    });
+  }
+  return loading[name];
+}
+
+function normalize(text) {
+  return text.toLowerCase().replace(/đ/g, 'd').normalize('NFKD').replace(/[\\u0300-\\u036f]/g, '');
+}
+
+function tokenize(text) {
+  return (normalize(text).match(/[\\p{L}\\p{N}]+/gu) || [])
+    .filter(term => term.length >= MIN_TERM_LENGTH && !STOPWORDS.has(term));
+}
+
+function shardKey(term) {
+  const prefix = term.slice(0, 2);
+  return /^[a-z0-9]{2}$/.test(prefix) ? prefix : '_';
+}
+
+function decode(gaps) {
+  const ids = [];
+  let current = 0;
+  gaps.forEach((gap, i) => { current = i ? current + gap : gap; ids.push(current); });
+  return ids;
+}
+
+// Upit "podat" pronalazi i "podataka", "podaci": svaki pojam je prefiks
+function matchTerm(term) {
+  const terms = shards[shardKey(term)] || {};
+  const ids = new Set();
+  for (const [candidate, gaps] of Object.entries(terms)) {
+    if (candidate.startsWith(term)) decode(gaps).forEach(id => ids.add(id));
+  }
+  return ids;
+}
+
+async function search(query) {
+  const terms = [...new Set(tokenize(query))];
+  const results = document.getElementById('results');
+  const status = document.getElementById('status');
+  results.innerHTML = '';
+  if (!terms.length) { status.textContent = ''; return; }
+
+  await load('meta.js');
+  const available = new Set(meta ? meta.shards : []);
+  await Promise.all(terms.filter(term => available.has(shardKey(term))).map(term => load('t_' + shardKey(term) + '.js')));
+  let hits = null;
+  for (const term of terms) {
+    const ids = matchTerm(term);
+    hits = hits === null ? ids : new Set([...hits].filter(id => ids.has(id)));
+  }
+  const ids = [...hits].sort((a, b) => a - b);
+  status.textContent = ids.length + ' result(s)' + (ids.length > MAX_RESULTS ? ', showing first ' + MAX_RESULTS : '');
+
+  const shown = ids.slice(0, MAX_RESULTS);
+  const chunkSize = meta ? meta.docsPerChunk : %(docs_per_chunk)d;
+  await Promise.all([...new Set(shown.map(id => Math.floor(id / chunkSize)))].map(chunk => load('d_' + chunk + '.js')));
+  for (const id of shown) {
+    const [postid, page, subject, created] = docChunks[Math.floor(id / chunkSize)][id %% chunkSize];
+    const div = document.createElement('div');
+    div.className = 'result';
+    const link = document.createElement('a');
+    link.href = 'page' + page + '.html#post-' + postid;
+    link.textContent = subject || ('Post ' + postid);
+    const info = document.createElement('div');
+    info.className = 'meta';
+    info.textContent = 'Post ID: ' + postid + ' | Created: ' + created + ' | Page ' + page;
+    div.append(link, info);
+    results.appendChild(div);
+  }
+}
+
+load('meta.js');
+document.getElementById('form').addEventListener('submit', event => {
+  event.preventDefault();
+  search(document.getElementById('query').value);
+});
+</script>
+</body>
+</html>
+""" % {
+    "stopwords": json.dumps(sorted(STOPWORDS)),
+    "min_length": MIN_TERM_LENGTH,
+    "index_dir": INDEX_DIR,
+    "docs_per_chunk": DOCS_PER_CHUNK,
+}
@@ -0,0 +1,125 @@
+"""Lokalni CKAN za testove i benchmarke: poslužuje package_show i package_search iz rjecnika u memoriji."""
+import json, re, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+def make_package(identifier, resources=2, organization="org-1"):
+    return {
+        "id": f"id-{identifier}",
+        "name": identifier,
+        "title": f"Skup {identifier}",
+        "notes": "Opis skupa",
+        "state": "active",
+        "theme": "Gospodarstvo",
+        "data_refresh_frequency": "godisnje",
+        "metadata_created": "2021-05-05T11:47:30.254500",
+        "metadata_modified": "2023-01-01T10:00:00.000000",
+        "isopen": True,
+        "license_id": "cc-by",
+        "license_title": "CC BY",
+        "license_url": "https://creativecommons.org/licenses/by/4.0/",
+        "organization": {"id": organization, "title": f"Izdavac {organization}", "description": ""},
+        "tags": [{"name": "tag-a"}, {"name": "tag-b"}],
+        "resources": [
+            {
+                "id": f"res-{identifier}-{i}",
+                "name": f"Resurs {i}",
+                "description": "",
+                "format": "CSV",
+                "mimetype": "text/csv",
+                "state": "active",
+                "size": "1024",
+                "available_through_api": "True",
+                "created": "2021-05-05T11:47:30.254500",
+                "last_modified": None,
+                "url": f"https://example.org/{identifier}/{i}.csv",
+            }
+            for i in range(resources)
+        ],
+    }
+
+class FakeCkan:
+    """
+    packages: {identifier: package dict}. Unknown identifiers get a 404 with success=false.
+    package_search understands fq=id:("a" OR "b") and returns the packages with those ids;
+    its requests are counted (and failed) under the identifier "package_search".
+    failures: {identifier: n} answers the first n requests for identifier with 503.
+    delay: seconds each request sleeps, to make concurrency observable.
+    """
+
+    def __init__(self, packages, failures=None, delay=0.0):
+        self.packages = packages
+        self.failures = Counter(failures or {})
+        self.delay = delay
+        self.requests = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        ckan = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                identifier = query.get("id", [""])[0]
+                if parsed.path == "/api/3/action/package_search":
+                    identifier = "package_search"
+                with ckan._lock:
+                    ckan.requests[identifier] += 1
+                    ckan.in_flight += 1
+                    ckan.max_in_flight = max(ckan.max_in_flight, ckan.in_flight)
+                    fail = ckan.failures[identifier] > 0
+                    if fail:
+                        ckan.failures[identifier] -= 1
+                try:
+                    if ckan.delay:
+                        time.sleep(ckan.delay)
+                    if parsed.path not in ("/api/3/action/package_show", "/api/3/action/package_search"):
+                        self._send(404, {"success": False})
+                    elif fail:
+                        self._send(503, {"success": False})
+                    elif identifier == "package_search":
+                        ids = set(re.findall(r'"([^"]+)"', query.get("fq", [""])[0]))
+                        found = [p for p in ckan.packages.values() if p["id"] in ids]
+                        self._send(200, {"success": True, "result": {"count": len(found), "results": found}})
+                    elif identifier in ckan.packages:
+                        self._send(200, {"success": True, "result": ckan.packages[identifier]})
+                    else:
+                        self._send(404, {"success": False, "error": {"message": "Not found"}})
+                finally:
+                    with ckan._lock:
+                        ckan.in_flight -= 1
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,89 @@
+"""Lokalni posluzitelj resursa za testove provjere URL-ova: odgovara statusom zadanim u putanji."""
+import threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeResources:
+    """
+    /status/<code> answers with <code>, /nohead answers HEAD with 405 and GET with 200,
+    /redirect redirects to /status/200. Every request sleeps delay seconds.
+    Concurrency and request start times are recorded per Host header.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = Counter()
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self.starts = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def url(self, path, host="127.0.0.1"):
+        return f"http://{host}:{self.port}{path}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self._respond(head=True)
+
+            def do_GET(self):
+                self._respond(head=False)
+
+            def _respond(self, head):
+                host = self.headers.get("Host", "").rsplit(":", 1)[0]
+                path = self.path.split("?", 1)[0]
+                with server._lock:
+                    server.requests[(self.command, self.path)] += 1
+                    server.in_flight[host] += 1
+                    server.max_in_flight[host] = max(server.max_in_flight[host], server.in_flight[host])
+                    server.starts.setdefault(host, []).append(time.monotonic())
+                try:
+                    if server.delay:
+                        time.sleep(server.delay)
+                    if path.startswith("/status/"):
+                        self._send(int(path.rsplit("/", 1)[1]), head)
+                    elif path == "/nohead":
+                        self._send(405 if head else 200, head)
+                    elif path == "/redirect":
+                        self.send_response(302)
+                        self.send_header("Location", "/status/200")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                    else:
+                        self._send(404, head)
+                finally:
+                    with server._lock:
+                        server.in_flight[host] -= 1
+
+            def _send(self, status, head):
+                body = b"x" * 64
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,67 @@
+import os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from moodleBackup import MoodleBackup
+from blobStore import BlobStore, copy_range
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp.name, "all_files")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def store_backup(self, compress, seed=4, start_id=1):
+        path = os.path.join(self.tmp.name, f"backup-{seed}-{compress}.mbz")
+        backup = write_mbz(path, compress=compress, posts=30, files=12, seed=seed, start_id=start_id)
+        with MoodleBackup(path) as mbz, BlobStore(self.store_dir, workers=3) as store:
+            self.assertEqual(mbz.compressed, compress)
+            store.add_from_backup(mbz, list(backup["blobs"]) + ["0" * 40])
+        return backup, store
+
+    def assert_stored(self, blobs):
+        for contenthash, content in blobs.items():
+            with open(os.path.join(self.store_dir, contenthash), "rb") as f:
+                self.assertEqual(f.read(), content)
+
+    def test_compressed_and_uncompressed_archives(self):
+        for compress in (True, False):
+            with self.subTest(compress=compress):
+                backup, store = self.store_backup(compress)
+                self.assertEqual(store.written, len(backup["blobs"]))
+                self.assert_stored(backup["blobs"])
+                self.assertFalse([name for name in os.listdir(self.store_dir) if name.endswith(".tmp")])
+                for name in os.listdir(self.store_dir):
+                    os.remove(os.path.join(self.store_dir, name))
+
+    def test_second_run_copies_nothing(self):
+        backup, first = self.store_backup(compress=True)
+        _, second = self.store_backup(compress=True)
+        self.assertEqual(first.written, len(backup["blobs"]))
+        self.assertEqual((second.written, second.skipped), (0, len(backup["blobs"])))
+
+    def test_duplicate_hashes_copied_once(self):
+        path = os.path.join(self.tmp.name, "backup.mbz")
+        backup = write_mbz(path, compress=False, posts=10, files=4, seed=2)
+        hashes = list(backup["blobs"])
+        with MoodleBackup(path) as mbz, BlobStore(self.store_dir) as store:
+            store.add_from_backup(mbz, hashes + hashes)
+            store.add_from_backup(mbz, hashes)
+        self.assertEqual((store.written, store.skipped), (len(hashes), len(hashes)))
+        self.assert_stored(backup["blobs"])
+
+    def test_copy_range(self):
+        src = os.path.join(self.tmp.name, "src")
+        dst = os.path.join(self.tmp.name, "dst")
+        with open(src, "wb") as f:
+            f.write(bytes(range(256)) * 10)
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            copy_range(s.fileno(), d.fileno(), 300, 1000)
+        with open(dst, "rb") as f:
+            self.assertEqual(f.read(), (bytes(range(256)) * 10)[300:1300])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os, sys, tempfile, time, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ckanClient import CacheMiss, PackageNotFound, ResponseCache, fetch_packages, fetch_packages_by_id
+from fakeCkan import FakeCkan, make_package
+
+class TestFetchPackages(unittest.TestCase):
+    def test_fetches_each_identifier_once(self):
+        packages = {f"skup-{i}": make_package(f"skup-{i}") for i in range(20)}
+        with FakeCkan(packages, delay=0.05) as ckan:
+            results = fetch_packages(list(packages) * 2, ckan_url=ckan.url, workers=4)
+
+        self.assertEqual(set(results), set(packages))
+        self.assertTrue(all(r["success"] for r in results.values()))
+        self.assertEqual(results["skup-3"]["result"]["id"], "id-skup-3")
+        self.assertEqual(set(ckan.requests.values()), {1})
+        self.assertGreater(ckan.max_in_flight, 1)
+        self.assertLessEqual(ckan.max_in_flight, 4)
+
+    def test_retries_transient_errors(self):
+        packages = {"skup": make_package("skup")}
+        with FakeCkan(packages, failures={"skup": 2}) as ckan:
+            results = fetch_packages(["skup"], ckan_url=ckan.url, workers=2, retries=3)
+        self.assertTrue(results["skup"]["success"])
+        self.assertEqual(ckan.requests["skup"], 3)
+
+    def test_failures_are_returned(self):
+        with FakeCkan({}, failures={"down": 10}) as ckan:
+            results = fetch_packages(["missing", "down"], ckan_url=ckan.url, workers=2, retries=1)
+        self.assertIsInstance(results["missing"], PackageNotFound)
+        self.assertIsInstance(results["down"], Exception)
+        self.assertNotIsInstance(results["down"], PackageNotFound)
+        self.assertEqual(ckan.requests["missing"], 1)
+
+class TestFetchPackagesById(unittest.TestCase):
+    def test_batches_ids_into_search_requests(self):
+        packages = {f"skup-{i}": make_package(f"skup-{i}") for i in range(250)}
+        ids = [p["id"] for p in packages.values()] + ["id-deleted"]
+        latencies = []
+        with FakeCkan(packages) as ckan:
+            results = fetch_packages_by_id(ids, ckan_url=ckan.url, batch_size=100, workers=2, latencies=latencies)
+
+        self.assertEqual(ckan.requests["package_search"], 3)
+        self.assertEqual(len(latencies), 3)
+        self.assertEqual(set(results), set(ids))
+        self.assertEqual(results["id-skup-7"]["title"], "Skup skup-7")
+        self.assertIsInstance(results["id-deleted"], PackageNotFound)
+
+    def test_failed_batch_marks_its_ids(self):
+        packages = {"skup": make_package("skup")}
+        with FakeCkan(packages, failures={"package_search": 10}) as ckan:
+            results = fetch_packages_by_id(["id-skup"], ckan_url=ckan.url, retries=1)
+        self.assertIsInstance(results["id-skup"], Exception)
+        self.assertNotIsInstance(results["id-skup"], PackageNotFound)
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_then_replay_offline(self):
+        packages = {"a": make_package("a"), "b": make_package("b")}
+        with FakeCkan(packages) as ckan:
+            with ResponseCache(self.path) as cache:
+                fetch_packages(["a", "b", "missing"], ckan_url=ckan.url, cache=cache, retries=0)
+            with ResponseCache(self.path) as cache:
+                results = fetch_packages(["a", "b"], ckan_url=ckan.url, cache=cache)
+                self.assertEqual((cache.hits, cache.misses), (2, 0))
+        self.assertEqual(ckan.requests["a"], 1)
+        self.assertEqual(results["b"]["result"]["id"], "id-b")
+
+        with ResponseCache(self.path, ttl=0) as cache:
+            results = fetch_packages(["a", "missing", "never"], ckan_url="http://127.0.0.1:9", cache=cache, offline=True)
+        self.assertTrue(results["a"]["success"])
+        self.assertIsInstance(results["missing"], PackageNotFound)
+        self.assertIsInstance(results["never"], CacheMiss)
+
+    def test_not_found_is_cached_until_ttl(self):
+        with FakeCkan({}) as ckan:
+            with ResponseCache(self.path) as cache:
+                first = fetch_packages(["missing"], ckan_url=ckan.url, cache=cache)
+                second = fetch_packages(["missing"], ckan_url=ckan.url, cache=cache)
+                self.assertEqual(cache.hits, 1)
+            self.assertEqual(ckan.requests["missing"], 1)
+            with ResponseCache(self.path, ttl=-1) as cache:
+                fetch_packages(["missing"], ckan_url=ckan.url, cache=cache)
+            self.assertEqual(ckan.requests["missing"], 2)
+        self.assertIsInstance(first["missing"], PackageNotFound)
+        self.assertIsInstance(second["missing"], PackageNotFound)
+        self.assertIn("Not found", str(second["missing"]))
+
+    def test_failed_requests_are_not_cached(self):
+        with FakeCkan({}, failures={"down": 10}) as ckan:
+            with ResponseCache(self.path) as cache:
+                fetch_packages(["down"], ckan_url=ckan.url, cache=cache, retries=0)
+                self.assertIsNone(cache.get("down"))
+
+    def test_ttl_expires_entries(self):
+        with ResponseCache(self.path, ttl=3600) as cache:
+            cache.put("a", {"success": True})
+            self.assertIsNotNone(cache.get("a"))
+            cache.ttl = -1
+            self.assertIsNone(cache.get("a"))
+
+    def test_evicts_least_recently_used(self):
+        with ResponseCache(self.path, max_bytes=70) as cache:
+            for identifier in ("a", "b", "c"):
+                cache.put(identifier, {"success": True, "result": identifier})
+                time.sleep(0.01)
+            cache.get("a")
+        with ResponseCache(self.path) as cache:
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,521 @@
+import contextlib, io, json, os, re, sys, tempfile, unittest
+from argparse import Namespace
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from moodleBackup import fingerprint
+import createAndLoadDb
+from createAndLoadDb import (
+    INDEXES, KOMENTAR_COLUMNS, MIGRATIONS, CopyStream, Komentar, Slika, Json, RESURS_COLUMNS, SKUP_COLUMNS, SKUP_UPSERT,
+    STATS_GLOBAL_REFRESH, STATS_LOCK, STATS_SKUP_REFRESH, STATS_STALE, add_dataset, create_indexes, create_postgres_tables,
+    copy_table, refresh_stats,
+)
+from importReport import ImportReport
+from ckanClient import PackageNotFound, ResponseCache
+import requests
+from fakeCkan import make_package
+
+class TestCopyStream(unittest.TestCase):
+    def test_encodes_text_copy_format(self):
+        rows = [
+            (1, "a\tb\nc\\d", None, True, datetime(2024, 1, 2, 3, 4, 5), Json(["x", "y"])),
+            (2, "", None, False, None, Json([])),
+        ]
+        self.assertEqual(
+            CopyStream(rows).read(),
+            '1\ta\\tb\\nc\\\\d\t\\N\tt\t2024-01-02 03:04:05\t["x", "y"]\n'
+            '2\t\t\\N\tf\t\\N\t[]\n',
+        )
+
+    def test_records_are_rows(self):
+        created = datetime(2024, 1, 2, 3, 4, 5)
+        rows = [Komentar(7, 3, "id-skup", created, "Naslov", "<p>x</p>", "mbz"), Slika(7, "ab" * 20, "a.png", "image/png", created)]
+        self.assertEqual(
+            CopyStream(rows).read(),
+            "7\t3\tid-skup\t2024-01-02 03:04:05\tNaslov\t<p>x</p>\tmbz\n"
+            f"7\t{'ab' * 20}\ta.png\timage/png\t2024-01-02 03:04:05\n",
+        )
+        self.assertEqual(KOMENTAR_COLUMNS, ("import_id", "user_id", "skup_id", "created", "subject", "message", "import_source"))
+
+    def test_reads_in_chunks(self):
+        rows = [(i, "x" * i) for i in range(50)]
+        expected = CopyStream(rows).read()
+        stream = CopyStream(rows)
+        chunks = []
+        while True:
+            chunk = stream.read(7)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 7)
+            chunks.append(chunk)
+        self.assertEqual("".join(chunks), expected)
+
+class TestContentHash(unittest.TestCase):
+    def rows(self, package):
+        datasets, resources, publishers = {}, [], {}
+        add_dataset("skup", "https://data.gov.hr/ckan/dataset/skup", package, datasets, resources, publishers)
+        return list(datasets.values()), resources
+
+    def test_rows_end_with_hash(self):
+        skup, resurs = self.rows(make_package("skup"))
+        self.assertEqual(len(skup[0]), len(SKUP_COLUMNS))
+        self.assertEqual(len(resurs[0]), len(RESURS_COLUMNS))
+        self.assertRegex(skup[0][-1], "^[0-9a-f]{64}$")
+
+    def test_hash_changes_only_with_metadata(self):
+        skup, resurs = self.rows(make_package("skup"))
+        again_skup, again_resurs = self.rows(make_package("skup"))
+        self.assertEqual(again_skup[0][-1], skup[0][-1])
+        self.assertEqual(again_resurs, resurs)
+
+        changed = make_package("skup")
+        changed["tags"].append({"name": "tag-c"})
+        changed["resources"][1]["size"] = "2048"
+        changed_skup, changed_resurs = self.rows(changed)
+        self.assertNotEqual(changed_skup[0][-1], skup[0][-1])
+        self.assertEqual(changed_resurs[0][-1], resurs[0][-1])
+        self.assertNotEqual(changed_resurs[1][-1], resurs[1][-1])
+
+    def test_upsert_updates_all_columns_when_hash_differs(self):
+        for column in SKUP_COLUMNS[1:]:
+            self.assertIn(f"{column} = EXCLUDED.{column}", SKUP_UPSERT)
+        self.assertIn("fetched_at = now()", SKUP_UPSERT)
+        self.assertTrue(SKUP_UPSERT.endswith("WHERE skup_podataka.content_hash IS DISTINCT FROM EXCLUDED.content_hash"))
+
+class FakeConnection:
+    """Records the SQL executed through it; fetches return the queued results in order."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+        self.params = []
+        self.commits = 0
+        self.autocommit = False
+        self.autocommit_during = []
+        self.copied = []
+        self.templates = []
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=None):
+        self.executed.append(" ".join(sql.split()))
+        self.params.append(params)
+        self.autocommit_during.append(self.autocommit)
+
+    def copy_expert(self, sql, stream):
+        self.executed.append(sql)
+        self.params.append(None)
+        self.copied.append(stream.read())
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+    def execute_values(self, cur, sql, argslist, template=None, page_size=100, fetch=False):
+        # Zamjena za psycopg2.extras.execute_values: biljezi SQL i redove, RETURNING vraca prvi stupac
+        rows = list(argslist)
+        self.executed.append(" ".join(sql.split()))
+        self.params.append(rows)
+        self.templates.append(template)
+        self.autocommit_during.append(self.autocommit)
+        if fetch:
+            return [(row[0],) for row in rows]
+
+class TestKomentarLoad(unittest.TestCase):
+    def setUp(self):
+        created = datetime(2024, 1, 2, 3, 4, 5)
+        self.komentari = [Komentar(7, 3, "id-skup", created, "Naslov", "<p>x</p>", "mbz")]
+        self.slike = [Slika(7, "ab" * 20, "a.png", "image/png", created)]
+
+    def test_id_comes_from_sequence(self):
+        conn = FakeConnection()
+        copy_table(conn, "komentar", self.komentari, ImportReport())
+        stage, copy, insert = conn.executed
+        self.assertNotIn("id", KOMENTAR_COLUMNS)
+        self.assertEqual(stage, f"CREATE TEMP TABLE stage_komentar ON COMMIT DROP AS SELECT {', '.join(KOMENTAR_COLUMNS)} FROM komentar WITH NO DATA")
+        self.assertTrue(insert.startswith(f"INSERT INTO komentar ({', '.join(KOMENTAR_COLUMNS)}) SELECT DISTINCT ON (import_source, import_id)"))
+        self.assertTrue(insert.endswith("ON CONFLICT (import_source, import_id) WHERE import_id IS NOT NULL DO NOTHING"))
+
+    def test_slika_joins_komentar_on_import_id(self):
+        conn = FakeConnection()
+        copy_table(conn, "slika", self.slike, ImportReport())
+        insert = conn.executed[-1]
+        self.assertIn("SELECT DISTINCT ON (k.id, s.content_hash) k.id, s.content_hash", insert)
+        self.assertIn("JOIN komentar k ON k.import_source = %s AND k.import_id = s.komentar_id", insert)
+        self.assertEqual(conn.params[-1], ("mbz",))
+        self.assertTrue(conn.copied[0].startswith("7\t"))
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backups = []
+        for i in (1, 2):
+            path = os.path.join(self.tmp.name, f"b{i}.mbz")
+            write_mbz(path, posts=40, discussions=4, files=10, link_density=0.5, datasets=4, seed=i, start_id=i * 1000)
+            self.backups.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def parse(self, path, skip_posts=frozenset()):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return createAndLoadDb.parse_backup(path, skip_posts)
+
+    def test_known_posts_are_skipped(self):
+        _, posts, discussions, files, _ = self.parse(self.backups[0])
+        known = frozenset(d.import_id for d in discussions[::2])
+        _, skipped_posts, skipped, skipped_files, _ = self.parse(self.backups[0], known)
+
+        self.assertEqual(skipped, [d for d in discussions if d.import_id not in known])
+        self.assertEqual(skipped_files, [f for f in files if f.import_id not in known])
+        self.assertEqual(skipped_posts, {post: identifier for post, identifier in posts.items() if post not in known})
+
+    def test_known_backups_are_skipped_by_fingerprint(self):
+        conn = FakeConnection([(fingerprint(self.backups[0]),)], [(1001,), (1002,)])
+        args = Namespace(offline=False, no_cache=False, incremental=True)
+        with mock.patch.object(createAndLoadDb, "get_connection", return_value=conn), \
+                mock.patch.object(createAndLoadDb, "create_postgres_tables"), \
+                contextlib.redirect_stdout(io.StringIO()):
+            _, mbz_files, fingerprints, skip_posts = createAndLoadDb.start_import(args, self.backups, ImportReport())
+
+        self.assertEqual(mbz_files, self.backups[1:])
+        self.assertEqual(set(fingerprints), set(self.backups))
+        self.assertEqual(skip_posts, {1001, 1002})
+        self.assertEqual(conn.params[-1], ("mbz",))
+
+    def test_backups_with_unresolved_datasets_are_not_recorded(self):
+        dataset_links, post_datasets, discussions, files, backup_links = {}, {}, [], [], {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in self.backups:
+                createAndLoadDb.process_single_backup(path, dataset_links, post_datasets, discussions, files, backup_links=backup_links)
+        # Drugi backup ima skup koji prvi nema, i njegov dohvat ne uspije
+        missing = sorted(backup_links[self.backups[1]] - backup_links[self.backups[0]])[0]
+        report = self.finish(dataset_links, post_datasets, discussions, files, backup_links, {missing: requests.ConnectionError("timeout")})
+
+        self.record_backups.assert_called_once_with(None, [(self.fingerprints[self.backups[0]], "b1.mbz")])
+        self.assertEqual(report.counters["backups_unrecorded"], 1)
+        loaded = self.bulk_load.call_args[0][4]
+        self.assertNotIn(missing, {post_datasets[d.import_id] for d in loaded})
+
+    def test_deleted_dataset_does_not_block_recording(self):
+        dataset_links = {identifier: f"https://data.gov.hr/ckan/dataset/{identifier}" for identifier in ("skup", "obrisan", "nedostupan")}
+        backup_links = {self.backups[0]: {"skup", "obrisan"}, self.backups[1]: {"skup", "nedostupan"}}
+        report = self.finish(dataset_links, {}, [], [], backup_links, {
+            "obrisan": PackageNotFound("obrisan not found in CKAN: Not found"),
+            "nedostupan": requests.ConnectionError("timeout"),
+        })
+
+        # Skup kojeg u CKAN-u vise nema je rijesen (i izostavljen); ponavlja se samo prolazna greska
+        self.record_backups.assert_called_once_with(None, [(self.fingerprints[self.backups[0]], "b1.mbz")])
+        self.assertEqual(report.counters["backups_unrecorded"], 1)
+        self.assertEqual(report.counters["datasets"], 1)
+
+    def finish(self, dataset_links, post_datasets, discussions, files, backup_links, failures):
+        # finish_import s pravim resolve_datasets; CKAN vraca paket za svaki identifikator osim onih u failures
+        def fetch_packages(identifiers, **kwargs):
+            return {identifier: failures.get(identifier) or {"success": True, "result": make_package(identifier)} for identifier in identifiers}
+
+        self.fingerprints = {path: fingerprint(path) for path in self.backups}
+        args = Namespace(no_cache=True, ckan_url=None, ckan_workers=1, loader="copy")
+        report = ImportReport()
+        with mock.patch.object(createAndLoadDb, "fetch_packages", fetch_packages), \
+                mock.patch.object(createAndLoadDb, "bulk_load") as self.bulk_load, \
+                mock.patch.object(createAndLoadDb, "record_backups") as self.record_backups, \
+                mock.patch.object(createAndLoadDb, "create_indexes", return_value=[]), \
+                mock.patch.object(createAndLoadDb, "refresh_stats", return_value=0), \
+                contextlib.redirect_stdout(io.StringIO()):
+            createAndLoadDb.finish_import(None, args, report, self.backups, self.fingerprints, dataset_links, post_datasets, discussions, files, backup_links=backup_links)
+        return report
+
+    def test_without_backup_links_nothing_unresolved_is_recorded(self):
+        args = Namespace(no_cache=True, ckan_url=None, ckan_workers=1, loader="copy")
+        with mock.patch.object(createAndLoadDb, "resolve_datasets", return_value={"skup"}), \
+                mock.patch.object(createAndLoadDb, "bulk_load"), \
+                mock.patch.object(createAndLoadDb, "record_backups") as record_backups, \
+                mock.patch.object(createAndLoadDb, "create_indexes", return_value=[]), \
+                mock.patch.object(createAndLoadDb, "refresh_stats", return_value=0), \
+                contextlib.redirect_stdout(io.StringIO()):
+            createAndLoadDb.finish_import(None, args, ImportReport(), self.backups, {path: "fp" for path in self.backups}, {"skup": "url"}, {}, [], [])
+        record_backups.assert_called_once_with(None, [])
+
+class TestResolveDatasets(unittest.TestCase):
+    def test_not_found_differs_from_not_cached(self):
+        links = {identifier: f"https://data.gov.hr/ckan/dataset/{identifier}" for identifier in ("a", "deleted", "uncached")}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            with ResponseCache(path) as cache:
+                cache.put("a", {"success": True, "result": make_package("a")})
+                cache.put("deleted", {"success": False, "error": {"message": "Not found"}})
+            datasets, resources, publishers = {}, [], {}
+            output = io.StringIO()
+            with ResponseCache(path) as cache, contextlib.redirect_stdout(output):
+                createAndLoadDb.resolve_datasets(links, datasets, resources, publishers, cache=cache, offline=True)
+        self.assertEqual(set(datasets), {"a"})
+        self.assertIn("[Warning]: deleted not found in CKAN: Not found", output.getvalue())
+        self.assertIn("[Error] fetching dataset uncached: uncached is not in the CKAN cache (--offline)", output.getvalue())
+
+class TestMigrations(unittest.TestCase):
+    def test_versions_are_consecutive(self):
+        self.assertEqual([m[0] for m in MIGRATIONS], list(range(1, len(MIGRATIONS) + 1)))
+
+    def test_applies_only_newer_versions(self):
+        conn = FakeConnection((3,))
+        with contextlib.redirect_stdout(io.StringIO()):
+            applied = create_postgres_tables(conn)
+        self.assertEqual(applied, list(range(4, len(MIGRATIONS) + 1)))
+        inserts = [sql for sql in conn.executed if sql.startswith("INSERT INTO schema_version")]
+        self.assertEqual(len(inserts), len(applied))
+        self.assertEqual(conn.commits, 1)
+
+    def test_up_to_date_schema_runs_no_migration(self):
+        conn = FakeConnection((len(MIGRATIONS),))
+        self.assertEqual(create_postgres_tables(conn), [])
+        self.assertFalse(any("ALTER TABLE" in sql for sql in conn.executed))
+
+    def test_schema_dump_matches_migrations(self):
+        # Baza napravljena iz database/schema.sql ne smije ponovno pokretati migracije
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "database", "schema.sql")
+        with open(path, encoding="utf-8") as f:
+            dump = f.read()
+        tables = set(re.findall(r"CREATE TABLE IF NOT EXISTS (\w+)", "".join(m[2] for m in MIGRATIONS)))
+        self.assertIn("uvoz_backup", tables)
+        for table in tables:
+            self.assertIn(f"CREATE TABLE public.{table} (", dump)
+        seeded = re.findall(r"INSERT INTO public\.schema_version \(version, description\) VALUES \((\d+), '([^']*)'\);", dump)
+        self.assertEqual(seeded, [(str(v), d) for v, d, _ in MIGRATIONS])
+
+    def test_constraint_lookup_is_limited_to_current_schema(self):
+        conn = FakeConnection((1,))
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_postgres_tables(conn)
+        migration = next(sql for sql in conn.executed if "unique_alternative_key" in sql)
+        self.assertIn("connamespace = current_schema()::regnamespace", migration)
+
+    def test_odgovor_message_is_parsed_as_json(self):
+        # odgovor.message vec sadrzi JSON tekst; to_jsonb bi ga spremio kao JSON string
+        conn = FakeConnection((4,))
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_postgres_tables(conn)
+        migration = next(sql for sql in conn.executed if "ALTER COLUMN message" in sql)
+        self.assertIn("ALTER TABLE odgovor ALTER COLUMN message TYPE JSONB USING message::jsonb;", migration)
+        self.assertNotIn("to_jsonb", migration)
+
+class TestCreateIndexes(unittest.TestCase):
+    def test_builds_missing_and_invalid_concurrently(self):
+        conn = FakeConnection([("idx_komentar_skup_id", True), ("idx_resurs_skup_id", False)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            created = create_indexes(conn)
+        self.assertEqual(created, [name for name, _ in INDEXES if name != "idx_komentar_skup_id"])
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS idx_resurs_skup_id", conn.executed)
+        self.assertIn("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_odgovor_komentar_id ON odgovor (komentar_id)", conn.executed)
+        self.assertFalse(any("idx_komentar_skup_id" in sql for sql in conn.executed[1:]))
+        # CONCURRENTLY ne smije biti u transakciji
+        self.assertTrue(all(conn.autocommit_during[1:]))
+        self.assertFalse(conn.autocommit)
+
+    def test_nothing_to_build(self):
+        conn = FakeConnection([(name, True) for name, _ in INDEXES])
+        self.assertEqual(create_indexes(conn), [])
+        self.assertEqual(len(conn.executed), 1)
+
+class TestRefreshStats(unittest.TestCase):
+    def refreshed_ids(self, conn):
+        ids = [params["ids"] for params in conn.params if params and "ids" in params]
+        self.assertEqual(len(ids), len(STATS_SKUP_REFRESH))
+        return sorted(ids[0])
+
+    def test_touched_and_answered_datasets(self):
+        conn = FakeConnection((True,), [("answered",)])
+        self.assertEqual(refresh_stats(conn, {"touched-a", "touched-b"}), 3)
+        self.assertEqual(self.refreshed_ids(conn), ["answered", "touched-a", "touched-b"])
+        # Globalni agregati citaju samo redove po skupu
+        global_sql = conn.executed[-len(STATS_GLOBAL_REFRESH):]
+        self.assertFalse(any("FROM komentar" in sql or "FROM odgovor" in sql for sql in global_sql))
+        self.assertEqual(conn.commits, 1)
+
+    def test_empty_rollups_refresh_everything(self):
+        conn = FakeConnection((False,), [("a",), ("b",)])
+        self.assertEqual(refresh_stats(conn, {"a"}), 2)
+        self.assertEqual(self.refreshed_ids(conn), ["a", "b"])
+
+    def test_stale_covers_new_and_deleted_rows(self):
+        conn = FakeConnection((True,), [("commented",), ("deleted",)])
+        self.assertEqual(refresh_stats(conn, set()), 2)
+        self.assertEqual(conn.executed[1], " ".join(STATS_STALE.split()))
+        self.assertEqual(self.refreshed_ids(conn), ["commented", "deleted"])
+
+        stale = conn.executed[1]
+        # Novi skupovi, komentari (i iz backenda, bez odgovora) i novi ili ponovno analizirani odgovori
+        self.assertIn("WHERE NOT EXISTS (SELECT 1 FROM stats_skup st WHERE st.skup_id = s.id)", stale)
+        self.assertIn("HAVING COUNT(*) <> st.komentar_count OR MAX(k.created) > st.refreshed_at", stale)
+        self.assertIn("HAVING COUNT(*) <> st.odgovor_count OR MAX(COALESCE(o.updated_at, o.created)) > st.refreshed_at", stale)
+        # Skup kojem su obrisani svi komentari ili odgovori
+        self.assertIn("WHERE st.komentar_count > 0 AND NOT EXISTS (SELECT 1 FROM komentar k WHERE k.skup_id = st.skup_id)", stale)
+        self.assertIn("WHERE st.odgovor_count > 0 AND NOT EXISTS", stale)
+
+    def test_refresh_is_serialized_with_backend(self):
+        conn = FakeConnection((True,), [])
+        refresh_stats(conn, {"a"})
+        lock = conn.executed.index(STATS_LOCK)
+        self.assertLess(lock, conn.executed.index(" ".join(STATS_SKUP_REFRESH[0].split())))
+
+    def test_database_functions_run_the_same_refresh(self):
+        version, _, sql = MIGRATIONS[-1]
+        self.assertEqual(version, 7)
+        sql = " ".join(sql.split())
+        self.assertIn("CREATE OR REPLACE FUNCTION stats_refresh(skup_ids TEXT[])", sql)
+        self.assertIn("BEGIN PERFORM pg_advisory_xact_lock(hashtext('stats_refresh'));", sql)
+        for statement in STATS_SKUP_REFRESH + STATS_GLOBAL_REFRESH:
+            self.assertIn(" ".join(statement.replace("%(ids)s", "skup_ids").split()) + ";", sql)
+        self.assertNotIn("%(ids)s", sql)
+        self.assertIn(f"RETURN stats_refresh(ARRAY( {' '.join(STATS_STALE.split())} ));", sql)
+        # updated_at prati izmjene odgovora na mjestu
+        self.assertIn("CREATE TRIGGER odgovor_updated_at BEFORE UPDATE ON odgovor FOR EACH ROW EXECUTE FUNCTION odgovor_updated_at();", sql)
+
+    def test_stats_command_refreshes_only_stale(self):
+        conn = FakeConnection((True,), [("stale",)])
+        with mock.patch.object(createAndLoadDb, "get_connection", return_value=conn), \
+                mock.patch.object(createAndLoadDb, "create_postgres_tables"), \
+                contextlib.redirect_stdout(io.StringIO()):
+            createAndLoadDb.update_stats(Namespace(all=False))
+        self.assertEqual(self.refreshed_ids(conn), ["stale"])
+
+class TestUrlChecks(unittest.TestCase):
+    def test_stale_urls_window_and_limit(self):
+        conn = FakeConnection([("https://example.org/a.csv",), ("https://example.org/b.csv",)])
+        self.assertEqual(createAndLoadDb.load_stale_urls(conn, 48, 10), ["https://example.org/a.csv", "https://example.org/b.csv"])
+        sql, = conn.executed
+        self.assertEqual(conn.params, [(48, 10)])
+        self.assertIn("WHERE url IS NOT NULL AND url <> '' GROUP BY url", sql)
+        # Nikad provjereni URL-ovi prvi, zatim najstarije provjere
+        self.assertIn("HAVING MAX(url_checked_at) IS NULL OR MAX(url_checked_at) < now() - %s * interval '1 hour'", sql)
+        self.assertIn("ORDER BY MAX(url_checked_at) NULLS FIRST, url LIMIT %s", sql)
+
+    def test_no_limit(self):
+        conn = FakeConnection([])
+        self.assertEqual(createAndLoadDb.load_stale_urls(conn, 24), [])
+        self.assertEqual(conn.params, [(24, None)])
+
+    def test_store_writes_one_row_per_url(self):
+        checked_at = datetime(2024, 1, 2, 3, 4, 5)
+        results = {
+            "https://example.org/a.csv": {"status": 200, "ok": True, "latency_ms": 35, "error": None, "checked_at": checked_at},
+            "https://example.org/b.csv": {"status": None, "ok": False, "latency_ms": 10000, "error": "timeout", "checked_at": checked_at},
+        }
+        conn = FakeConnection()
+        with mock.patch.object(createAndLoadDb, "execute_values", conn.execute_values):
+            createAndLoadDb.store_url_checks(conn, results)
+
+        sql, = conn.executed
+        self.assertTrue(sql.startswith("UPDATE resurs AS r SET url_status = v.status, url_ok = v.ok, url_latency_ms = v.latency_ms, url_error = v.error, url_checked_at = v.checked_at"))
+        self.assertTrue(sql.endswith("FROM (VALUES %s) AS v (url, status, ok, latency_ms, error, checked_at) WHERE r.url = v.url"))
+        self.assertEqual(conn.params, [[
+            ("https://example.org/a.csv", 200, True, 35, None, checked_at),
+            ("https://example.org/b.csv", None, False, 10000, "timeout", checked_at),
+        ]])
+        # Tipovi u predlosku, inace su NULL vrijednosti u VALUES tipa text
+        self.assertEqual(conn.templates, ["(%s, %s::int, %s::boolean, %s::int, %s::text, %s::timestamp)"])
+        self.assertEqual(conn.commits, 1)
+
+    def test_store_nothing(self):
+        conn = FakeConnection()
+        createAndLoadDb.store_url_checks(conn, {})
+        self.assertEqual((conn.executed, conn.commits), ([], 0))
+
+class TestRefreshDatasets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stale = [(f"id-{name}", f"https://data.gov.hr/ckan/dataset/{name}") for name in ("a", "gone", "b", "c")]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def refresh(self, results, batch_size=100, ckan_workers=4):
+        conn = FakeConnection(self.stale)
+        conn.rowcount = 1
+        fetched = []
+
+        def fetch_packages_by_id(ids, **kwargs):
+            fetched.append(ids)
+            return {dataset_id: results[dataset_id] for dataset_id in ids}
+
+        args = Namespace(max_age=24, limit=None, batch_size=batch_size, ckan_workers=ckan_workers, ckan_url="http://ckan",
+                         report=os.path.join(self.tmp.name, "refresh_report.json"))
+        with mock.patch.object(createAndLoadDb, "get_connection", return_value=conn), \
+                mock.patch.object(createAndLoadDb, "create_postgres_tables"), \
+                mock.patch.object(createAndLoadDb, "execute_values", conn.execute_values), \
+                mock.patch.object(createAndLoadDb, "fetch_packages_by_id", fetch_packages_by_id), \
+                mock.patch.object(createAndLoadDb, "refresh_stats") as refresh_stats, \
+                contextlib.redirect_stdout(io.StringIO()):
+            createAndLoadDb.refresh_datasets(args)
+        with open(args.report, encoding="utf-8") as f:
+            counters = json.load(f)["counters"]
+        return conn, fetched, refresh_stats, counters
+
+    def statements(self, conn, prefix):
+        return [(sql, params) for sql, params in zip(conn.executed, conn.params) if sql.startswith(prefix)]
+
+    def test_found_missing_and_failed_datasets(self):
+        failure = requests.ConnectionError("batch failed")
+        results = {
+            "id-a": make_package("a"),
+            "id-gone": PackageNotFound("id-gone not returned by package_search"),
+            "id-b": failure,
+            "id-c": failure,
+        }
+        conn, fetched, refresh_stats, counters = self.refresh(results)
+
+        self.assertEqual(conn.params[0], (24, None))
+        self.assertEqual(fetched, [[dataset_id for dataset_id, _ in self.stale]])
+        # Nestali skup se samo oznaci kao dohvacen, a skupovi iz neuspjele serije ostaju na redu
+        touches = self.statements(conn, "UPDATE skup_podataka SET fetched_at = now()")
+        self.assertEqual([params for _, params in touches], [(["id-gone"],), (["id-a"],)])
+        (skup_sql, skup_rows), = self.statements(conn, "INSERT INTO skup_podataka")
+        self.assertTrue(skup_sql.endswith(" ".join(SKUP_UPSERT.split()) + " RETURNING id"))
+        self.assertEqual([row.id for row in skup_rows], ["id-a"])
+        self.assertEqual(skup_rows[0].url, "https://data.gov.hr/ckan/dataset/a")
+        (_, resurs_rows), = self.statements(conn, "INSERT INTO resurs")
+        (_, delete_params), = self.statements(conn, "DELETE FROM resurs")
+        self.assertEqual(delete_params[0], ["id-a"])
+        self.assertEqual(sorted(delete_params[1]), sorted(row.id for row in resurs_rows))
+        self.assertFalse(any(params and "id-b" in str(params) for params in conn.params[1:]))
+
+        self.assertEqual(refresh_stats.call_args[0][1], ["id-a"])
+        self.assertEqual(counters["datasets_failed"], 2)
+        self.assertEqual(counters["datasets_missing"], 1)
+        self.assertEqual(counters["datasets_written"], 1)
+        self.assertEqual(counters["datasets_refreshed"], 1)
+
+    def test_rounds_of_workers_times_batch_size(self):
+        results = {dataset_id: make_package(dataset_id[3:]) for dataset_id, _ in self.stale}
+        conn, fetched, refresh_stats, counters = self.refresh(results, batch_size=1, ckan_workers=3)
+
+        self.assertEqual(fetched, [["id-a", "id-gone", "id-b"], ["id-c"]])
+        self.assertEqual(len(self.statements(conn, "INSERT INTO skup_podataka")), 2)
+        self.assertEqual(sorted(self.statements(conn, "UPDATE skup_podataka SET fetched_at = now()")[0][1][0]), ["id-a", "id-b", "id-gone"])
+        self.assertEqual(sorted(refresh_stats.call_args[0][1]), sorted(results))
+        self.assertEqual(counters["datasets_refreshed"], 4)
+        self.assertNotIn("datasets_missing", counters)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import csv, os, sys, tempfile, unittest
+from argparse import Namespace
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+import createCsv
+
+try:
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+class TestCreateCsv(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("in")
+        # Isti seed = isti blobovi i skupovi u oba backupa, razliciti postid-ovi
+        self.backups = [
+            write_mbz(f"in/b{i}.mbz", posts=40, files=8, link_density=0.5, datasets=6, seed=5, start_id=i * 1000)
+            for i in (1, 2)
+        ]
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_main(self, workers, fmt="csv"):
+        with redirect_stdout(StringIO()):
+            createCsv.main(Namespace(input="in", workers=workers, copy_workers=2, format=fmt))
+        tables = {}
+        for name in createCsv.CsvExport.TABLES:
+            with open(os.path.join("csv_output", f"{name}.csv"), newline="", encoding="utf-8") as f:
+                tables[name] = list(csv.DictReader(f))
+        return tables
+
+    def test_rows_of_every_backup_deduplicated(self):
+        tables = self.run_main(workers=1)
+        ids = {int(row["id"]) for row in tables["analize"]}
+        self.assertTrue(any(1000 <= i < 2000 for i in ids) and any(i >= 2000 for i in ids))
+        self.assertEqual({int(row["analiza_id"]) for row in tables["analize_skup"]}, ids)
+
+        urls = [row["url"] for row in tables["skup"]]
+        self.assertEqual(len(urls), len(set(urls)))
+        hashes = [row["content_hash"] for row in tables["slike"]]
+        self.assertEqual(len(hashes), len(set(hashes)))
+        self.assertTrue(hashes)
+        self.assertLessEqual(set(os.listdir("all_files")), set(self.backups[0]["blobs"]))
+
+    def test_parallel_matches_serial(self):
+        serial = self.run_main(workers=1)
+        parallel = self.run_main(workers=2)
+        self.assertEqual(serial, parallel)
+
+    @unittest.skipUnless(pyarrow, "pyarrow not installed")
+    def test_columnar_formats_match_csv(self):
+        tables = self.run_main(workers=1)
+        self.run_main(workers=1, fmt="parquet")
+        self.run_main(workers=1, fmt="arrow")
+        for name, rows in tables.items():
+            parquet = pyarrow.parquet.read_table(os.path.join("csv_output", f"{name}.parquet"))
+            with pyarrow.ipc.open_file(os.path.join("csv_output", f"{name}.arrow")) as reader:
+                arrow = reader.read_all()
+            self.assertEqual(parquet, arrow)
+            self.assertEqual(parquet.num_rows, len(rows))
+            self.assertEqual(parquet.column_names, [column for column, _ in createCsv.TableExport.TABLES[name]])
+
+        analize = pyarrow.parquet.read_table(os.path.join("csv_output", "analize.parquet"), columns=["id", "created"])
+        self.assertEqual(analize.column("id").to_pylist(), [int(row["id"]) for row in tables["analize"]])
+        self.assertEqual(str(analize.schema.field("created").type), "timestamp[ms]")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import contextlib, io, json, os, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from moodleBackup import MoodleBackup
+
+# extractMoodle pri importu stvara ./forum_export, pa ga uvozimo iz privremenog direktorija
+_import_dir = tempfile.TemporaryDirectory()
+_cwd = os.getcwd()
+os.chdir(_import_dir.name)
+try:
+    import extractMoodle
+    from PIL import Image
+finally:
+    os.chdir(_cwd)
+
+class CountingBackup:
+    """MoodleBackup wrapper that records which blobs were requested."""
+
+    def __init__(self, backup):
+        self.backup = backup
+        self.requested = []
+
+    def has_blob(self, contenthash):
+        return self.backup.has_blob(contenthash)
+
+    def iter_blobs(self, contenthashes):
+        contenthashes = list(contenthashes)
+        self.requested.extend(contenthashes)
+        return self.backup.iter_blobs(contenthashes)
+
+class TestSniffImageExtension(unittest.TestCase):
+    def test_matches_pil(self):
+        for fmt in ("PNG", "JPEG", "GIF", "BMP", "WEBP", "TIFF", "ICO"):
+            buffer = io.BytesIO()
+            Image.new("RGB", (16, 16), (200, 10, 10)).save(buffer, format=fmt)
+            buffer.seek(0)
+            expected = extractMoodle.detect_image_extension(buffer)
+            self.assertEqual(extractMoodle.sniff_image_extension(buffer.getvalue()[:extractMoodle.SNIFF_BYTES]), expected, fmt)
+
+    def test_non_images(self):
+        for header in (b"%PDF-1.4\n", b"BM not a bitmap", b"", b"<svg xmlns="):
+            self.assertIsNone(extractMoodle.sniff_image_extension(header))
+
+class TestReplaceImages(unittest.TestCase):
+    FILES_MAP = {"7": {"slika 1.png": "../images/a.png", "graf&tablica.png": "../images/b.png", "x.png": "../images/c.png"}}
+
+    def test_rewrites_all_encodings_in_one_pass(self):
+        message = (
+            '<img src="@@PLUGINFILE@@/slika%201.png"><img src=\'@@PLUGINFILE@@/graf&amp;tablica.png\'>'
+            '<a href="@@PLUGINFILE@@/x.png?time=123">@@PLUGINFILE@@/x.png</a>'
+        )
+        self.assertEqual(
+            extractMoodle.replace_images(message, "7", self.FILES_MAP),
+            '<img src="../images/a.png"><img src=\'../images/b.png\'>'
+            '<a href="../images/c.png?time=123">../images/c.png</a>',
+        )
+
+    def test_names_with_reference_delimiters(self):
+        files_map = {"7": {
+            "slika (1).png": "../images/a.png", "Ana's graf.png": "../images/b.png",
+            "slika": "../images/c.png", "plan 2024.jpg": "../images/d.png",
+        }}
+        message = (
+            '<img src="@@PLUGINFILE@@/slika (1).png"><img src="@@PLUGINFILE@@/Ana\'s graf.png">'
+            '<img src="@@PLUGINFILE@@/Ana&#x27;s graf.png"><img src="@@PLUGINFILE@@/slika%20%281%29.png">'
+            '<img src="@@PLUGINFILE@@/plan 2024.jpg?time=1"><img src="@@PLUGINFILE@@/slika">'
+        )
+        self.assertEqual(
+            extractMoodle.replace_images(message, "7", files_map),
+            '<img src="../images/a.png"><img src="../images/b.png">'
+            '<img src="../images/b.png"><img src="../images/a.png">'
+            '<img src="../images/d.png?time=1"><img src="../images/c.png">',
+        )
+
+    def test_reports_unresolved(self):
+        unresolved = []
+        message = '<img src="@@PLUGINFILE@@/x.png"><a href="@@PLUGINFILE@@/dokument.pdf">d</a>'
+        self.assertEqual(
+            extractMoodle.replace_images(message, "7", self.FILES_MAP, unresolved),
+            '<img src="../images/c.png"><a href="@@PLUGINFILE@@/dokument.pdf">d</a>',
+        )
+        extractMoodle.replace_images('<img src="@@PLUGINFILE@@/x.png">', "8", self.FILES_MAP, unresolved)
+        self.assertEqual(unresolved, [("7", "dokument.pdf"), ("8", "x.png")])
+
+    def test_without_references(self):
+        self.assertIsNone(extractMoodle.replace_images(None, "7", self.FILES_MAP))
+        self.assertEqual(extractMoodle.replace_images("<p>x</p>", "7", self.FILES_MAP), "<p>x</p>")
+
+class TestLoadFilesMapping(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.saved = (extractMoodle.HTML_DIR, extractMoodle.IMAGES_DIR, extractMoodle.IMAGE_TYPES_CACHE)
+        extractMoodle.HTML_DIR = root / "html"
+        extractMoodle.IMAGES_DIR = root / "images"
+        extractMoodle.IMAGE_TYPES_CACHE = root / "image_types.json"
+        extractMoodle.HTML_DIR.mkdir()
+        extractMoodle.IMAGES_DIR.mkdir()
+        self.mbz = str(root / "a.mbz")
+        self.generated = write_mbz(self.mbz, posts=40, files=20, image_ratio=0.6, seed=4)
+
+    def tearDown(self):
+        extractMoodle.HTML_DIR, extractMoodle.IMAGES_DIR, extractMoodle.IMAGE_TYPES_CACHE = self.saved
+        self.tmp.cleanup()
+
+    def load(self):
+        with MoodleBackup(self.mbz) as mbz:
+            backup = CountingBackup(mbz)
+            return extractMoodle.load_files_mapping(mbz.files_xml(), backup), backup.requested
+
+    def test_second_run_reads_no_blobs(self):
+        first, requested = self.load()
+        self.assertEqual(set(requested), set(self.generated["blobs"]))
+        images = sorted(os.listdir(extractMoodle.IMAGES_DIR))
+        self.assertTrue(images)
+        self.assertTrue(all(name.endswith(".png") for name in images))
+
+        second, requested = self.load()
+        self.assertEqual(second, first)
+        self.assertEqual(requested, [])
+
+    def test_missing_image_is_exported_again(self):
+        first, _ = self.load()
+        removed = sorted(os.listdir(extractMoodle.IMAGES_DIR))[0]
+        os.remove(extractMoodle.IMAGES_DIR / removed)
+
+        second, requested = self.load()
+        self.assertEqual(second, first)
+        self.assertEqual(requested, [removed.split(".")[0]])
+        self.assertTrue((extractMoodle.IMAGES_DIR / removed).exists())
+
+class TestGenerateForumPages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = extractMoodle.HTML_DIR
+        extractMoodle.HTML_DIR = Path(self.tmp.name)
+
+    def tearDown(self):
+        extractMoodle.HTML_DIR = self.saved
+        self.tmp.cleanup()
+
+    def posts(self, n):
+        return ({"postid": str(i), "userid": "2", "created": "01.01.2024. 10:00:00", "subject": f"Tema {i}", "message": f"<p>{i}</p>"}
+                for i in range(n))
+
+    def render(self, n, workers=1):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            extractMoodle.generate_forum_pages(self.posts(n), workers)
+        with open(extractMoodle.HTML_DIR / "manifest.json", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest, [line.split("/")[-1] for line in out.getvalue().splitlines() if line.startswith("Generated")]
+
+    def test_matches_list_rendering(self):
+        posts = list(self.posts(120))
+        self.render(120)
+        for page_num in (1, 2, 3):
+            start = (page_num - 1) * extractMoodle.DISCUSSIONS_PER_PAGE
+            expected = extractMoodle.generate_html_page(posts[start:start + extractMoodle.DISCUSSIONS_PER_PAGE], page_num, 3)
+            self.assertEqual((extractMoodle.HTML_DIR / f"page{page_num}.html").read_text(encoding="utf-8"), expected)
+
+    def test_only_changed_pages_are_written(self):
+        manifest, written = self.render(120)
+        self.assertEqual(written, ["page1.html", "page2.html", "page3.html"])
+
+        self.assertEqual(self.render(120), (manifest, []))
+
+        # Nova stranica mijenja i Next poveznicu na dotad zadnjoj
+        manifest, written = self.render(160)
+        self.assertEqual(written, ["page3.html", "page4.html"])
+
+        manifest, written = self.render(60)
+        self.assertEqual(sorted(manifest), ["page1.html", "page2.html"])
+        self.assertFalse((extractMoodle.HTML_DIR / "page4.html").exists())
+
+    def test_parallel_matches_serial(self):
+        serial, _ = self.render(330)
+        os.remove(extractMoodle.HTML_DIR / "manifest.json")
+        parallel, written = self.render(330, workers=3)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(written), 7)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import os, sys, tempfile, unittest
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from moodleBackup import MoodleBackup, iter_posts
+from ckanClient import DATASET_URL_RE
+
+class TestGenerateMbz(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "synthetic.mbz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backup_is_readable(self):
+        backup = write_mbz(self.path, discussions=7, posts=60, files=15, link_density=0.5, datasets=5, seed=3)
+        with MoodleBackup(self.path) as mbz:
+            posts = [(post.get("id"), post.findtext("message")) for post in iter_posts(mbz.forum_xml())]
+            files = ET.parse(mbz.files_xml()).getroot().findall(".//file")
+            blobs = dict(mbz.iter_blobs(backup["blobs"]))
+
+        self.assertEqual(len(posts), 60)
+        self.assertEqual(len(files), 30)
+        self.assertEqual(set(blobs), set(backup["blobs"]))
+        linked = {DATASET_URL_RE.search(message).group(2) for _, message in posts if DATASET_URL_RE.search(message)}
+        self.assertEqual(linked, set(backup["datasets"]))
+
+    def test_same_seed_same_content(self):
+        first = write_mbz(self.path, posts=20, files=5, seed=1)
+        second = write_mbz(self.path, posts=20, files=5, seed=1)
+        self.assertEqual(first, second)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import html, json, os, random, re, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from htmlSanitizer import clean, sanitize_message
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sanitizer_golden.json")
+
+def reference_clean(text):
+    # Originalni clean() iz createAndLoadDb.py
+    if not text:
+        return ""
+    replacements = {
+        "\u2013": "-", "\u2014": "-",
+        "\u2212": "-", "\u2018": "'",
+        "\u2019": "'", "\u201C": '"',
+        "\u201D": '"', "\u2026": "...",
+        "\u00A0": " ", "\u200B": "",
+    }
+    for bad, good in replacements.items():
+        text = text.replace(bad, good)
+    text = ''.join(c for c in text if c.isprintable())
+    text = re.sub(r'[\u2000-\u200F\u202A-\u202F\u205F\u3000]', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def reference_sanitize(message):
+    # Originalno ciscenje poruke u extract_data (BeautifulSoup)
+    soup = BeautifulSoup(html.unescape(message), features="html.parser")
+    for tag in soup(["script", "style", "noscript", "img"]):
+        tag.decompose()
+    for elem in soup.find_all(string=True):
+        elem.replace_with(reference_clean(elem))
+    for tag in soup.find_all():
+        tag.attrs = {}
+    return str(soup)
+
+FRAGMENTS = [
+    "<p>", "</p>", "<b>", "</b>", "<br>", "</br>", "<br/>", "<img src=x>", "<img/>", "<script>a<b</script>",
+    "<style>p{}</style>", "<noscript>", "</noscript>", "<div class='a'>", "</div>", "<p/>", "<!-- c -->",
+    "<!DOCTYPE html>", "<![CDATA[x]]>", "<?pi x?>", "&amp;", "&amp;amp;", "&amp;foo;", "&amp;#150;",
+    "&amp;#x80;", "&nbsp;", "&#8211;", " ", "\n", "\t", "\u00A0", "\u200B", "\u2026", "\u3000",
+    "\U0001F600", "\U000E0001", "a", "ž", "<", "&", ">", "</x>", "<ul><li>", "</li>", "<pre> x </pre>",
+    "<a href=\"https://data.gov.hr\">", "</a>", "<hr>", "&lt;b&gt;", "<textarea>", "</textarea>", "<p",
+    "<P class=\"a\">", "<a href=x/>", "<br />", "</DIV >", "<div\tid='q'>", "<p\u00A0x>", "a & b", "&",
+]
+
+class TestClean(unittest.TestCase):
+    def test_matches_reference(self):
+        rng = random.Random(8)
+        for _ in range(2000):
+            text = "".join(chr(rng.choice((rng.randint(0, 0x3000), rng.randint(0, 0x10FFFF)))) for _ in range(16))
+            self.assertEqual(clean(text), reference_clean(text), repr(text))
+
+    def test_empty(self):
+        self.assertEqual(clean(None), "")
+        self.assertEqual(clean(""), "")
+
+class TestSanitizeMessage(unittest.TestCase):
+    def test_golden_corpus(self):
+        with open(GOLDEN, encoding="utf-8") as f:
+            golden = json.load(f)
+        for case in golden:
+            self.assertEqual(sanitize_message(case["message"]), case["expected"], repr(case["message"]))
+
+    @unittest.skipUnless(BeautifulSoup, "bs4 is not installed")
+    def test_matches_beautifulsoup(self):
+        rng = random.Random(8)
+        for _ in range(1000):
+            message = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 25)))
+            self.assertEqual(sanitize_message(message), reference_sanitize(message), repr(message))
+
+if __name__ == "__main__":
+    unittest.main()
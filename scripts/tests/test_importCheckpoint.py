@@ -0,0 +1,131 @@
+import contextlib, io, os, sys, tempfile, unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from fakeCkan import FakeCkan, make_package
+from importCheckpoint import ImportCheckpoint
+from moodleBackup import fingerprint
+import createAndLoadDb
+
+class TestImportCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "checkpoint.sqlite")
+        self.backups = []
+        for i in (1, 2, 3):
+            path = os.path.join(self.tmp.name, f"b{i}.mbz")
+            write_mbz(path, posts=30, discussions=3, files=6, link_density=0.5, datasets=4, seed=i, start_id=i * 1000)
+            self.backups.append(path)
+        self.fingerprints = {path: fingerprint(path) for path in self.backups}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def parse(self, checkpoint):
+        parsed = ({}, {}, [], [])
+        with contextlib.redirect_stdout(io.StringIO()):
+            createAndLoadDb.parse_checkpointed(self.backups, self.fingerprints, frozenset(), 1, checkpoint, *parsed)
+        return parsed
+
+    def test_resume_reuses_parsed_backups(self):
+        checkpoint = ImportCheckpoint(self.path, self.fingerprints.values())
+        original = createAndLoadDb.parse_backup
+        calls = []
+
+        def failing_parse(mbz_path, skip_posts=frozenset()):
+            calls.append(mbz_path)
+            if len(calls) == 3:
+                raise OSError("corrupted archive")
+            return original(mbz_path, skip_posts)
+
+        with mock.patch.object(createAndLoadDb, "parse_backup", failing_parse):
+            with self.assertRaises(OSError):
+                self.parse(checkpoint)
+        checkpoint.close()
+
+        calls.clear()
+        checkpoint = ImportCheckpoint(self.path, self.fingerprints.values())
+        self.assertEqual(len(checkpoint.backups()), 2)
+        with mock.patch.object(createAndLoadDb, "parse_backup", failing_parse):
+            resumed = self.parse(checkpoint)
+        checkpoint.close()
+        self.assertEqual(calls, [self.backups[2]])
+
+        expected = ({}, {}, [], [])
+        for path in self.backups:
+            createAndLoadDb.merge_backup(createAndLoadDb.parse_backup(path), *expected)
+        self.assertEqual(resumed, expected)
+
+    def test_other_backups_start_over(self):
+        checkpoint = ImportCheckpoint(self.path, self.fingerprints.values())
+        checkpoint.save_datasets({"skup": {"id": "id-skup"}})
+        checkpoint.rows_committed("komentar", 10)
+        checkpoint.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            checkpoint = ImportCheckpoint(self.path, ["other"])
+        self.assertEqual(checkpoint.datasets(["skup"]), {})
+        self.assertEqual(checkpoint.rows_loaded("komentar"), 0)
+        checkpoint.finish()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_resolved_datasets_are_not_refetched(self):
+        packages = {f"skup-{i}": make_package(f"skup-{i}") for i in range(5)}
+        links = {identifier: f"https://data.gov.hr/ckan/dataset/{identifier}" for identifier in list(packages) + ["missing"]}
+
+        def resolve(ckan):
+            checkpoint = ImportCheckpoint(self.path, self.fingerprints.values())
+            datasets, resources, publishers = {}, [], {}
+            with contextlib.redirect_stdout(io.StringIO()):
+                createAndLoadDb.resolve_datasets(links, datasets, resources, publishers, ckan_url=ckan.url, workers=2, checkpoint=checkpoint)
+            checkpoint.close()
+            return datasets, resources, publishers
+
+        with FakeCkan(packages) as ckan:
+            first = resolve(ckan)
+            requests = sum(ckan.requests.values())
+            second = resolve(ckan)
+        self.assertEqual(requests, len(links))
+        self.assertEqual(sum(ckan.requests.values()), requests)
+        self.assertEqual(set(second[0]), set(packages))
+        self.assertEqual([v.content_hash for v in second[0].values()], [v.content_hash for v in first[0].values()])
+        self.assertEqual(second[1:], first[1:])
+
+    def test_load_resumes_after_committed_batches(self):
+        datasets, resources, publishers = {}, [], {}
+        for i in range(7):
+            createAndLoadDb.add_dataset(f"skup-{i}", None, make_package(f"skup-{i}", resources=3), datasets, resources, publishers)
+        tables = createAndLoadDb.load_tables(publishers, datasets, resources, [], [])
+        loaded = []
+        fail = [True]
+
+        def load_batch(conn, table, rows, loader, report):
+            # Prvo pokretanje pada na drugoj seriji resursa
+            if fail[0] and table == "resurs" and len(loaded) == 4:
+                fail[0] = False
+                raise OSError("connection lost")
+            loaded.append((table, [row.id for row in rows]))
+
+        checkpoint = ImportCheckpoint(self.path, self.fingerprints.values())
+        with mock.patch.object(createAndLoadDb, "load_batch", load_batch):
+            with self.assertRaises(OSError):
+                createAndLoadDb.load_checkpointed(None, checkpoint, tables, batch_rows=5)
+            first_run = list(loaded)
+            with contextlib.redirect_stdout(io.StringIO()):
+                skipped = createAndLoadDb.load_checkpointed(None, checkpoint, tables, batch_rows=5)
+        checkpoint.close()
+
+        self.assertEqual(skipped, 1 + 7 + 5)
+        self.assertEqual(loaded[len(first_run)][0], "resurs")
+        ids = {}
+        for table, batch in loaded:
+            ids.setdefault(table, []).extend(batch)
+        self.assertEqual(ids["izdavac"], sorted(publishers))
+        self.assertEqual(ids["skup_podataka"], sorted(v.id for v in datasets.values()))
+        self.assertEqual(ids["resurs"], sorted(r.id for r in resources))
+
+if __name__ == "__main__":
+    unittest.main()
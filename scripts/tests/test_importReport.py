@@ -0,0 +1,66 @@
+import json, os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from importReport import ImportReport, latency_histogram
+from generateMbz import write_mbz
+from createAndLoadDb import parse_backup, merge_backup, process_single_backup
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets_and_percentiles(self):
+        summary = latency_histogram([0.005, 0.02, 0.02, 0.3, 7.0])
+        self.assertEqual(summary["requests"], 5)
+        self.assertEqual(summary["buckets_ms"]["<=10"], 1)
+        self.assertEqual(summary["buckets_ms"]["<=25"], 2)
+        self.assertEqual(summary["buckets_ms"]["<=500"], 1)
+        self.assertEqual(summary["buckets_ms"][">5000"], 1)
+        self.assertEqual(summary["p50_ms"], 20.0)
+        self.assertEqual(summary["max_ms"], 7000.0)
+
+    def test_empty(self):
+        self.assertIsNone(latency_histogram([])["p95_ms"])
+
+class TestImportReport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mbz = os.path.join(self.tmp.name, "a.mbz")
+        write_mbz(self.mbz, posts=30, files=6, seed=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_worker_report_matches_serial(self):
+        serial = ImportReport()
+        process_single_backup(self.mbz, {}, {}, [], [], report=serial)
+
+        merged = ImportReport()
+        merge_backup(parse_backup(self.mbz), {}, {}, [], [], merged)
+
+        self.assertEqual(serial.counters, merged.counters)
+        self.assertEqual(set(serial.stages), set(merged.stages))
+        self.assertEqual(serial.counters["posts_parsed"], 30)
+        self.assertEqual(serial.stages["sanitize_message"]["calls"], 30)
+        self.assertEqual(merged.backups[0]["file"], "a.mbz")
+
+    def test_write(self):
+        report = ImportReport()
+        with report.stage("x"):
+            pass
+        with report.stage("x"):
+            pass
+        report.count("posts", 3)
+        report.set_cache(3, 1)
+        report.latencies.extend([0.01, 0.02])
+        path = os.path.join(self.tmp.name, "report.json")
+        report.write(path, {"loader": "copy"})
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["stages"]["x"]["calls"], 2)
+        self.assertEqual(data["counters"], {"posts": 3})
+        self.assertEqual(data["cache"]["hit_rate"], 0.75)
+        self.assertEqual(data["http"]["requests"], 2)
+        self.assertEqual(data["loader"], "copy")
+
+if __name__ == "__main__":
+    unittest.main()
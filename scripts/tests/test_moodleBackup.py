@@ -0,0 +1,109 @@
+import io, os, sys, tarfile, tempfile, unittest
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from moodleBackup import MoodleBackup, iter_posts
+
+FORUM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<activity id="1" modulename="forum">
+  <forum id="1">
+    <post id="999"><subject>Nije u diskusiji</subject></post>
+    <discussions>
+      <discussion id="1">
+        <name>Prva</name>
+        <posts>
+          <post id="101"><userid>1</userid><created>1700000000</created><subject>A</subject><message><![CDATA[<p>https://data.gov.hr/ckan/dataset/abc</p>]]></message></post>
+          <post id="102"><userid>2</userid><created>1700000100</created><subject>B</subject><message>&lt;b&gt;x&lt;/b&gt;</message></post>
+        </posts>
+      </discussion>
+      <discussion id="2">
+        <posts>
+          <post id="201"><userid>3</userid><created>1700000200</created><subject>C</subject><message></message></post>
+        </posts>
+      </discussion>
+    </discussions>
+  </forum>
+</activity>
+"""
+
+class TestIterPosts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "forum.xml")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(FORUM_XML)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_tree_walk(self):
+        root = ET.parse(self.path).getroot()
+        expected = [
+            (p.get("id"), p.findtext("userid"), p.findtext("created"), p.findtext("subject"), p.findtext("message"))
+            for d in root.findall(".//discussion") for p in d.findall(".//post")
+        ]
+        streamed = [
+            (p.get("id"), p.findtext("userid"), p.findtext("created"), p.findtext("subject"), p.findtext("message"))
+            for p in iter_posts(self.path)
+        ]
+        self.assertEqual(streamed, expected)
+
+    def test_posts_are_cleared(self):
+        posts = []
+        for post in iter_posts(self.path):
+            posts.append(post)
+        self.assertEqual(len(posts), 3)
+        for post in posts:
+            self.assertEqual(len(post), 0)
+            self.assertIsNone(post.get("id"))
+
+FILES_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<files>
+  <file id="1"><contenthash>aa11</contenthash><itemid>101</itemid><filename>slika.png</filename></file>
+  <file id="2"><contenthash>bb22</contenthash><itemid>102</itemid><filename>tablica.csv</filename></file>
+</files>
+"""
+
+def add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+class TestMoodleBackup(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "backup.mbz")
+        with tarfile.open(self.path, "w:gz") as tar:
+            add_member(tar, "files/bb/bb22", b"a;b\n")
+            add_member(tar, "moodle_backup.xml", b"<moodle_backup/>")
+            add_member(tar, "activities/page_7/page.xml", b"<activity/>")
+            add_member(tar, "./activities/forum_12/forum.xml", FORUM_XML.encode("utf-8"))
+            add_member(tar, "files/aa/aa11", b"\x89PNG")
+            add_member(tar, "files.xml", FILES_XML.encode("utf-8"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_xml_members(self):
+        with MoodleBackup(self.path) as backup:
+            self.assertEqual([p.get("id") for p in iter_posts(backup.forum_xml())], ["101", "102", "201"])
+            hashes = [f.findtext("contenthash") for f in ET.parse(backup.files_xml()).getroot().findall(".//file")]
+            self.assertEqual(hashes, ["aa11", "bb22"])
+
+    def test_iter_blobs_in_archive_order(self):
+        with MoodleBackup(self.path) as backup:
+            blobs = [(h, blob.read()) for h, blob in backup.iter_blobs(["aa11", "missing", "bb22", "aa11"])]
+            self.assertTrue(backup.has_blob("aa11"))
+            self.assertFalse(backup.has_blob("missing"))
+        self.assertEqual(blobs, [("bb22", b"a;b\n"), ("aa11", b"\x89PNG")])
+
+    def test_missing_forum(self):
+        path = os.path.join(self.tmp.name, "empty.mbz")
+        with tarfile.open(path, "w:gz") as tar:
+            add_member(tar, "files.xml", b"<files/>")
+        with MoodleBackup(path) as backup:
+            with self.assertRaises(FileNotFoundError):
+                backup.forum_xml()
+
+if __name__ == "__main__":
+    unittest.main()
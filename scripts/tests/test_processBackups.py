@@ -0,0 +1,103 @@
+import contextlib, io, os, sys, tempfile, unittest
+from argparse import Namespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from generateMbz import write_mbz
+from importReport import ImportReport
+from moodleBackup import MoodleBackup
+import createAndLoadDb
+import createCsv
+import processBackups
+
+class CountingBackup(MoodleBackup):
+    """MoodleBackup that counts how often forum.xml, files.xml and blobs are read."""
+
+    reads = None
+
+    def forum_xml(self):
+        CountingBackup.reads["forum_xml"] += 1
+        return super().forum_xml()
+
+    def files_xml(self):
+        CountingBackup.reads["files_xml"] += 1
+        return super().files_xml()
+
+    def iter_blobs(self, contenthashes):
+        CountingBackup.reads["iter_blobs"] += 1
+        return super().iter_blobs(contenthashes)
+
+def read_tree(folder):
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            with open(os.path.join(root, name), "rb") as f:
+                files[os.path.relpath(os.path.join(root, name), folder)] = f.read()
+    return files
+
+class TestProcessBackups(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        os.makedirs("in")
+        for i in (1, 2):
+            write_mbz(f"in/b{i}.mbz", posts=60, discussions=4, files=10, link_density=0.5, datasets=5, seed=i, start_id=i * 1000)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_in(self, folder, fn, *args):
+        os.makedirs(folder)
+        os.chdir(folder)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn(*args)
+            return read_tree(".")
+        finally:
+            os.chdir(self.tmp.name)
+
+    def test_one_pass_matches_separate_scripts(self):
+        single = os.path.abspath("in/b1.mbz")
+
+        def separate():
+            createCsv.main(Namespace(input=single, workers=1, copy_workers=2, format="csv"))
+            import extractMoodle
+            extractMoodle.HTML_DIR.mkdir(parents=True, exist_ok=True)
+            extractMoodle.IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+            extractMoodle.main(Namespace(input=single, workers=1))
+
+        def one_pass():
+            CountingBackup.reads = {"forum_xml": 0, "files_xml": 0, "iter_blobs": 0}
+            sinks = [processBackups.CsvSink("./csv_output", "./all_files", copy_workers=2), processBackups.HtmlSink()]
+            original = processBackups.MoodleBackup
+            processBackups.MoodleBackup = CountingBackup
+            try:
+                processBackups.process_backup(single, sinks)
+            finally:
+                processBackups.MoodleBackup = original
+            for sink in sinks:
+                sink.close()
+
+        expected = self.run_in("separate", separate)
+        actual = self.run_in("one_pass", one_pass)
+        self.assertEqual(actual, expected)
+        self.assertEqual(CountingBackup.reads, {"forum_xml": 1, "files_xml": 1, "iter_blobs": 1})
+
+    def test_db_sink_matches_parse_backup(self):
+        paths = [os.path.abspath(f"in/b{i}.mbz") for i in (1, 2)]
+        expected = ({}, {}, [], [])
+        for path in paths:
+            createAndLoadDb.merge_backup(createAndLoadDb.parse_backup(path), *expected)
+
+        sink = processBackups.DbSink(None, ImportReport(), mbz_files=paths)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in paths:
+                processBackups.process_backup(path, [sink])
+        self.assertEqual((sink.dataset_links, sink.post_datasets, sink.discussions, sink.files), expected)
+        self.assertEqual(sink.report.counters["posts_parsed"], len(expected[2]))
+        self.assertEqual(sink.backup_links, {path: set(createAndLoadDb.parse_backup(path)[0]) for path in paths})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json, os, re, sys, tempfile, unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from searchIndex import SearchIndex, normalize, shard_key, tokenize
+
+def read_js(path, callback):
+    content = Path(path).read_text(encoding="utf-8")
+    match = re.fullmatch(rf"{callback}\((.*)\);", content, re.S)
+    return json.loads(f"[{match.group(1)}]")
+
+class TestNormalization(unittest.TestCase):
+    def test_folds_croatian_diacritics(self):
+        self.assertEqual(normalize("ČAĆ Šuma Žuto Đurđevac"), "cac suma zuto durdevac")
+
+    def test_tokenize_drops_stopwords_and_short_terms(self):
+        self.assertEqual(tokenize("Što je s podacima za 2023. i Zagreb_grad?"), ["podacima", "2023", "zagreb", "grad"])
+
+    def test_shard_key(self):
+        self.assertEqual(shard_key("podaci"), "po")
+        self.assertEqual(shard_key("2023"), "20")
+        self.assertEqual(shard_key("москва"), "_")
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_shards_and_docs(self):
+        index = SearchIndex(posts_per_page=2)
+        posts = [
+            {"postid": "10", "subject": "Županija", "created": "x", "message": "<p>Podaci o <b>županiji</b></p>"},
+            {"postid": "11", "subject": "Re: Županija", "created": "y", "message": "<img src='a.png'>nema podataka"},
+            {"postid": "12", "subject": "Proračun", "created": "z", "message": "<p>Link &amp; podaci</p>"},
+        ]
+        self.assertEqual(list(index.collect(posts)), posts)
+        docs, terms, shards = index.write(self.tmp.name)
+        self.assertEqual(docs, 3)
+
+        search_dir = Path(self.tmp.name) / "search"
+        key, shard = read_js(search_dir / "t_po.js", "searchShard")
+        self.assertEqual(key, "po")
+        self.assertEqual(shard["podaci"], [0, 2])
+        self.assertEqual(shard["podataka"], [1])
+        self.assertNotIn("img", read_js(search_dir / "t_zu.js", "searchShard")[1])
+
+        chunk, rows = read_js(search_dir / "d_0.js", "searchDocs")
+        self.assertEqual(rows, [["10", 1, "Županija", "x"], ["11", 1, "Re: Županija", "y"], ["12", 2, "Proračun", "z"]])
+        meta = read_js(search_dir / "meta.js", "searchMeta")[0]
+        self.assertEqual(meta["docs"], 3)
+        self.assertIn("po", meta["shards"])
+        self.assertTrue((Path(self.tmp.name) / "search.html").exists())
+
+    def test_stale_shards_are_removed(self):
+        index = SearchIndex(posts_per_page=50)
+        index.add({"postid": "1", "subject": "Alfa", "message": ""})
+        index.write(self.tmp.name)
+        index = SearchIndex(posts_per_page=50)
+        index.add({"postid": "1", "subject": "Beta", "message": ""})
+        index.write(self.tmp.name)
+        self.assertEqual(sorted(os.listdir(Path(self.tmp.name) / "search")), ["d_0.js", "meta.js", "t_be.js"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from urlChecker import check_urls, interleave_by_host
+from fakeResources import FakeResources
+
+class TestCheckUrls(unittest.TestCase):
+    def test_statuses(self):
+        with FakeResources() as server:
+            urls = {
+                "ok": server.url("/status/200"),
+                "missing": server.url("/status/404"),
+                "error": server.url("/status/500"),
+                "nohead": server.url("/nohead"),
+                "redirect": server.url("/redirect"),
+                "ftp": "ftp://example.org/data.csv",
+            }
+            results = check_urls(list(urls.values()) + [urls["ok"]], workers=4, delay=0, retries=0)
+
+        self.assertEqual(set(results), set(urls.values()))
+        status = {name: (results[url]["status"], results[url]["ok"]) for name, url in urls.items()}
+        self.assertEqual(status, {
+            "ok": (200, True),
+            "missing": (404, False),
+            "error": (500, False),
+            "nohead": (200, True),
+            "redirect": (200, True),
+            "ftp": (None, False),
+        })
+        self.assertEqual(server.requests[("HEAD", "/status/200")], 2)
+        self.assertEqual(server.requests[("GET", "/nohead")], 1)
+        self.assertIsNotNone(results[urls["ok"]]["latency_ms"])
+        self.assertIsNotNone(results[urls["ok"]]["checked_at"])
+
+    def test_connection_errors_are_results(self):
+        with FakeResources() as server:
+            url = server.url("/status/200")
+        results = check_urls([url], retries=0, timeout=1)
+        self.assertFalse(results[url]["ok"])
+        self.assertIsNone(results[url]["status"])
+        self.assertIn("ConnectionError", results[url]["error"])
+
+    def test_per_host_limit(self):
+        latencies = []
+        with FakeResources(delay=0.1) as server:
+            urls = [server.url(f"/status/200?{i}", host) for i in range(6) for host in ("127.0.0.1", "localhost")]
+            results = check_urls(urls, workers=8, per_host=2, delay=0, latencies=latencies)
+
+        self.assertTrue(all(r["ok"] for r in results.values()))
+        self.assertEqual(len(latencies), 12)
+        self.assertEqual(server.max_in_flight["127.0.0.1"], 2)
+        self.assertEqual(server.max_in_flight["localhost"], 2)
+
+    def test_politeness_delay(self):
+        with FakeResources() as server:
+            urls = [server.url(f"/status/200?{i}") for i in range(6)]
+            check_urls(urls, workers=6, per_host=6, delay=0.05)
+        # Razmak od barem 0.05 s izmedju pocetaka (mjereno na posluzitelju, uz malo tolerancije)
+        starts = sorted(server.starts["127.0.0.1"])
+        self.assertGreaterEqual(starts[-1] - starts[0], 5 * 0.05 - 0.02)
+
+    def test_interleave_by_host(self):
+        urls = ["http://a/1", "http://a/2", "http://a/3", "http://b/1", "http://c/1", "http://b/2"]
+        self.assertEqual(interleave_by_host(urls), ["http://a/1", "http://b/1", "http://c/1", "http://a/2", "http://b/2", "http://a/3"])
+
+if __name__ == "__main__":
+    unittest.main()
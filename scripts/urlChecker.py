@@ -0,0 +1,93 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain, zip_longest
+from urllib.parse import urlsplit
+import requests
+from ckanClient import make_session
+
+# Posluzitelji koji ne podrzavaju HEAD (ili ga odbijaju) dobivaju GET bez citanja tijela
+HEAD_UNSUPPORTED = (403, 405, 501)
+MAX_ERROR_LENGTH = 200
+
+class HostLimiter:
+    """At most per_host requests in flight per host, and request starts per host at least delay seconds apart."""
+
+    def __init__(self, per_host=2, delay=0.5):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, host):
+        with self._lock:
+            slots = self._slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with slots:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+def interleave_by_host(urls):
+    """Order urls round-robin over their hosts, so the pool works on many hosts at once instead of queueing on one."""
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(urlsplit(url).hostname, []).append(url)
+    return [url for url in chain.from_iterable(zip_longest(*by_host.values())) if url is not None]
+
+def check_url(session, url, limiter, timeout=10):
+    """{"status", "ok", "latency_ms", "error", "checked_at"} of one resource URL."""
+    parts = urlsplit(url)
+    checked_at = datetime.now()
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return {"status": None, "ok": False, "latency_ms": None, "error": "Unsupported URL", "checked_at": checked_at}
+
+    with limiter.slot(parts.hostname):
+        start = time.perf_counter()
+        try:
+            with session.head(url, allow_redirects=True, timeout=timeout) as response:
+                status = response.status_code
+            if status in HEAD_UNSUPPORTED:
+                with session.get(url, allow_redirects=True, timeout=timeout, stream=True) as response:
+                    status = response.status_code
+            error = None
+        except requests.RequestException as e:
+            status = None
+            error = f"{type(e).__name__}: {e}"[:MAX_ERROR_LENGTH]
+        latency = time.perf_counter() - start
+
+    return {
+        "status": status,
+        "ok": status is not None and status < 400,
+        "latency_ms": round(latency * 1000),
+        "error": error,
+        "checked_at": checked_at,
+    }
+
+def check_urls(urls, workers=32, per_host=2, delay=0.5, timeout=10, retries=1, latencies=None):
+    """
+    Probe every url concurrently: HEAD (GET if HEAD is refused), redirects followed.
+
+    At most `workers` requests are in flight overall and at most per_host per host, with
+    request starts to the same host at least delay seconds apart. Returns {url: result}
+    (see check_url); failures are results with ok=False, never exceptions.
+    If latencies is a list, the duration of every request (seconds) is appended to it.
+    """
+    urls = interleave_by_host(dict.fromkeys(urls))
+    limiter = HostLimiter(per_host, delay)
+    results = {}
+    with make_session(pool_size=max(workers, per_host), retries=retries, raise_on_status=False) as session:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(check_url, session, url, limiter, timeout): url for url in urls}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if latencies is not None and result["latency_ms"] is not None:
+                    latencies.append(result["latency_ms"] / 1000)
+    return results